@@ -0,0 +1,475 @@
+#!/usr/bin/env python
+"""
+Benchmark suite for Tabel.
+
+Times the core operations at several table sizes, optionally the same
+operations in pandas, and records time and peak memory as JSON. Two runs are
+compared to flag regressions::
+
+    python benchmarks/run.py run --sizes 1000,100000,1000000 -o before.json
+    python benchmarks/run.py run --sizes 1000,100000,1000000 -o after.json --pandas
+    python benchmarks/run.py compare before.json after.json --threshold 1.2
+
+`compare` exits with status 1 when a case got slower than `threshold` times
+its previous time.
+
+.. moduleauthor:: Bastiaan Bergman <Bastiaan.Bergman@gmail.com>
+
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from timeit import default_timer
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tabel import Tabel, read_tabel, __version__     # pylint: disable=wrong-import-position
+from tabel.util import ImpError                      # pylint: disable=wrong-import-position
+from tabel.arrow import PA_PRESENT                   # pylint: disable=wrong-import-position
+
+try:
+    import tracemalloc
+    TRACEMALLOC_PRESENT = True
+except ImpError:
+    TRACEMALLOC_PRESENT = False
+
+try:
+    import pandas as pd
+    PD_PRESENT = True
+except ImpError:
+    PD_PRESENT = False
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+"""list: Number of rows of the benchmark tables."""
+DEFAULT_REPEAT = 5
+"""int: Number of timings per case, the fastest is reported."""
+DEFAULT_THRESHOLD = 1.2
+"""float: Ratio of new over old time from which a case counts as a regression."""
+FORMATS = ["csv", "gz", "npz", "npy"] + (["parquet", "arrow"] if PA_PRESENT else [])
+"""list: File formats of the save and read cases, parquet and arrow need pyarrow."""
+
+CASES = []
+"""list: Registered cases as (name, {library: function}) tuples."""
+
+
+def case(name, library="tabel"):
+    """Decorator registering a benchmark case
+
+    The decorated function is called with the data (see `make_data`) and a
+    scratch directory, and returns the function to be timed, with any set up
+    done before returning. Returning None skips the case. Cases needing set up
+    before every repeat return a (prepare, fie) pair instead: `prepare` is
+    called outside the timing and `fie` is timed on its result. In-place
+    operations (row_append, append, sort) prepare a fresh table, such that
+    every repeat starts from the same table, saves remove the previous file.
+    """
+    def register(fie):
+        for registered, libraries in CASES:
+            if registered == name:
+                libraries[library] = fie
+                break
+        else:
+            CASES.append((name, {library: fie}))
+        return fie
+    return register
+
+
+def make_data(size, seed=0):
+    """Return a dict of columns: int keys, floats, short strings, and a right
+    hand side for joins with half the keys matching.
+    """
+    r = np.random.RandomState(seed)
+    n_keys = max(size // 10, 1)
+    data = {'k': r.randint(0, n_keys, size), 'f': r.rand(size), 'i': r.randint(0, 100, size),
+            's': np.array(['s{}'.format(i) for i in range(100)])[r.randint(0, 100, size)]}
+    right = {'k': np.arange(n_keys // 2, n_keys + n_keys // 2), 'g': r.rand(n_keys)}
+    return {'size': size, 'data': data, 'right': right, 'mask': r.rand(size) > .5}
+
+
+# -- tabel cases ---------------------------------------------------------------
+
+@case("construct")
+def tabel_construct(d, _):
+    lists = {k: v.tolist() for k, v in d['data'].items()}
+    return lambda: Tabel(lists)
+
+
+@case("slice_row")
+def tabel_slice_row(d, _):
+    tbl = Tabel(d['data'])
+    return lambda: tbl[d['size'] // 2]
+
+
+@case("slice_column")
+def tabel_slice_column(d, _):
+    tbl = Tabel(d['data'])
+    return lambda: tbl[1:d['size'] // 2, 'f']
+
+
+@case("slice_mask")
+def tabel_slice_mask(d, _):
+    tbl = Tabel(d['data'])
+    return lambda: tbl[d['mask'], :]
+
+
+@case("row_append")
+def tabel_row_append(d, _):
+    return lambda: Tabel(d['data']), lambda tbl: tbl.row_append((1, .5, 2, 's1'))
+
+
+@case("append")
+def tabel_append(d, _):
+    tbl_b = Tabel(d['data'])
+    return lambda: Tabel(d['data']), lambda tbl: tbl.append(tbl_b)
+
+
+@case("sort")
+def tabel_sort(d, _):
+    return lambda: Tabel(d['data']), lambda tbl: tbl.sort(['f', 'k'])
+
+
+def _tabel_join(jointype):
+    def setup(d, _):
+        tbl, tbl_r = Tabel(d['data']), Tabel(d['right'])
+        return lambda: tbl.join(tbl_r, 'k', jointype=jointype)
+    return setup
+
+
+for _jointype in ["inner", "left", "right", "outer"]:
+    case("join_" + _jointype)(_tabel_join(_jointype))
+
+
+@case("group_by")
+def tabel_group_by(d, _):
+    tbl = Tabel(d['data'])
+    return lambda: tbl.group_by('k', [('sum', 'f'), ('mean', 'i')])
+
+
+@case("to_pandas")
+def tabel_to_pandas(d, _):
+    if not PD_PRESENT:
+        return None
+    tbl = Tabel(d['data'])
+    return tbl.to_pandas
+
+
+@case("to_pandas_shared")
+def tabel_to_pandas_shared(d, _):
+    if not PD_PRESENT:
+        return None
+    tbl = Tabel(d['data'])[:, ['k', 'f', 'i']]
+    return lambda: tbl.to_pandas(copy=False)
+
+
+@case("from_pandas_shared")
+def tabel_from_pandas_shared(d, _):
+    if not PD_PRESENT:
+        return None
+    df = pd.DataFrame({k: d['data'][k] for k in ['k', 'f', 'i']})
+    return lambda: Tabel(df, copy=False)
+
+
+def _tabel_save(fmt):
+    def setup(d, tmpdir):
+        tbl = Tabel(d['data'])
+        filename = os.path.join(tmpdir, "tabel_save." + fmt)
+        return lambda: _clear(filename), lambda _: tbl.save(filename, fmt=fmt)
+    return setup
+
+
+def _tabel_read(fmt):
+    def setup(d, tmpdir):
+        filename = os.path.join(tmpdir, "tabel_read." + fmt)
+        Tabel(d['data']).save(filename, fmt=fmt)
+        return lambda: read_tabel(filename, fmt=fmt)
+    return setup
+
+
+for _fmt in FORMATS:
+    case("save_" + _fmt)(_tabel_save(_fmt))
+    case("read_" + _fmt)(_tabel_read(_fmt))
+
+
+# -- pandas cases --------------------------------------------------------------
+
+@case("construct", "pandas")
+def pandas_construct(d, _):
+    lists = {k: v.tolist() for k, v in d['data'].items()}
+    return lambda: pd.DataFrame(lists)
+
+
+@case("slice_row", "pandas")
+def pandas_slice_row(d, _):
+    df = pd.DataFrame(d['data'])
+    return lambda: tuple(df.iloc[d['size'] // 2])
+
+
+@case("slice_column", "pandas")
+def pandas_slice_column(d, _):
+    df = pd.DataFrame(d['data'])
+    return lambda: df['f'].values[1:d['size'] // 2]
+
+
+@case("slice_mask", "pandas")
+def pandas_slice_mask(d, _):
+    df = pd.DataFrame(d['data'])
+    return lambda: df[d['mask']]
+
+
+@case("row_append", "pandas")
+def pandas_row_append(d, _):
+    df = pd.DataFrame(d['data'])
+    row = pd.DataFrame({'k': [1], 'f': [.5], 'i': [2], 's': ['s1']})
+    return lambda: pd.concat([df, row], ignore_index=True)
+
+
+@case("append", "pandas")
+def pandas_append(d, _):
+    df, df_b = pd.DataFrame(d['data']), pd.DataFrame(d['data'])
+    return lambda: pd.concat([df, df_b], ignore_index=True)
+
+
+@case("sort", "pandas")
+def pandas_sort(d, _):
+    df = pd.DataFrame(d['data'])
+    return lambda: df.sort_values(['k', 'f'], kind='mergesort')
+
+
+def _pandas_join(jointype):
+    def setup(d, _):
+        df, df_r = pd.DataFrame(d['data']), pd.DataFrame(d['right'])
+        return lambda: df.merge(df_r, on='k', how=jointype)
+    return setup
+
+
+for _jointype in ["inner", "left", "right", "outer"]:
+    case("join_" + _jointype, "pandas")(_pandas_join(_jointype))
+
+
+@case("group_by", "pandas")
+def pandas_group_by(d, _):
+    df = pd.DataFrame(d['data'])
+    return lambda: df.groupby('k', sort=False).agg({'f': 'sum', 'i': 'mean'})
+
+
+_PANDAS_IO = {"csv": ("to_csv", pd.read_csv if PD_PRESENT else None, {}),
+              "gz": ("to_csv", pd.read_csv if PD_PRESENT else None, {'compression': 'gzip'}),
+              "parquet": ("to_parquet", pd.read_parquet if PD_PRESENT else None, {})}
+
+
+def _pandas_save(fmt):
+    def setup(d, tmpdir):
+        if fmt not in _PANDAS_IO:
+            return None
+        df = pd.DataFrame(d['data'])
+        filename = os.path.join(tmpdir, "pandas_save." + fmt)
+        writer, _, kwargs = _PANDAS_IO[fmt]
+        return lambda: getattr(df, writer)(filename, index=False, **kwargs)
+    return setup
+
+
+def _pandas_read(fmt):
+    def setup(d, tmpdir):
+        if fmt not in _PANDAS_IO:
+            return None
+        writer, reader, kwargs = _PANDAS_IO[fmt]
+        filename = os.path.join(tmpdir, "pandas_read." + fmt)
+        getattr(pd.DataFrame(d['data']), writer)(filename, index=False, **kwargs)
+        return lambda: reader(filename, **kwargs)
+    return setup
+
+
+for _fmt in FORMATS:
+    case("save_" + _fmt, "pandas")(_pandas_save(_fmt))
+    case("read_" + _fmt, "pandas")(_pandas_read(_fmt))
+
+
+# -- running and comparing -----------------------------------------------------
+
+def _clear(filename):
+    """Remove a file or npy directory left by a previous save.
+    """
+    if os.path.isdir(filename):
+        shutil.rmtree(filename)
+    elif os.path.exists(filename):
+        os.remove(filename)
+
+
+def _prepared(fie):
+    """Return a case as a (prepare, fie) pair, see `case`.
+    """
+    if isinstance(fie, tuple):
+        return fie
+    return (lambda: None), (lambda _: fie())
+
+
+def peak_memory(fie):
+    """Return the peak memory in bytes allocated while calling `fie`, None if
+    tracemalloc is not available.
+    """
+    if not TRACEMALLOC_PRESENT:
+        return None
+    prepare, fie = _prepared(fie)
+    state = prepare()
+    tracemalloc.start()
+    try:
+        fie(state)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def time_case(fie, repeat):
+    """Return the fastest of `repeat` timings of `fie`, in seconds.
+    """
+    prepare, fie = _prepared(fie)
+    times = []
+    for _ in range(repeat):
+        state = prepare()
+        t0 = default_timer()
+        fie(state)
+        times.append(default_timer() - t0)
+    return min(times)
+
+
+def run_cases(sizes=None, repeat=DEFAULT_REPEAT, libraries=("tabel",), select=None,
+              verbose=False):
+    """Run the benchmark cases
+
+    Arguments:
+        sizes (list) :
+            numbers of rows, default `DEFAULT_SIZES`.
+        repeat (int) :
+            number of timings per case, the fastest is kept.
+        libraries (list) :
+            "tabel" and/or "pandas".
+        select (list) :
+            names of the cases to run, all if None. A name ending in "_" selects
+            all cases starting with it, e.g. "join_".
+        verbose (bool) :
+            print each result as it comes.
+
+    Returns:
+        dict with the `meta` data of the run and a list of `results`, each a
+        dict with case, library, size, time (seconds) and peak_memory (bytes).
+    """
+    sizes = sizes or DEFAULT_SIZES
+    results = []
+    tmpdir = tempfile.mkdtemp(prefix="tabel_bench_")
+    try:
+        for size in sizes:
+            d = make_data(size)
+            for name, functions in CASES:
+                if select and not any(name == s or (s.endswith("_") and name.startswith(s))
+                                      for s in select):
+                    continue
+                for library in libraries:
+                    if library not in functions:
+                        continue
+                    fie = functions[library](d, tmpdir)
+                    if fie is None:
+                        continue
+                    result = {'case': name, 'library': library, 'size': size,
+                              'time': time_case(fie, repeat), 'peak_memory': peak_memory(fie)}
+                    results.append(result)
+                    if verbose:
+                        print(format_result(result))
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    meta = {'tabel': __version__, 'numpy': np.__version__,
+            'pandas': pd.__version__ if PD_PRESENT else None,
+            'python': platform.python_version(), 'machine': platform.platform(),
+            'date': time.strftime("%Y-%m-%dT%H:%M:%S"), 'repeat': repeat}
+    return {'meta': meta, 'results': results}
+
+
+def format_result(result):
+    """One line summary of a result
+    """
+    memory = result['peak_memory']
+    return "{:<18} {:<7} {:>9} {:>12.3f} ms {:>12} kB".format(
+        result['case'], result['library'], result['size'], result['time'] * 1e3,
+        "-" if memory is None else "{:.0f}".format(memory / 1e3))
+
+
+def compare(old, new, threshold=DEFAULT_THRESHOLD):
+    """Compare two runs, as returned by `run_cases`
+
+    Returns:
+        list of (case, library, size, old time, new time, ratio, flag) for the
+        cases present in both runs, flag is "REGRESSION" when the ratio of new
+        over old time exceeds `threshold`, "faster" when it is below
+        1 / `threshold` and "" otherwise.
+    """
+    old_times = {(r['case'], r['library'], r['size']): r['time'] for r in old['results']}
+    rows = []
+    for r in new['results']:
+        key = (r['case'], r['library'], r['size'])
+        if key not in old_times:
+            continue
+        ratio = r['time'] / old_times[key] if old_times[key] > 0 else float('inf')
+        flag = "REGRESSION" if ratio > threshold else ("faster" if ratio < 1 / threshold else "")
+        rows.append(key + (old_times[key], r['time'], ratio, flag))
+    return rows
+
+
+def main(argv=None):
+    """Command line entry, see the module docstring
+    """
+    parser = argparse.ArgumentParser(description="Tabel benchmark suite")
+    commands = parser.add_subparsers(dest="command")
+    run = commands.add_parser("run", help="run the benchmarks")
+    run.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                     help="comma separated numbers of rows")
+    run.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    run.add_argument("--pandas", action="store_true", help="also run the pandas equivalents")
+    run.add_argument("--cases", default=None,
+                     help="comma separated case names, a trailing _ selects a group")
+    run.add_argument("-o", "--output", default=None, help="JSON file to write the results to")
+    cmp_ = commands.add_parser("compare", help="compare two JSON results")
+    cmp_.add_argument("old")
+    cmp_.add_argument("new")
+    cmp_.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    commands.add_parser("list", help="list the cases")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for name, functions in CASES:
+            print("{:<18} {}".format(name, ", ".join(sorted(functions))))
+        return 0
+    if args.command == "compare":
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        rows = compare(old, new, args.threshold)
+        for row in rows:
+            print("{:<18} {:<7} {:>9} {:>12.3f} ms {:>12.3f} ms {:>7.2f}x {}".format(
+                row[0], row[1], row[2], row[3] * 1e3, row[4] * 1e3, row[5], row[6]))
+        return 1 if any(row[6] == "REGRESSION" for row in rows) else 0
+    if args.command != "run":
+        parser.print_help()
+        return 2
+    libraries = ["tabel"]
+    if args.pandas:
+        if not PD_PRESENT:
+            raise ImpError("pandas is needed for --pandas")
+        libraries.append("pandas")
+    results = run_cases([int(s) for s in args.sizes.split(",")], args.repeat, libraries,
+                        args.cases.split(",") if args.cases else None, verbose=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -80,9 +80,19 @@ napoleon_use_param = True
 # napoleon_use_rtype = True
 
 doctest_global_setup = """
+import os
+import shutil
+import tempfile
 from tabel import Tabel
 import numpy as np
 tbl = Tabel( [ ["John", "Joe", "Jane"],[1.82,1.65,2.15],[False,False,True] ],columns = ["Name", "Height", "Married"])
+_doctest_cwd = os.getcwd()
+_doctest_dir = tempfile.mkdtemp()
+os.chdir(_doctest_dir)
+"""
+doctest_global_cleanup = """
+os.chdir(_doctest_cwd)
+shutil.rmtree(_doctest_dir, ignore_errors=True)
 """
 # Add any paths that contain templates here, relative to this directory.
 templates_path = ['_templates']
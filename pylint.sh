@@ -2,9 +2,37 @@ echo "######## tabel.py"
 pylint tabel/tabel.py
 echo "######## hashjoin.py"
 pylint tabel/hashjoin.py
+echo "######## arrow.py"
+pylint tabel/arrow.py
+echo "######## builder.py"
+pylint tabel/builder.py
+echo "######## categorical.py"
+pylint tabel/categorical.py
+echo "######## compress.py"
+pylint tabel/compress.py
+echo "######## executor.py"
+pylint tabel/executor.py
+echo "######## expr.py"
+pylint tabel/expr.py
+echo "######## index.py"
+pylint tabel/index.py
+echo "######## parallel.py"
+pylint tabel/parallel.py
+echo "######## plan.py"
+pylint tabel/plan.py
+echo "######## profiling.py"
+pylint tabel/profiling.py
+echo "######## sql.py"
+pylint tabel/sql.py
+echo "######## storage.py"
+pylint tabel/storage.py
+echo "######## strings.py"
+pylint tabel/strings.py
 echo "######## util.py"
 pylint tabel/util.py
 echo "######## numpy_types.py"
 pylint tabel/numpy_types.py
 echo "######## __init__.py"
 pylint tabel/__init__.py
+echo "######## benchmarks/run.py"
+pylint benchmarks/run.py
@@ -4,8 +4,14 @@
 .. moduleauthor:: Bastiaan Bergman <Bastiaan.Bergman@gmail.com>
 
 """
-from .tabel import Tabel, read_tabel, transpose, T
+from .tabel import Tabel, read_tabel, iter_tabel, transpose, T
 from .hashjoin import first
+from .builder import TabelBuilder
+from .plan import LazyTabel, scan_tabel
+from .categorical import Categorical
+from .strings import StringColumn
 from ._version import __version__
-__all__ = ["Tabel", "first", "transpose", "T", "read_tabel", "__version__"]
+__all__ = ["Tabel", "TabelBuilder", "first", "transpose", "T", "read_tabel", "iter_tabel",
+           "LazyTabel", "scan_tabel", "Categorical", "StringColumn",
+           "__version__"]
 name = "tabel"                                      # pylint: disable=invalid-name
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+"""
+.. module:: tabel.arrow
+.. moduleauthor:: Bastiaan Bergman <Bastiaan.Bergman@gmail.com>
+
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import numpy as np
+from .categorical import Categorical, code_dtype
+from .strings import StringColumn
+from .util import ImpError
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+    PA_PRESENT = True
+except ImpError:
+    PA_PRESENT = False
+
+ARROW_FORMATS = ("parquet", "arrow", "feather")
+"""tuple: File formats read and written through pyarrow."""
+
+
+def _require_pyarrow():
+    if not PA_PRESENT:
+        raise ImpError("pyarrow is needed for the parquet, arrow and feather formats")
+
+
+def to_arrow_array(dta):
+    """Return a column as pyarrow Array.
+
+    Numeric and datetime columns are wrapped without copying, StringColumns
+    become large_string arrays sharing the bytes and offsets, Categoricals
+    dictionary arrays sharing the codes. Numpy string and boolean columns are
+    converted.
+    """
+    _require_pyarrow()
+    if isinstance(dta, Categorical):
+        return pa.DictionaryArray.from_arrays(pa.array(dta.codes), pa.array(dta.categories))
+    if isinstance(dta, StringColumn):
+        offsets = np.ascontiguousarray(dta.offsets)
+        return pa.Array.from_buffers(pa.large_string(), len(dta),
+                                     [None, pa.py_buffer(offsets), pa.py_buffer(dta.data)])
+    return pa.array(np.ascontiguousarray(dta))
+
+
+def _string_column(arr):
+    """Return a utf8 pyarrow Array as StringColumn sharing its bytes.
+    """
+    if arr.null_count:
+        arr = arr.fill_null("")
+    _, offsets, data = arr.buffers()
+    offset_type = np.int64 if pa.types.is_large_string(arr.type) else np.int32
+    offsets = np.frombuffer(offsets, dtype=offset_type)[arr.offset:arr.offset + len(arr) + 1]
+    data = np.zeros(0, dtype=np.uint8) if data is None else np.frombuffer(data, dtype=np.uint8)
+    return StringColumn(data, offsets.astype(np.int64))
+
+
+def _categorical(arr, writable=False):
+    """Return a string dictionary pyarrow Array as Categorical.
+
+    The dictionary is sorted into the categories, codes are translated only
+    when it was not sorted and unique already, or copied when `writable`.
+    """
+    values = np.asarray(arr.dictionary.to_pylist(), dtype=np.str_)
+    categories, inverse = np.unique(values, return_inverse=True)
+    codes = arr.indices.to_numpy(zero_copy_only=False)
+    if len(categories) != len(values) or np.any(inverse != np.arange(len(values))):
+        codes = inverse[codes]
+    elif writable and not codes.flags.writeable:
+        codes = codes.copy()
+    return Categorical(codes.astype(code_dtype(len(categories)), copy=False), categories)
+
+
+def from_arrow_array(arr, writable=False):
+    """Return a pyarrow Array or ChunkedArray as column.
+
+    Numeric and datetime columns without nulls are a read-only view on the
+    Arrow buffer of a single chunk, unless `writable` is True, then they are
+    copied. Strings become a StringColumn sharing the bytes, string
+    dictionaries a Categorical. Nulls become NaN for numeric columns
+    (integers and booleans turn to float) and empty strings for string
+    columns.
+    """
+    _require_pyarrow()
+    if isinstance(arr, pa.ChunkedArray):
+        if arr.num_chunks == 1:
+            arr = arr.chunk(0)
+        elif arr.num_chunks == 0:
+            arr = pa.array([], type=arr.type)
+        else:
+            arr = pa.concat_arrays(arr.chunks)
+    if pa.types.is_dictionary(arr.type):
+        if (pa.types.is_string(arr.type.value_type) or
+                pa.types.is_large_string(arr.type.value_type)) and not arr.null_count:
+            return _categorical(arr, writable)
+        arr = arr.dictionary_decode()
+    if pa.types.is_string(arr.type) or pa.types.is_large_string(arr.type):
+        return _string_column(arr)
+    if pa.types.is_boolean(arr.type) and arr.null_count:
+        arr = arr.cast(pa.float64())
+    dta = arr.to_numpy(zero_copy_only=False)
+    if writable and not dta.flags.writeable:
+        dta = dta.copy()
+    return dta
+
+
+def to_arrow_table(columns, data):
+    """Return columns as pyarrow Table, see `to_arrow_array`.
+    """
+    _require_pyarrow()
+    return pa.Table.from_arrays([to_arrow_array(dta) for dta in data],
+                                names=[str(col) for col in columns])
+
+
+def from_arrow_table(table, writable=False):
+    """Return the datastruct and columns of a pyarrow Table as dict, see
+    `from_arrow_array`.
+    """
+    return dict(datastruct=[from_arrow_array(col, writable) for col in table.columns],
+                columns=list(table.column_names))
+
+
+def save_parquet(columns, data, filename):
+    """Save columns to a parquet file.
+    """
+    pq.write_table(to_arrow_table(columns, data), filename)
+
+
+def save_feather(columns, data, filename, compression=None):
+    """Save columns to an Arrow IPC (feather version 2) file.
+
+    Arguments:
+        compression (str or None) :
+            'lz4', 'zstd', 'uncompressed' or None for the pyarrow default.
+            Uncompressed files are read without copying when memory-mapped.
+    """
+    feather.write_feather(to_arrow_table(columns, data), filename, compression=compression)
+
+
+def read_parquet(filename, columns=None, row_groups=None, filters=None):
+    """Read (some of) the columns and row groups of a parquet file.
+
+    Arguments:
+        filename (str) :
+            parquet file name.
+        columns (list or None) :
+            names of the columns to read, all columns if None.
+        row_groups (list or None) :
+            indices of the row groups to read, all row groups if None.
+        filters (list or None) :
+            pyarrow filters like ``[("a", ">", 3)]``, row groups whose
+            statistics exclude a match are not read at all.
+
+    Returns:
+        dict with the datastruct and columns.
+    """
+    _require_pyarrow()
+    if row_groups is not None and filters is not None:
+        raise ValueError("Either row_groups or filters can be given, not both.")
+    if row_groups is not None:
+        table = pq.ParquetFile(filename).read_row_groups(row_groups, columns=columns)
+    else:
+        table = pq.read_table(filename, columns=columns, filters=filters)
+    return from_arrow_table(table, writable=True)
+
+
+def read_feather(filename, columns=None, mmap=False):
+    """Read (some of) the columns of an Arrow IPC (feather) file.
+
+    Arguments:
+        filename (str) :
+            arrow or feather file name.
+        columns (list or None) :
+            names of the columns to read, all columns if None.
+        mmap (bool) :
+            memory-map the file, uncompressed columns are then used without
+            reading or copying them, read-only. Otherwise the columns are
+            writable copies.
+
+    Returns:
+        dict with the datastruct and columns.
+    """
+    _require_pyarrow()
+    return from_arrow_table(feather.read_table(filename, columns=columns,
+                                               memory_map=bool(mmap)),
+                            writable=not mmap)
+
+
+def read_arrow_columns(filename, fmt):
+    """Return the column names of a parquet, arrow or feather file.
+    """
+    _require_pyarrow()
+    if fmt == "parquet":
+        return list(pq.read_schema(filename).names)
+    with pa.memory_map(filename) as source:
+        return list(pa.ipc.open_file(source).schema.names)
@@ -0,0 +1,406 @@
+#!/usr/bin/env python
+"""
+.. module:: tabel.builder
+.. moduleauthor:: Bastiaan Bergman <Bastiaan.Bergman@gmail.com>
+
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import datetime
+import decimal
+from itertools import chain, islice
+from operator import itemgetter
+import numpy as np
+from .util import isstring
+
+RECORD_BATCH_ROWS = 10000
+"""int: Number of records converted to columns at once by :mod:`tabel.Tabel.from_records`."""
+
+
+def as_schema(schema):
+    """Return a schema as a list of (name, numpy.dtype) tuples.
+
+    Arguments:
+        schema (object) :
+            list of (name, dtype) tuples, dict of name: dtype, or a structured
+            numpy dtype (like the `dtype` property of a Tabel).
+    """
+    if isinstance(schema, np.dtype):
+        return [(name, schema[name]) for name in schema.names]
+    if hasattr(schema, "items"):
+        schema = schema.items()
+    return [(name, np.dtype(dtype)) for name, dtype in schema]
+
+
+def _null_fill(dtype):
+    """Return the value NULLs become in a column of `dtype`.
+    """
+    return "" if dtype.kind in {'U', 'S'} else "NaT" if dtype.kind == 'M' else \
+        None if dtype.kind == 'O' else np.nan
+
+
+def _column_dtypes(columns, dtypes):
+    """Return a dtype or None per column, of a list in column order or a dict
+    by column name.
+    """
+    if dtypes is None:
+        dtypes = {}
+    elif not hasattr(dtypes, "items"):
+        dtypes = dict(zip(columns, dtypes))
+    return [dtypes.get(col) for col in columns]
+
+
+def batch_column(values, dtype=None, like=None, name=None):
+    """Return a batch of column values as numpy array
+
+    NULLs (None) become NaN in float columns, NaT in datetime columns and
+    empty strings in string columns. Decimals become floats, dates and
+    datetimes datetime64. Numbers of a given numeric dtype are converted with
+    `numpy.fromiter`.
+
+    Arguments:
+        values (sequence) :
+            python values of one column.
+        dtype (numpy.dtype) :
+            dtype of the array, inferred from the values if None.
+        like (numpy.dtype) :
+            dtype of the column so far, used to infer a batch of only NULLs.
+        name (str) :
+            column name, used in error messages.
+
+    Raises:
+        ValueError :
+            When there are NULLs in a column of a given integer or boolean
+            dtype, which has no value for them.
+    """
+    if dtype is not None:
+        dtype = np.dtype(dtype)
+        if dtype.kind in {'b', 'i', 'u', 'f'}:
+            # fromiter takes None for False, integers raise a bare TypeError
+            if dtype.kind != 'f' and None in values:
+                raise ValueError("None in column {} of dtype {}, use a float dtype "
+                                 "for NaN".format(name, dtype))
+            try:
+                return np.fromiter(values, dtype, len(values))
+            except (TypeError, ValueError):
+                pass
+        if dtype.kind in {'U', 'S'} and None in values:
+            values = ["" if v is None else v for v in values]
+        return np.array(values, dtype=dtype)
+    arr = np.array(values)
+    if arr.dtype.kind != 'O':
+        return arr
+    has_null = None in values
+    present = [v for v in values if v is not None]
+    if not present and like is not None:
+        like = np.dtype(like)
+        return np.full(len(values), _null_fill(like), dtype=like if like.kind in
+                       {'U', 'S', 'M', 'O'} else np.result_type(like, np.float16))
+    if all(isinstance(v, (int, float, decimal.Decimal)) for v in present):
+        return np.array([np.nan if v is None else float(v) for v in values])
+    if all(isinstance(v, (datetime.date, datetime.datetime)) for v in present):
+        return np.array(["NaT" if v is None else v for v in values], dtype="datetime64[us]")
+    if has_null and all(isinstance(v, type("")) for v in present):
+        return np.array(["" if v is None else v for v in values])
+    return arr
+
+
+def required_dtype(dtype, value):
+    """Return the dtype needed to store `value` in a column of `dtype`.
+
+    Returns `dtype` itself when the value fits, otherwise the promoted dtype,
+    for example a wider string dtype for a longer string.
+    """
+    if dtype.kind in {'U', 'S'}:
+        if not (isstring(value) or isinstance(value, bytes)):
+            value = str(value)
+        itemsize = dtype.itemsize // 4 if dtype.kind == 'U' else dtype.itemsize
+        if len(value) > itemsize:
+            return np.dtype((dtype.type, len(value)))
+        return dtype
+    if dtype.kind == 'O':
+        return dtype
+    if dtype.kind in {'M', 'm'}:
+        # numpy converts dates, datetimes, timedeltas and ISO strings
+        try:
+            value = np.datetime64(value) if dtype.kind == 'M' else np.timedelta64(value)
+        except (TypeError, ValueError):
+            raise ValueError("Value {!r} does not fit dtype {}.".format(value, dtype))
+        return np.promote_types(dtype, value.dtype)
+    return np.promote_types(dtype, np.min_scalar_type(value))
+
+
+class TabelBuilder(object):
+    """Build a Tabel row by row.
+
+    Rows are written into column buffers of a fixed dtype per column. Buffers
+    double in size when full, appending N rows therefore costs O(N) instead of
+    the O(N^2) of repeatedly calling :mod:`tabel.Tabel.row_append`.
+
+    Parameters:
+        schema (object) :
+            list of (name, dtype) tuples, dict of name: dtype, or a structured
+            numpy dtype (e.g. `Tabel.dtype`), describing the columns.
+        widen (bool) :
+            Values not fitting the dtype of their column, e.g. a longer string
+            in a '<U3' column or a float in an integer column, raise a
+            ValueError by default. If True the column is re-allocated with the
+            promoted dtype instead.
+        capacity (int) :
+            Initial number of rows reserved in the buffers.
+
+    Examples:
+        >>> from tabel import Tabel
+        >>> bld = Tabel.builder([('name', '<U4'), ('height', float)])
+        >>> bld.append(("John", 1.82))
+        >>> bld.append({'height': 1.65, 'name': "Joe"})
+        >>> bld.build()
+         name   |   height
+        --------+----------
+         John   |     1.82
+         Joe    |     1.65
+        2 rows ['<U4', '<f8']
+    """
+
+    def __init__(self, schema, widen=False, capacity=1024, tabel_class=None):
+        if tabel_class is None:
+            from .tabel import Tabel as tabel_class    # pylint: disable=cyclic-import
+        self.tabel_class = tabel_class
+        schema = as_schema(schema)
+        self.columns = [name for name, _ in schema]
+        self.widen = widen
+        self._buffers = [np.empty(max(1, capacity), dtype=dtype) for _, dtype in schema]
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def dtype(self):
+        """Structured dtype of the columns currently in the builder.
+        """
+        return np.dtype([(c, buf.dtype) for c, buf in zip(self.columns, self._buffers)])
+
+    @property
+    def dtypes(self):
+        """List of the dtypes of the columns currently in the builder.
+        """
+        return [buf.dtype for buf in self._buffers]
+
+    def _reserve(self, n):
+        """Make sure the buffers have room for n rows
+        """
+        capacity = len(self._buffers[0]) if self._buffers else n
+        if n <= capacity:
+            return
+        while capacity < n:
+            capacity *= 2
+        for i, buf in enumerate(self._buffers):
+            new = np.empty(capacity, dtype=buf.dtype)
+            new[:self._n] = buf[:self._n]
+            self._buffers[i] = new
+
+    def append(self, row):
+        """Append a single row.
+
+        Arguments:
+            row (dict, list, tuple) :
+                The row to be appended. If a dict is provided the keys should
+                match the column names. If a list or tuple is provided the
+                length and order should match the columns.
+
+        Raises:
+            ValueError :
+                When the row does not match the columns or, unless `widen` is
+                set, a value does not fit the dtype of its column. Nothing is
+                appended in that case.
+        """
+        if hasattr(row, "items"):
+            if set(row) != set(self.columns):
+                raise ValueError("Not the same columns in builder: {} {}".format(
+                    self.columns, list(row.keys())))
+            row = [row[col] for col in self.columns]
+        elif len(row) != len(self.columns):
+            raise ValueError("Number of elements in {} not equal to number of columns: {}"
+                             .format(row, len(self.columns)))
+
+        dtypes = [required_dtype(buf.dtype, value) for buf, value in zip(self._buffers, row)]
+        for ci, dtype in enumerate(dtypes):
+            if dtype != self._buffers[ci].dtype and not self.widen:
+                raise ValueError("Value {!r} does not fit column {!r} of dtype {}.".format(
+                    row[ci], self.columns[ci], self._buffers[ci].dtype))
+
+        self._reserve(self._n + 1)
+        for ci, (dtype, value) in enumerate(zip(dtypes, row)):
+            if dtype != self._buffers[ci].dtype:
+                self._buffers[ci] = self._buffers[ci].astype(dtype)
+            self._buffers[ci][self._n] = value
+        self._n += 1
+
+    def extend(self, rows):
+        """Append all rows from an iterable of rows, see :mod:`TabelBuilder.append`.
+        """
+        for row in rows:
+            self.append(row)
+
+    def extend_columns(self, columns):
+        """Append a batch of rows given as one array per column.
+
+        Each array is copied into its buffer in one go, much faster than
+        appending its rows one by one.
+
+        Arguments:
+            columns (list) :
+                arrays (or sequences) of equal length, in the order of the
+                columns of the builder.
+
+        Raises:
+            ValueError :
+                When the number or lengths of the arrays do not match or,
+                unless `widen` is set, an array cannot be cast safely to the
+                dtype of its column. Nothing is appended in that case.
+        """
+        arrays = [np.asarray(col) for col in columns]
+        if len(arrays) != len(self.columns):
+            raise ValueError("Number of columns {} not equal to number of columns: {}".format(
+                len(arrays), len(self.columns)))
+        n = len(arrays[0]) if arrays else 0
+        if any(len(arr) != n for arr in arrays):
+            raise ValueError("Columns of different lengths: {}".format(
+                [len(arr) for arr in arrays]))
+
+        dtypes = []
+        for ci, (buf, arr) in enumerate(zip(self._buffers, arrays)):
+            if np.can_cast(arr.dtype, buf.dtype, 'safe'):
+                dtypes.append(buf.dtype)
+            elif self.widen:
+                try:
+                    dtypes.append(np.promote_types(buf.dtype, arr.dtype))
+                except TypeError:
+                    raise ValueError("Column {!r} of dtype {} cannot hold dtype {}.".format(
+                        self.columns[ci], buf.dtype, arr.dtype))
+            else:
+                raise ValueError("Column {!r} of dtype {} cannot hold dtype {}.".format(
+                    self.columns[ci], buf.dtype, arr.dtype))
+
+        self._reserve(self._n + n)
+        for ci, (dtype, arr) in enumerate(zip(dtypes, arrays)):
+            if dtype != self._buffers[ci].dtype:
+                self._buffers[ci] = self._buffers[ci].astype(dtype)
+            self._buffers[ci][self._n:self._n + n] = arr
+        self._n += n
+
+    def build(self):
+        """Return the Tabel with all rows appended so far.
+
+        The columns of the returned Tabel reference the builder buffers, no
+        data is copied. Appending more rows to the builder afterwards does not
+        affect the returned Tabel.
+        """
+        data = [buf[:self._n] for buf in self._buffers]
+        return self.tabel_class(data, columns=list(self.columns), copy=False)
+
+
+def _retype_nulls(builder, ci, dtype):
+    """Refill column `ci` of a builder, which held only NULLs so far, with the
+    NULL value of `dtype`, the dtype of its first batch with values. NaN
+    would otherwise widen to 'nan' strings.
+    """
+    if dtype.kind in {'U', 'S', 'M', 'O'}:
+        buf = builder._buffers[ci]                      # pylint: disable=protected-access
+        builder._buffers[ci] = np.full(len(buf), _null_fill(dtype), dtype)
+
+
+def build_columns(batches, columns, dtypes=None, tabel_class=None):
+    """Return a Tabel built from batches of column values
+
+    Every batch is converted to one array per column, see `batch_column`, and
+    copied into growing column buffers with `TabelBuilder.extend_columns`.
+    Columns widen when a later batch needs it, e.g. for longer strings or a
+    float in an integer column. Columns with only NULLs so far take the dtype
+    of the first batch with values.
+
+    Arguments:
+        batches (iterable) :
+            lists with a sequence of values for every column.
+        columns (list) :
+            column names.
+        dtypes (list or dict) :
+            dtypes of the columns, in order or by column name, inferred from
+            the first batch for the other columns.
+        tabel_class (class) :
+            class of the returned Tabel.
+    """
+    dtypes = _column_dtypes(columns, dtypes)
+    builder = None
+    nulls = [dtype is None for dtype in dtypes]
+    for batch in batches:
+        likes = builder.dtypes if builder is not None else [None] * len(columns)
+        arrays = []
+        for ci, (values, dtype, like) in enumerate(zip(batch, dtypes, likes)):
+            if nulls[ci] and values.count(None) != len(values):
+                nulls[ci] = False
+                like = None
+            arr = batch_column(values, dtype, like, columns[ci])
+            if like is None and builder is not None:
+                _retype_nulls(builder, ci, arr.dtype)
+            arrays.append(arr)
+        if builder is None:
+            builder = TabelBuilder([(col, arr.dtype) for col, arr in zip(columns, arrays)],
+                                   widen=True, capacity=len(arrays[0]) if arrays else 0,
+                                   tabel_class=tabel_class)
+        builder.extend_columns(arrays)
+    if builder is None:
+        builder = TabelBuilder([(col, float if dtype is None else dtype)
+                                for col, dtype in zip(columns, dtypes)],
+                               capacity=0, tabel_class=tabel_class)
+    return builder.build()
+
+
+def _record_batches(records, getters, positional, batch_rows):
+    """Generate the records as batches of column values, taken from every
+    record with one getter per column.
+    """
+    while True:
+        chunk = list(islice(records, batch_rows))
+        if not chunk:
+            return
+        if positional:
+            lengths = set(map(len, chunk))
+            if len(lengths) > 1:
+                raise ValueError("Records of different lengths: {}".format(sorted(lengths)))
+        yield [list(map(getter, chunk)) for getter in getters]
+
+
+def read_records(records, columns=None, dtypes=None, batch_rows=None, tabel_class=None):
+    """Return a Tabel of an iterable of records, see :mod:`tabel.Tabel.from_records`.
+    """
+    if tabel_class is None:
+        from .tabel import Tabel as tabel_class    # pylint: disable=cyclic-import
+    if isinstance(records, np.ndarray) and records.dtype.names:
+        names = list(records.dtype.names)
+        columns = list(columns or names)
+        return tabel_class([records[name] if dtype is None else records[name].astype(dtype)
+                            for name, dtype in zip(names, _column_dtypes(columns, dtypes))],
+                           columns=columns)
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        return tabel_class() if columns is None else build_columns([], list(columns), dtypes,
+                                                                    tabel_class)
+    records = chain([first], records)
+    positional = not hasattr(first, "items")
+    if not positional:
+        columns = list(first) if columns is None else list(columns)
+        getters = [itemgetter(col) for col in columns]
+    else:
+        if columns is None:
+            columns = list(getattr(first, "_fields", None) or
+                           [str(i) for i in range(len(first))])
+        if len(first) != len(columns):
+            raise ValueError("Number of elements in {} not equal to number of columns: {}"
+                             .format(first, len(columns)))
+        getters = [itemgetter(i) for i in range(len(columns))]
+    return build_columns(_record_batches(records, getters, positional,
+                                         batch_rows or RECORD_BATCH_ROWS),
+                         list(columns), dtypes, tabel_class)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+"""
+.. module:: tabel.categorical
+.. moduleauthor:: Bastiaan Bergman <Bastiaan.Bergman@gmail.com>
+
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import numpy as np
+from .util import isstring
+
+CATEGORIES_SUFFIX = ".categories"
+"""str: Suffix of the name under which the categories of a column are saved."""
+
+
+def code_dtype(n_categories):
+    """Return the smallest signed integer dtype holding codes for `n_categories`.
+    """
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def unify(cols):
+    """Express Categoricals in one shared set of categories
+
+    Returns the codes of each Categorical in the sorted union of their
+    categories, and that union. Code order remains value order.
+    """
+    if all(col.categories is cols[0].categories for col in cols):
+        return [col.codes for col in cols], cols[0].categories
+    categories = np.unique(np.concatenate([col.categories for col in cols]))
+    dtype = code_dtype(len(categories))
+    codes = [np.searchsorted(categories, col.categories).astype(dtype)[col.codes]
+             for col in cols]
+    return codes, categories
+
+
+def _materialize(value):
+    """Replace Categoricals, also inside lists and tuples, by numpy arrays.
+    """
+    if isinstance(value, Categorical):
+        return np.asarray(value)
+    if isinstance(value, (list, tuple)):
+        return type(value)(_materialize(v) for v in value)
+    return value
+
+
+def _concatenate(arrays, axis=0, out=None, **kwargs):
+    """np.concatenate for Categoricals and string arrays
+    """
+    if axis != 0 or out is not None or kwargs or \
+            not all(isinstance(arr, Categorical) or np.asarray(arr).dtype.kind in {'U', 'S'}
+                    for arr in arrays):
+        return NotImplemented
+    cols = [arr if isinstance(arr, Categorical) else Categorical.from_array(arr)
+            for arr in arrays]
+    codes, categories = unify(cols)
+    return Categorical(np.concatenate(codes), categories)
+
+
+def _delete(arr, obj, axis=None):
+    """np.delete on the codes
+    """
+    return Categorical(np.delete(arr.codes, obj, axis=axis), arr.categories)
+
+
+def _lexsort(keys, axis=-1):
+    """np.lexsort on codes, which sort like the values
+    """
+    return np.lexsort([key.codes if isinstance(key, Categorical) else key for key in keys],
+                      axis=axis)
+
+
+def _argsort(a, axis=-1, kind=None, order=None):
+    """np.argsort on the codes
+    """
+    return np.argsort(a.codes, axis=axis, kind=kind, order=order)
+
+
+def _unique(ar, return_index=False, return_inverse=False, return_counts=False, axis=None,
+            **kwargs):
+    """np.unique on the codes, the uniques are returned as Categorical
+    """
+    result = np.unique(ar.codes, return_index, return_inverse, return_counts, axis, **kwargs)
+    if isinstance(result, tuple):
+        return (Categorical(result[0], ar.categories),) + result[1:]
+    return Categorical(result, ar.categories)
+
+
+def _isin(element, test_elements, assume_unique=False, invert=False):
+    """np.isin, testing the categories only
+    """
+    return np.isin(element.categories, _materialize(test_elements), assume_unique,
+                   invert)[element.codes]
+
+
+_ARRAY_FUNCTIONS = {np.concatenate: _concatenate, np.delete: _delete, np.lexsort: _lexsort,
+                    np.argsort: _argsort, np.unique: _unique, np.isin: _isin}
+
+
+class Categorical(object):
+    """String column stored as integer codes into a dictionary of categories.
+
+    The categories are sorted and unique, code order is value order. Sorting,
+    comparing with a string, grouping and joining work on the integer codes.
+    Getting a single element returns the string, slicing returns a Categorical
+    with a view of the codes sharing the categories, like a numpy slice:
+    setting an existing category in a slice sets it in the column. Setting a
+    new category in a slice raises a ValueError, set it in the column, which
+    re-encodes its codes and detaches existing slices. Numpy functions
+    without a dedicated implementation get the decoded string array.
+
+    Parameters:
+        codes (numpy.ndarray) :
+            integer index into `categories` for every row.
+        categories (numpy.ndarray) :
+            sorted unique string values.
+
+    Examples:
+        >>> col = Categorical.from_array(['nl', 'be', 'nl', 'de'])
+        >>> col.categories
+        array(['be', 'de', 'nl'], dtype='<U2')
+        >>> col.codes
+        array([2, 0, 2, 1], dtype=int8)
+        >>> col == 'nl'
+        array([ True, False,  True, False])
+    """
+    ndim = 1
+    __hash__ = None
+
+    def __init__(self, codes, categories):
+        self.codes = np.asarray(codes)
+        self.categories = np.asarray(categories)
+        self._view = False
+
+    @classmethod
+    def from_array(cls, values):
+        """Return the Categorical encoding the values of an array or list.
+        """
+        if isinstance(values, Categorical):
+            return values
+        categories, codes = np.unique(np.asarray(values), return_inverse=True)
+        return cls(codes.astype(code_dtype(len(categories))), categories)
+
+    @property
+    def dtype(self):
+        """numpy.dtype: dtype of the decoded values.
+        """
+        return self.categories.dtype
+
+    @property
+    def shape(self):
+        """tuple: shape of the column.
+        """
+        return self.codes.shape
+
+    @property
+    def size(self):
+        """int: number of elements.
+        """
+        return self.codes.size
+
+    @property
+    def nbytes(self):
+        """int: memory used by codes and categories.
+        """
+        return self.codes.nbytes + self.categories.nbytes
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __array__(self, dtype=None):
+        values = self.categories[self.codes]
+        return values if dtype is None else values.astype(dtype)
+
+    def __array_function__(self, func, types, args, kwargs):
+        handler = _ARRAY_FUNCTIONS.get(func)
+        if handler is not None:
+            result = handler(*args, **kwargs)
+            if result is not NotImplemented:
+                return result
+        return func(*_materialize(args), **{k: _materialize(v) for k, v in kwargs.items()})
+
+    def __iter__(self):
+        return iter(np.asarray(self))
+
+    def __getitem__(self, key):
+        codes = self.codes[key]
+        if np.ndim(codes) == 0:
+            return self.categories[codes]
+        col = Categorical(codes, self.categories)
+        col._view = np.may_share_memory(codes, self.codes)  # pylint: disable=protected-access
+        return col
+
+    def __setitem__(self, key, value):
+        values = value.categories[value.codes] if isinstance(value, Categorical) \
+            else np.asarray(value)
+        if values.dtype.kind not in {'U', 'S'}:
+            values = values.astype(self.categories.dtype.kind)
+        pos = np.searchsorted(self.categories, values)
+        last = max(len(self.categories) - 1, 0)
+        if not len(self.categories) or \
+                not np.all(self.categories[np.minimum(pos, last)] == values):
+            if getattr(self, "_view", False):
+                raise ValueError("New categories {} in a slice of a categorical column, set "
+                                 "them in the column itself".format(
+                                     sorted(set(np.atleast_1d(values)) - set(self.categories))))
+            categories = np.union1d(self.categories, values)
+            self.codes = np.searchsorted(categories, self.categories).astype(
+                code_dtype(len(categories)))[self.codes]
+            self.categories = categories
+            pos = np.searchsorted(categories, values)
+        self.codes[key] = pos
+
+    def _position(self, value, side='left'):
+        """Return where `value` would go in the categories, None if not a string
+        """
+        if isstring(value) or isinstance(value, (bytes, np.bytes_)):
+            return np.searchsorted(self.categories, value, side)
+        return None
+
+    def _compare(self, other, fie, side, codes_fie):
+        """Compare with a string on the codes, with anything else decoded
+        """
+        if isinstance(other, Categorical):
+            (codes, other_codes), _ = unify([self, other])
+            return fie(codes, other_codes)
+        pos = self._position(other, side)
+        if pos is None:
+            return fie(np.asarray(self), other)
+        return codes_fie(pos)
+
+    def __eq__(self, other):
+        def equal(pos):
+            if pos < len(self.categories) and self.categories[pos] == other:
+                return self.codes == pos
+            return np.zeros(len(self), dtype=bool)
+        return self._compare(other, np.equal, 'left', equal)
+
+    def __ne__(self, other):
+        result = self == other
+        return ~result if isinstance(result, np.ndarray) else not result
+
+    def __lt__(self, other):
+        return self._compare(other, np.less, 'left', lambda pos: self.codes < pos)
+
+    def __le__(self, other):
+        return self._compare(other, np.less_equal, 'right', lambda pos: self.codes < pos)
+
+    def __gt__(self, other):
+        return self._compare(other, np.greater, 'right', lambda pos: self.codes >= pos)
+
+    def __ge__(self, other):
+        return self._compare(other, np.greater_equal, 'left', lambda pos: self.codes >= pos)
+
+    def astype(self, dtype, copy=True):                 # pylint: disable=unused-argument
+        """Return the decoded values as numpy array of `dtype`.
+        """
+        return np.asarray(self).astype(dtype)
+
+    def copy(self):
+        """Return a copy, sharing the (read-only) categories.
+        """
+        return Categorical(self.codes.copy(), self.categories)
+
+    def tolist(self):
+        """Return the decoded values as list.
+        """
+        return np.asarray(self).tolist()
+
+    def __repr__(self):
+        return "Categorical({}, categories={})".format(np.asarray(self), self.categories)
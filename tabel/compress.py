@@ -0,0 +1,388 @@
+#!/usr/bin/env python
+"""
+.. module:: tabel.compress
+.. moduleauthor:: Bastiaan Bergman <Bastiaan.Bergman@gmail.com>
+
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import gzip
+import io
+import struct
+import time
+import zlib
+from collections import deque
+import numpy as np
+from .util import ImpError
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+    FUTURES_PRESENT = True
+except ImpError:
+    FUTURES_PRESENT = False
+
+COMPRESS_BLOCK_SIZE = 2**22
+"""int: Number of bytes compressed per task when compressing in threads."""
+
+ZIP64_LIMIT = 2**31 - 1
+"""int: Sizes and offsets beyond which zip64 extensions are written."""
+
+_GZIP_HEADER = struct.Struct(str("<2sBBIBBH2sHI"))
+_GZIP_EXTRA_ID = b"TB"
+_ZIP_LOCAL = struct.Struct(str("<4sHHHHHIIIHH"))
+_ZIP_CENTRAL = struct.Struct(str("<4sBBBBHHHHIIIHHHHHII"))
+_ZIP_END = struct.Struct(str("<4sHHHHIIH"))
+_ZIP64_END = struct.Struct(str("<4sQHHIIQQQQ"))
+_ZIP64_LOCATOR = struct.Struct(str("<4sIQI"))
+
+
+def thread_pool(threads):
+    """Return a thread pool executor with `threads` workers.
+    """
+    if not FUTURES_PRESENT:
+        raise ImpError("concurrent.futures is needed for threads > 1")
+    return ThreadPoolExecutor(threads)
+
+
+def _ordered_results(executor, tasks, threads):
+    """Submit (function, args) tasks and yield their results in order.
+
+    At most 2 * `threads` tasks are pending at any time, bounding the memory
+    held by results not yet consumed.
+    """
+    pending = deque()
+    for fie, args in tasks:
+        pending.append(executor.submit(fie, *args))
+        if len(pending) >= 2 * threads:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def gzip_member(block, level=9):
+    """Compress `block` into a complete gzip member.
+
+    The gzip header carries an extra field with the size of the member, such
+    that the members of a file can be found and decompressed independently.
+    """
+    comp = zlib.compressobj(level, zlib.DEFLATED, -15)
+    body = comp.compress(block) + comp.flush()
+    size = _GZIP_HEADER.size + len(body) + 8
+    head = _GZIP_HEADER.pack(b"\x1f\x8b", 8, 4, 0, 0, 255, 8, _GZIP_EXTRA_ID, 4, size)
+    tail = struct.pack(str("<II"), zlib.crc32(block) & 0xffffffff, len(block) & 0xffffffff)
+    return head + body + tail
+
+
+def gzip_members(filename):
+    """Return the (offset, size) of all members of a gzip file.
+
+    Returns None if the file was not written by `ParallelGzipWriter`, i.e. the
+    members do not carry their size.
+    """
+    members = []
+    with open(filename, 'rb') as f:
+        offset = 0
+        while True:
+            head = f.read(_GZIP_HEADER.size)
+            if not head:
+                return members or None
+            if len(head) < _GZIP_HEADER.size:
+                return None
+            magic, _, flags, _, _, _, _, extra_id, _, size = _GZIP_HEADER.unpack(head)
+            if magic != b"\x1f\x8b" or not flags & 4 or extra_id != _GZIP_EXTRA_ID:
+                return None
+            members.append((offset, size))
+            offset += size
+            f.seek(offset)
+
+
+class ParallelGzipWriter(io.RawIOBase):
+    """Binary file object writing a multi-member gzip file.
+
+    Written data is cut into blocks of `block_size` bytes that are compressed
+    concurrently into independent gzip members. zlib releases the GIL, such
+    that compression runs on `threads` cores.
+
+    Parameters:
+        filename (str) :
+            file to write.
+        threads (int) :
+            number of compression threads.
+        level (int) :
+            zlib compression level.
+        block_size (int) :
+            number of uncompressed bytes per gzip member.
+    """
+
+    def __init__(self, filename, threads, level=9, block_size=COMPRESS_BLOCK_SIZE):
+        io.RawIOBase.__init__(self)
+        self.threads = threads
+        self.level = level
+        self.block_size = block_size
+        self._executor = thread_pool(threads)
+        self._pending = deque()
+        self._buffer = bytearray()
+        self._f = open(filename, 'wb')
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._buffer += b
+        while len(self._buffer) >= self.block_size:
+            self._submit()
+        return len(b)
+
+    def _submit(self):
+        block = bytes(self._buffer[:self.block_size])
+        del self._buffer[:self.block_size]
+        self._pending.append(self._executor.submit(gzip_member, block, self.level))
+        while len(self._pending) >= 2 * self.threads:
+            self._f.write(self._pending.popleft().result())
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._buffer:
+                self._submit()
+            while self._pending:
+                self._f.write(self._pending.popleft().result())
+        finally:
+            self._executor.shutdown()
+            self._f.close()
+            io.RawIOBase.close(self)
+
+
+class ParallelGzipReader(io.RawIOBase):
+    """Binary file object reading a gzip file written by `ParallelGzipWriter`.
+
+    The members are decompressed concurrently, ahead of reading.
+
+    Parameters:
+        filename (str) :
+            file to read.
+        threads (int) :
+            number of decompression threads.
+        members (list) :
+            (offset, size) of the members, see `gzip_members`.
+    """
+
+    def __init__(self, filename, threads, members=None):
+        io.RawIOBase.__init__(self)
+        self.threads = threads
+        self._members = gzip_members(filename) if members is None else members
+        self._executor = thread_pool(threads)
+        self._f = open(filename, 'rb')
+        self._reset()
+
+    def _reset(self):
+        self._pending = deque()
+        self._next = 0
+        self._chunk = b""
+        self._pos = 0
+        self._offset = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if offset == 0 and whence == io.SEEK_CUR:
+            return self._offset
+        if offset == 0 and whence == io.SEEK_SET:
+            for fut in self._pending:
+                fut.cancel()
+            self._reset()
+            return 0
+        raise io.UnsupportedOperation("Can only seek to the start of the file.")
+
+    def tell(self):
+        return self._offset
+
+    def _fill(self):
+        while self._next < len(self._members) and len(self._pending) < 2 * self.threads:
+            offset, size = self._members[self._next]
+            self._f.seek(offset)
+            self._pending.append(self._executor.submit(zlib.decompress, self._f.read(size), 31))
+            self._next += 1
+        if not self._pending:
+            return False
+        self._chunk = self._pending.popleft().result()
+        self._pos = 0
+        return True
+
+    def readinto(self, b):
+        while self._pos >= len(self._chunk):
+            if not self._fill():
+                return 0
+        n = min(len(b), len(self._chunk) - self._pos)
+        b[:n] = self._chunk[self._pos:self._pos + n]
+        self._pos += n
+        self._offset += n
+        return n
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            for fut in self._pending:
+                fut.cancel()
+            self._executor.shutdown()
+            self._f.close()
+        finally:
+            io.RawIOBase.close(self)
+
+
+def open_gzip(filename, mode, threads=1):
+    """Open a gzip file in text mode, compressing or decompressing in threads.
+
+    Arguments:
+        filename (str) :
+            file to open.
+        mode (str) :
+            'rt' or 'wt'.
+        threads (int) :
+            number of threads, 1 to use the `gzip` module. Files not written
+            with threads are always read with the `gzip` module.
+    """
+    if threads > 1 and mode == 'wt':
+        return io.TextIOWrapper(io.BufferedWriter(ParallelGzipWriter(filename, threads)))
+    if threads > 1 and mode == 'rt':
+        members = gzip_members(filename)
+        if members:
+            return io.TextIOWrapper(io.BufferedReader(ParallelGzipReader(filename, threads,
+                                                                         members)))
+    return gzip.open(filename, mode)
+
+
+def _npy_blocks(arr, block_size):
+    """Return the contents of the .npy file of `arr` as a list of buffers.
+
+    The array data is not copied, except for object arrays which are pickled.
+    """
+    if arr.dtype.hasobject:
+        f = io.BytesIO()
+        np.lib.format.write_array(f, arr)
+        return [f.getvalue()]
+    arr = np.ascontiguousarray(arr)
+    f = io.BytesIO()
+    _write_npy_header(f, arr)
+    data = arr.reshape(-1).view(np.uint8)
+    return [f.getvalue()] + [data[i:i + block_size] for i in range(0, len(data), block_size)]
+
+
+def _write_npy_header(f, arr):
+    """Write the .npy header for `arr`, using format version 2.0 only if needed.
+    """
+    header = np.lib.format.header_data_from_array_1_0(arr)
+    try:
+        np.lib.format.write_array_header_1_0(f, header)
+    except ValueError:
+        np.lib.format.write_array_header_2_0(f, header)
+
+
+def _deflate(block, level, last):
+    """Compress `block` into raw deflate data that can be concatenated.
+    """
+    comp = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return comp.compress(block) + comp.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def _dos_date_time():
+    """Return the current time as zip (MS-DOS) date and time fields.
+    """
+    t = time.localtime()
+    return ((t.tm_year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday,
+            t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2)
+
+
+def savez_compressed(filename, columns, data, threads, level=6, block_size=COMPRESS_BLOCK_SIZE):
+    """Save columns as a compressed npz file, compressing in threads.
+
+    Writes the same format as `numpy.savez_compressed`. Each .npy member is cut
+    into blocks that are deflated concurrently and concatenated into a single
+    deflate stream per member.
+
+    Arguments:
+        filename (str) :
+            file to write.
+        columns (list) :
+            column names, the member names without .npy extension.
+        data (list) :
+            column arrays.
+        threads (int) :
+            number of compression threads.
+        level (int) :
+            zlib compression level.
+        block_size (int) :
+            number of uncompressed bytes compressed per task.
+    """
+    if not filename.endswith(".npz"):
+        filename += ".npz"
+    date, tim = _dos_date_time()
+    entries = []
+    with open(filename, 'wb') as f, thread_pool(threads) as executor:
+        for col, arr in zip(columns, data):
+            name = "{}.npy".format(col).encode("utf-8")
+            flags = 0x800 if any(c > 127 for c in bytearray(name)) else 0
+            blocks = _npy_blocks(np.asanyarray(arr), block_size)
+            usize = sum(len(blk) for blk in blocks)
+            zip64 = usize * 1.05 > ZIP64_LIMIT
+            offset = f.tell()
+            extra = struct.pack(str("<HHQQ"), 1, 16, usize, 0) if zip64 else b""
+            f.write(_ZIP_LOCAL.pack(b"PK\x03\x04", 45 if zip64 else 20, flags, 8, tim, date,
+                                    0, 0, 0, len(name), len(extra)) + name + extra)
+            start = f.tell()
+            crc = 0
+            tasks = [(_deflate, (blk, level, i == len(blocks) - 1)) for i, blk in enumerate(blocks)]
+            for blk, comp in zip(blocks, _ordered_results(executor, tasks, threads)):
+                crc = zlib.crc32(blk, crc)
+                f.write(comp)
+            crc &= 0xffffffff
+            csize = f.tell() - start
+            if csize > ZIP64_LIMIT and not zip64:
+                raise ValueError("Column {} does not compress into a zip member.".format(col))
+            f.seek(offset)
+            if zip64:
+                extra = struct.pack(str("<HHQQ"), 1, 16, usize, csize)
+                f.write(_ZIP_LOCAL.pack(b"PK\x03\x04", 45, flags, 8, tim, date, crc,
+                                        0xffffffff, 0xffffffff, len(name), len(extra)))
+            else:
+                f.write(_ZIP_LOCAL.pack(b"PK\x03\x04", 20, flags, 8, tim, date, crc,
+                                        csize, usize, len(name), 0))
+            f.seek(0, io.SEEK_END)
+            entries.append((name, flags, crc, csize, usize, offset))
+        _write_zip_directory(f, entries, date, tim)
+
+
+def _write_zip_directory(f, entries, date, tim):
+    """Write the zip central directory and end records for the entries.
+    """
+    cd_offset = f.tell()
+    for name, flags, crc, csize, usize, offset in entries:
+        zip64_fields = [v for v in (usize, csize, offset) if v > ZIP64_LIMIT]
+        extra = b""
+        if zip64_fields:
+            extra = struct.pack(str("<HH"), 1, 8 * len(zip64_fields)) + \
+                struct.pack(str("<{}Q".format(len(zip64_fields))), *zip64_fields)
+        version = 45 if zip64_fields else 20
+        f.write(_ZIP_CENTRAL.pack(b"PK\x01\x02", version, 3, version, 0, flags, 8, tim, date,
+                                  crc, csize if csize <= ZIP64_LIMIT else 0xffffffff,
+                                  usize if usize <= ZIP64_LIMIT else 0xffffffff,
+                                  len(name), len(extra), 0, 0, 0, 0o600 << 16,
+                                  offset if offset <= ZIP64_LIMIT else 0xffffffff))
+        f.write(name + extra)
+    cd_size = f.tell() - cd_offset
+    n = len(entries)
+    if n >= 0xffff or cd_offset > ZIP64_LIMIT or cd_size > ZIP64_LIMIT:
+        end64_offset = f.tell()
+        f.write(_ZIP64_END.pack(b"PK\x06\x06", _ZIP64_END.size - 12, 45, 45, 0, 0, n, n,
+                                cd_size, cd_offset))
+        f.write(_ZIP64_LOCATOR.pack(b"PK\x06\x07", 0, end64_offset, 1))
+        f.write(_ZIP_END.pack(b"PK\x05\x06", 0, 0, min(n, 0xffff), min(n, 0xffff),
+                              min(cd_size, 0xffffffff), min(cd_offset, 0xffffffff), 0))
+    else:
+        f.write(_ZIP_END.pack(b"PK\x05\x06", 0, 0, n, n, cd_size, cd_offset, 0))
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+.. module:: tabel.executor
+.. moduleauthor:: Bastiaan Bergman <Bastiaan.Bergman@gmail.com>
+
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import threading
+from .compress import thread_pool
+
+COLUMN_MIN_BYTES = 2**22
+"""int: Total size of the columns below which per-column operations stay serial."""
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def column_pool(threads):
+    """Return the shared thread pool with `threads` workers, created once.
+    """
+    with _POOLS_LOCK:
+        if threads not in _POOLS:
+            _POOLS[threads] = thread_pool(threads)
+        return _POOLS[threads]
+
+
+def _nbytes(arr):
+    """Size of a column in bytes, without loading lazy columns.
+    """
+    return len(arr) * arr.dtype.itemsize or getattr(arr, "nbytes", 0)
+
+
+def column_map(fie, arrays, *iterables, **kwargs):
+    """Apply `fie` to every column, in threads when worthwhile
+
+    numpy releases the GIL in its copying kernels (taking, deleting, casting),
+    such that the columns of a wide Tabel can be processed concurrently.
+
+    Arguments:
+        fie (callable) :
+            function called with a column, followed by the matching elements
+            of `iterables`.
+        arrays (list) :
+            the columns.
+        iterables :
+            more arguments per column, like `map`.
+        threads (int) :
+            keyword only, number of threads. Serial if 1, if there is a single
+            column, or if the columns together are smaller than
+            `COLUMN_MIN_BYTES`.
+
+    Returns:
+        list of the results, in the order of the columns.
+    """
+    threads = kwargs.pop("threads", 1)
+    if kwargs:
+        raise TypeError("Unexpected arguments: {}".format(list(kwargs)))
+    arrays = list(arrays)
+    if threads is None or threads <= 1 or len(arrays) < 2 or \
+            sum(_nbytes(arr) for arr in arrays) < COLUMN_MIN_BYTES:
+        return list(map(fie, arrays, *iterables))
+    return list(column_pool(threads).map(fie, arrays, *iterables))
@@ -0,0 +1,485 @@
+#!/usr/bin/env python
+"""
+.. module:: tabel.expr
+.. moduleauthor:: Bastiaan Bergman <Bastiaan.Bergman@gmail.com>
+
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import ast
+import io
+import operator
+import tokenize
+import numpy as np
+from .categorical import Categorical
+from .strings import StringColumn
+from .util import ImpError
+
+try:
+    import numexpr
+    NUMEXPR_PRESENT = True
+except ImpError:
+    NUMEXPR_PRESENT = False
+
+EXPR_BLOCK_ROWS = 2**16
+"""int: Number of rows evaluated at once, keeping the temporaries in cache."""
+
+_BIN_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+            ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+            ast.Pow: operator.pow}
+_BIN_SYMBOLS = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/", ast.Mod: "%",
+                ast.Pow: "**"}
+_UNARY_OPS = {ast.USub: operator.neg, ast.UAdd: operator.pos, ast.Not: np.logical_not,
+              ast.Invert: np.invert}
+_UNARY_SYMBOLS = {ast.USub: "-", ast.UAdd: "+", ast.Not: "~", ast.Invert: "~"}
+_COMPARE_OPS = {ast.Gt: operator.gt, ast.GtE: operator.ge, ast.Lt: operator.lt,
+                ast.LtE: operator.le, ast.Eq: operator.eq, ast.NotEq: operator.ne}
+_COMPARE_SYMBOLS = {ast.Gt: ">", ast.GtE: ">=", ast.Lt: "<", ast.LtE: "<=", ast.Eq: "==",
+                    ast.NotEq: "!="}
+FUNCTIONS = {"abs": np.abs, "sqrt": np.sqrt, "exp": np.exp, "log": np.log,
+             "log10": np.log10, "sin": np.sin, "cos": np.cos, "tan": np.tan,
+             "arcsin": np.arcsin, "arccos": np.arccos, "arctan": np.arctan,
+             "arctan2": np.arctan2, "where": np.where, "floor": np.floor, "ceil": np.ceil,
+             "isnan": np.isnan, "minimum": np.minimum, "maximum": np.maximum}
+"""dict: Functions that can be called in expressions."""
+_NUMEXPR_FUNCTIONS = {"abs", "sqrt", "exp", "log", "log10", "sin", "cos", "tan", "arcsin",
+                      "arccos", "arctan", "arctan2", "where"}
+_NUMEXPR_DTYPES = {np.dtype(bool), np.dtype(np.int32), np.dtype(np.int64), np.dtype(np.float32),
+                   np.dtype(np.float64)}
+
+
+class _Unsupported(Exception):
+    """Raised when an expression cannot be translated for numexpr."""
+
+
+def _logical_tokens(expr):
+    """Replace the & and | operators by and and or
+
+    Gives them a lower precedence than comparisons, such that "a > 3 & b == 'x'"
+    reads as "(a > 3) & (b == 'x')". They are still evaluated bitwise on
+    integers, see `_logical`. `~` keeps its precedence, as in numpy.
+    """
+    mapping = {"&": "and", "|": "or"}
+    tokens = []
+    for tok in tokenize.generate_tokens(io.StringIO(expr).readline):
+        if tok[0] == tokenize.OP and tok[1] in mapping:
+            tokens.append((tokenize.NAME, mapping[tok[1]]))
+        else:
+            tokens.append((tok[0], tok[1]))
+    return tokenize.untokenize(tokens)
+
+
+def _positioned_tokens(expr):
+    """Return the tokens of `expr` as (type, string, offset) tuples.
+    """
+    offsets = [0]
+    for line in io.StringIO(expr).readlines():
+        offsets.append(offsets[-1] + len(line))
+    return [(tok[0], tok[1], offsets[tok[2][0] - 1] + tok[2][1])
+            for tok in tokenize.generate_tokens(io.StringIO(expr).readline)]
+
+
+def rename_columns(expr, mapping):
+    """Return the expression with column names replaced according to `mapping`.
+    """
+    replacements = []
+    prev = None
+    for tok_type, string, start in _positioned_tokens(expr):
+        if tok_type == tokenize.NAME and string in mapping and prev != ".":
+            replacements.append((start, start + len(string), mapping[string]))
+        prev = string
+    for start, stop, name in reversed(replacements):
+        expr = expr[:start] + name + expr[stop:]
+    return expr
+
+
+def split_conjunction(expr):
+    """Split "e1 & e2 & ..." into the list of expressions [e1, e2, ...].
+
+    Only the outermost `&` (or `and`) operators split, expressions that also
+    hold an outermost `|` (or `or`) are returned whole.
+    """
+    depth, cuts = 0, []
+    for tok_type, string, start in _positioned_tokens(expr):
+        if tok_type == tokenize.OP and string in "([{":
+            depth += 1
+        elif tok_type == tokenize.OP and string in ")]}":
+            depth -= 1
+        elif depth == 0 and string in ("|", "or"):
+            return [expr.strip()]
+        elif depth == 0 and string in ("&", "and"):
+            cuts.append((start, start + len(string)))
+    parts, prev = [], 0
+    for start, stop in cuts + [(len(expr), len(expr))]:
+        parts.append(expr[prev:start].strip())
+        prev = stop
+    return parts
+
+
+def _constant(node):
+    """Return (True, value) if node is a literal, (False, None) otherwise.
+    """
+    if type(node).__name__ == "Constant":
+        return True, node.value
+    if type(node).__name__ in ("Num", "Str", "Bytes", "NameConstant"):
+        return True, getattr(node, "value", getattr(node, "n", getattr(node, "s", None)))
+    if isinstance(node, (ast.List, ast.Tuple)):
+        values = [_constant(elt) for elt in node.elts]
+        if all(is_const for is_const, _ in values):
+            return True, [value for _, value in values]
+    return False, None
+
+
+class Expression(object):
+    """An expression on the columns of a Tabel, parsed once.
+
+    Supports column names, numbers, strings, arithmetic, comparisons (also
+    chained), `in` and `not in` with a list of values, `&` and `|` (or `and`
+    and `or`) as element-wise operators with lower precedence than
+    comparisons, `~` with its numpy precedence and `not`, and the functions in
+    `FUNCTIONS`. On integers `&`, `|` and `~` are bitwise, as in numpy. An
+    assignment `name = expression` defines a computed column.
+
+    Parameters:
+        expr (str) :
+            the expression.
+    """
+
+    def __init__(self, expr):
+        self.expr = expr
+        try:
+            tree = ast.parse(_logical_tokens(expr).strip(), mode="exec")
+        except (SyntaxError, tokenize.TokenError) as e:
+            raise ValueError("Invalid expression {!r}: {}".format(expr, e))
+        if len(tree.body) != 1:
+            raise ValueError("Invalid expression {!r}: a single expression expected".format(expr))
+        stmt = tree.body[0]
+        self.target = None
+        if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1 and \
+                isinstance(stmt.targets[0], ast.Name):
+            self.target = stmt.targets[0].id
+        elif not isinstance(stmt, ast.Expr):
+            raise ValueError("Invalid expression {!r}: not an expression or assignment"
+                             .format(expr))
+        self.names = set()
+        self._node = stmt.value
+        self._fie = self._compile(self._node)
+
+    def _compile(self, node):
+        """Compile a node into a function of a dict of name: array
+        """
+        # pylint: disable=too-many-return-statements
+        is_const, value = _constant(node)
+        if is_const:
+            return lambda env: value
+        if isinstance(node, ast.Name):
+            name = node.id
+            self.names.add(name)
+            return lambda env: env[name]
+        if isinstance(node, ast.BinOp) and type(node.op) in _BIN_OPS:
+            fie, left, right = _BIN_OPS[type(node.op)], self._compile(node.left), \
+                self._compile(node.right)
+            return lambda env: fie(left(env), right(env))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+            fie, operand = _UNARY_OPS[type(node.op)], self._compile(node.operand)
+            return lambda env: fie(operand(env))
+        if isinstance(node, ast.BoolOp):
+            fie = _logical(np.logical_and, np.bitwise_and) if isinstance(node.op, ast.And) \
+                else _logical(np.logical_or, np.bitwise_or)
+            values = [self._compile(v) for v in node.values]
+            return lambda env: _reduce(fie, [v(env) for v in values])
+        if isinstance(node, ast.Compare):
+            return self._compile_compare(node)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and \
+                node.func.id in FUNCTIONS and not node.keywords:
+            fie, args = FUNCTIONS[node.func.id], [self._compile(a) for a in node.args]
+            return lambda env: fie(*[a(env) for a in args])
+        raise ValueError("Unsupported in expression {!r}: {}".format(
+            self.expr, type(node).__name__))
+
+    def _compile_compare(self, node):
+        """Compile a (chained) comparison
+        """
+        operands = [self._compile(node.left)] + [self._compile(c) for c in node.comparators]
+        comparisons = []
+        for i, op in enumerate(node.ops):
+            if type(op) in _COMPARE_OPS:
+                comparisons.append((_COMPARE_OPS[type(op)], i))
+            elif isinstance(op, (ast.In, ast.NotIn)):
+                comparisons.append((np.isin if isinstance(op, ast.In) else _not_isin, i))
+            else:
+                raise ValueError("Unsupported comparison in expression {!r}".format(self.expr))
+
+        def compare(env):
+            values = [operand(env) for operand in operands]
+            return _reduce(np.logical_and, [fie(values[i], values[i + 1])
+                                            for fie, i in comparisons])
+        return compare
+
+    def evaluate(self, columns, n_rows, engine=None, block_rows=None):
+        """Evaluate the expression
+
+        Arguments:
+            columns (dict) :
+                name: array for the names in the expression, arrays of length
+                `n_rows`, other values are used as they are.
+            n_rows (int) :
+                number of rows.
+            engine (str or None) :
+                'numexpr', 'numpy' or None to use numexpr when it is installed
+                and supports the expression and the dtypes of its operands.
+            block_rows (int) :
+                number of rows evaluated at once by the numpy engine.
+
+        Returns:
+            numpy.ndarray of length `n_rows`.
+        """
+        missing = self.names - set(columns)
+        if missing:
+            raise KeyError("Unknown names in expression {!r}: {}".format(
+                self.expr, sorted(missing)))
+        if engine in (None, "numexpr") and NUMEXPR_PRESENT:
+            try:
+                ne_expr = self._numexpr(self._node, _numexpr_kinds(columns, self.names))
+            except _Unsupported:
+                if engine == "numexpr":
+                    raise ValueError("Expression not supported by numexpr: {!r}".format(self.expr))
+            else:
+                result = numexpr.evaluate(ne_expr, local_dict={n: columns[n] for n in self.names})
+                return np.broadcast_to(result, (n_rows,)).copy() if result.ndim == 0 else result
+        elif engine == "numexpr":
+            raise ImpError("numexpr is not installed")
+        elif engine not in (None, "numpy"):
+            raise ValueError("Unknown engine: {}".format(engine))
+        return self._evaluate_blocks(columns, n_rows, block_rows or EXPR_BLOCK_ROWS)
+
+    def _evaluate_blocks(self, columns, n_rows, block_rows):
+        """Evaluate block by block with numpy, into one output array
+        """
+        arrays = {n: v for n, v in columns.items() if n in self.names and
+                  isinstance(v, (np.ndarray, Categorical, StringColumn)) and
+                  v.ndim == 1 and len(v) == n_rows}
+        scalars = {n: v for n, v in columns.items() if n in self.names and n not in arrays}
+        out = None
+        for start in range(0, max(n_rows, 1), block_rows):
+            stop = min(start + block_rows, n_rows)
+            env = dict(scalars)
+            env.update((n, v[start:stop]) for n, v in arrays.items())
+            block = np.broadcast_to(self._fie(env), (stop - start,))
+            if out is None:
+                out = np.empty(n_rows, dtype=block.dtype)
+            out[start:stop] = block
+        return out
+
+    def _numexpr(self, node, kinds):
+        """Translate a node into a numexpr expression string
+
+        `kinds` holds the dtype kind of each name, numexpr supports the
+        logical operators on booleans only.
+        """
+        # pylint: disable=too-many-return-statements
+        is_const, value = _constant(node)
+        if is_const:
+            if isinstance(value, (bool, int, float)):
+                return repr(value)
+            raise _Unsupported()
+        if isinstance(node, ast.Name):
+            return node.id
+        if isinstance(node, ast.BinOp) and type(node.op) in _BIN_SYMBOLS:
+            return "({} {} {})".format(self._numexpr(node.left, kinds),
+                                       _BIN_SYMBOLS[type(node.op)],
+                                       self._numexpr(node.right, kinds))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_SYMBOLS:
+            if _UNARY_SYMBOLS[type(node.op)] == "~" and not _is_boolean(node.operand, kinds):
+                raise _Unsupported()
+            return "({}{})".format(_UNARY_SYMBOLS[type(node.op)],
+                                   self._numexpr(node.operand, kinds))
+        if isinstance(node, ast.BoolOp):
+            if not all(_is_boolean(v, kinds) for v in node.values):
+                raise _Unsupported()
+            symbol = " & " if isinstance(node.op, ast.And) else " | "
+            return "({})".format(symbol.join(self._numexpr(v, kinds) for v in node.values))
+        if isinstance(node, ast.Compare) and all(type(op) in _COMPARE_SYMBOLS
+                                                  for op in node.ops):
+            operands = [node.left] + list(node.comparators)
+            return "({})".format(" & ".join(
+                "({} {} {})".format(self._numexpr(operands[i], kinds),
+                                    _COMPARE_SYMBOLS[type(op)],
+                                    self._numexpr(operands[i + 1], kinds))
+                for i, op in enumerate(node.ops)))
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and \
+                node.func.id in _NUMEXPR_FUNCTIONS and not node.keywords:
+            if node.func.id == "abs" and not all(_is_float(a, kinds) for a in node.args):
+                raise _Unsupported()    # numexpr returns floats for abs of integers
+            return "{}({})".format(node.func.id,
+                                   ", ".join(self._numexpr(a, kinds) for a in node.args))
+        raise _Unsupported()
+
+
+def _numexpr_kinds(columns, names):
+    """Return the dtype kind of each of `names` in `columns`
+
+    Raises _Unsupported if a value is not of a dtype numexpr computes in, e.g.
+    strings, Categoricals, StringColumns or small integers that numexpr would
+    upcast.
+    """
+    kinds = {}
+    for name in names:
+        value = columns[name]
+        if not isinstance(value, (np.ndarray, np.generic, bool, int, float)):
+            raise _Unsupported()
+        dtype = np.asarray(value).dtype
+        if dtype not in _NUMEXPR_DTYPES:
+            raise _Unsupported()
+        kinds[name] = dtype.kind
+    return kinds
+
+
+def _is_float(node, kinds):
+    """Whether a node surely evaluates to floats, judging by its syntax and
+    `kinds`
+    """
+    is_const, value = _constant(node)
+    if is_const:
+        return isinstance(value, float)
+    if isinstance(node, ast.Name):
+        return kinds.get(node.id) == 'f'
+    if isinstance(node, ast.BinOp):
+        return isinstance(node.op, ast.Div) or \
+            _is_float(node.left, kinds) or _is_float(node.right, kinds)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        return _is_float(node.operand, kinds)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        return node.func.id in _NUMEXPR_FUNCTIONS - {"abs", "where"}
+    return False
+
+
+def _is_boolean(node, kinds):
+    """Whether a node evaluates to booleans, judging by its syntax and `kinds`
+    """
+    is_const, value = _constant(node)
+    if is_const:
+        return isinstance(value, bool)
+    if isinstance(node, ast.Name):
+        return kinds.get(node.id) == 'b'
+    if isinstance(node, ast.Compare):
+        return True
+    if isinstance(node, ast.BoolOp):
+        return all(_is_boolean(v, kinds) for v in node.values)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.Invert)):
+        return _is_boolean(node.operand, kinds)
+    return False
+
+
+def _logical(logical, bitwise):
+    """Return a binary function applying `bitwise` to integers and `logical`
+    to anything else, as the & and | operators do on numpy arrays.
+    """
+    def fie(x, y):
+        if np.result_type(x, y).kind in {'i', 'u'}:
+            return bitwise(x, y)
+        return logical(x, y)
+    return fie
+
+
+def _reduce(fie, values):
+    """Apply a binary ufunc over a list of values
+    """
+    result = values[0]
+    for value in values[1:]:
+        result = fie(result, value)
+    return result
+
+
+def _not_isin(element, test_elements):
+    """Element-wise `not in`
+    """
+    return np.logical_not(np.isin(element, test_elements))
+
+
+class ExpressionMixin(object):
+    """Mixin to add to the Tabel class, providing where and eval methods
+    """
+
+    def _eval_columns(self, expression, variables=None):
+        """Return the dict of names to values to evaluate `expression` with
+        """
+        columns = dict(variables or {})
+        columns.update((name, self[name]) for name in expression.names if name in self.columns)
+        return columns
+
+    def where(self, expr, variables=None, engine=None):
+        """Select the rows matching a boolean expression.
+
+        The expression is parsed once and evaluated in blocks of rows (see
+        `tabel.expr.EXPR_BLOCK_ROWS`), keeping the temporaries of the
+        sub-expressions small. When numexpr is installed it evaluates the
+        expression instead, if it supports all of it and the operands are of a
+        numeric dtype numexpr computes in. Expressions on string, Categorical
+        and StringColumn columns are evaluated by numpy.
+
+        Arguments:
+            expr (str) :
+                boolean expression on the columns, see
+                :mod:`tabel.expr.Expression`. `&` and `|` have lower
+                precedence than comparisons.
+            variables (dict) :
+                values for names in the expression that are not columns.
+            engine (str) :
+                'numexpr' or 'numpy' to force an engine.
+
+        Returns:
+            Tabel with the matching rows.
+
+        Examples:
+            >>> tbl = Tabel({'a':[1, 5, 7], 'b':['x', 'x', 'y']})
+            >>> tbl.where("a > 3 & b == 'x'")
+               a | b
+            -----+-----
+               5 | x
+            1 rows ['<i8', '<U1']
+        """
+        expression = Expression(expr)
+        if expression.target is not None:
+            raise ValueError("No assignment allowed in where: {!r}".format(expr))
+        mask = expression.evaluate(self._eval_columns(expression, variables), len(self), engine)
+        if mask.dtype.kind != 'b':
+            raise ValueError("Expression does not evaluate to booleans: {!r}".format(expr))
+        return self[mask, :]
+
+    def eval(self, expr, variables=None, engine=None):
+        """Evaluate an expression on the columns.
+
+        The expression is parsed once and evaluated in blocks of rows, or with
+        numexpr when installed, see :mod:`tabel.Tabel.where`.
+
+        Arguments:
+            expr (str) :
+                expression on the columns, see :mod:`tabel.expr.Expression`.
+                If in the form of an assignment, `"c = a * b + 2"`, the result
+                is set as column `c`.
+            variables (dict) :
+                values for names in the expression that are not columns.
+            engine (str) :
+                'numexpr' or 'numpy' to force an engine.
+
+        Returns:
+            numpy.ndarray with the result, nothing for an assignment.
+
+        Examples:
+            >>> tbl = Tabel({'a':[1, 5, 7], 'b':[.5, 1., 2.]})
+            >>> tbl.eval("c = a * b + 2")
+            >>> tbl
+               a |   b |   c
+            -----+-----+-----
+               1 | 0.5 | 2.5
+               5 | 1   | 7
+               7 | 2   | 16
+            3 rows ['<i8', '<f8', '<f8']
+        """
+        expression = Expression(expr)
+        result = expression.evaluate(self._eval_columns(expression, variables), len(self), engine)
+        if expression.target is None:
+            return result
+        self[expression.target] = result
+        return None
@@ -7,48 +7,398 @@
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 from collections import defaultdict
+import warnings
 import numpy as np
 from .numpy_types import *                          # pylint: disable=wildcard-import
+from .categorical import Categorical, unify
+from .profiling import instrumented, phase
+from .strings import StringColumn, factorize as factorize_strings
 from .util import isstring
 
+def _is_string_kind(arr):
+    """True for unicode and byte string arrays
+    """
+    return arr.dtype.kind in {'U', 'S'}
+
+
+def _factorize_column(col):
+    """Return integer codes and the number of unique elements of one column.
+    """
+    uniques, codes = np.unique(col, return_inverse=True)
+    return codes.astype(np.int64, copy=False), len(uniques)
+
+
+def _key_columns(col_l, col_r):
+    """Return a left and right key column as arrays, the codes of Categoricals
+    in shared categories if both are Categorical, shared sorted codes if both
+    are StringColumn.
+    """
+    if isinstance(col_l, Categorical) and isinstance(col_r, Categorical):
+        return tuple(unify([col_l, col_r])[0])
+    if isinstance(col_l, StringColumn) and isinstance(col_r, StringColumn):
+        return tuple(factorize_strings([col_l, col_r])[0])
+    return np.asarray(col_l), np.asarray(col_r)
+
+
+def _factorize_column_pair(col_l, col_r):
+    """Factorize a left and right column into one shared set of codes.
+    """
+    col_l, col_r = _key_columns(col_l, col_r)
+    if _is_string_kind(col_l) != _is_string_kind(col_r):
+        # strings never equal numbers, keep the codes of both sides apart
+        codes_l, n_l = _factorize_column(col_l)
+        codes_r, n_r = _factorize_column(col_r)
+        return codes_l, codes_r + n_l, n_l + n_r
+    codes, n_keys = _factorize_column(np.concatenate([col_l, col_r]))
+    return codes[:len(col_l)], codes[len(col_l):], n_keys
+
+
+def _combine_codes(codes, n_keys, col_codes, n_col):
+    """Combine the codes of one more key column into the composite codes.
+    """
+    if n_keys * n_col >= 2**62:
+        codes, n_keys = _factorize_column(codes)
+    return codes * n_col + col_codes, n_keys * n_col
+
+
+def factorize(arlst):
+    """Return integer codes (one per row) and the number of distinct keys
+
+    Each unique (composite) key in the list of key columns `arlst` gets its
+    own integer code in the range [0, n_keys).
+    """
+    codes = np.zeros(len(arlst[0]) if arlst else 0, dtype=np.int64)
+    n_keys = 1
+    for col in arlst:
+        col_codes, n_col = _factorize_column(col)
+        codes, n_keys = _combine_codes(codes, n_keys, col_codes, n_col)
+    if n_keys > len(codes):
+        codes, n_keys = _factorize_column(codes)
+    return codes, n_keys
+
+
+def factorize_pair(arlst_l, arlst_r):
+    """Factorize the key columns of two tables into shared integer codes
+
+    Returns codes for the left rows, codes for the right rows and the
+    number of distinct keys. Equal keys on either side get equal codes.
+    """
+    len_l = len(arlst_l[0]) if arlst_l else 0
+    len_r = len(arlst_r[0]) if arlst_r else 0
+    codes_l = np.zeros(len_l, dtype=np.int64)
+    codes_r = np.zeros(len_r, dtype=np.int64)
+    n_keys = 1
+    for col_l, col_r in zip(arlst_l, arlst_r):
+        col_codes_l, col_codes_r, n_col = _factorize_column_pair(col_l, col_r)
+        codes, n_keys = _combine_codes(np.concatenate([codes_l, codes_r]), n_keys,
+                                       np.concatenate([col_codes_l, col_codes_r]), n_col)
+        codes_l, codes_r = codes[:len_l], codes[len_l:]
+    if n_keys > len_l + len_r:
+        codes, n_keys = _factorize_column(np.concatenate([codes_l, codes_r]))
+        codes_l, codes_r = codes[:len_l], codes[len_l:]
+    return codes_l, codes_r, n_keys
+
+
+def expand_matches(lo, cnt, keep_unmatched=False):
+    """Expand match ranges into pairs of positions
+
+    Left row `i` matches the positions `lo[i]` up to `lo[i] + cnt[i]` of the
+    (ordered) right rows. Returns the left row numbers and the matching right
+    positions, one element per matching pair. If `keep_unmatched`, left rows
+    without any match are kept once, with a right position of -1.
+    """
+    cnt = np.asarray(cnt, dtype=np.int64)
+    reps = np.maximum(cnt, 1) if keep_unmatched else cnt
+    left = np.repeat(np.arange(len(cnt)), reps)
+    ends = np.cumsum(reps)
+    offset = np.arange(len(left)) - np.repeat(ends - reps, reps)
+    pos = np.repeat(lo, reps) + offset
+    if keep_unmatched:
+        pos[np.repeat(cnt == 0, reps)] = -1
+    return left, pos
+
+
+def arg_join(codes_l, codes_r, n_keys, jointype="inner"):
+    """Join on integer key codes and return the row indices
+
+    Returns an array of shape (n, 2) with the right row numbers in the first
+    column and the left row numbers in the second column. Rows without a
+    match on the other side (left and outer joins) have row number -1.
+    Pairs are ordered by left row, right rows in their original order;
+    outer joins have the unmatched right rows at the end.
+    """
+    order_r = np.argsort(codes_r, kind='mergesort')
+    counts_r = np.bincount(codes_r, minlength=n_keys)
+    starts_r = np.cumsum(counts_r) - counts_r
+    left, pos = expand_matches(starts_r[codes_l], counts_r[codes_l],
+                               keep_unmatched=jointype in ("left", "outer"))
+    right = np.full(len(pos), -1, dtype=np.int64)
+    matched = pos >= 0
+    right[matched] = order_r[pos[matched]]
+    if jointype == "outer":
+        counts_l = np.bincount(codes_l, minlength=n_keys)
+        only_r = np.flatnonzero(counts_l[codes_r] == 0)
+        right = np.concatenate([right, only_r])
+        left = np.concatenate([left, np.full(len(only_r), -1, dtype=left.dtype)])
+    return np.column_stack([right, left])
+
+
+_MERGE_KINDS = {'b': 'n', 'i': 'n', 'u': 'n', 'f': 'n', 'U': 'U', 'S': 'S', 'M': 'M', 'm': 'm'}
+
+
+def _merge_column_pair(col_l, col_r):
+    """Cast a left and right key column to a common dtype, None if not possible.
+    """
+    col_l, col_r = _key_columns(col_l, col_r)
+    kind_l, kind_r = _MERGE_KINDS.get(col_l.dtype.kind), _MERGE_KINDS.get(col_r.dtype.kind)
+    if kind_l is None or kind_l != kind_r:
+        return None
+    dtype = np.result_type(col_l, col_r)
+    if dtype.kind == 'f' and 'f' not in (col_l.dtype.kind, col_r.dtype.kind):
+        return None     # int64 with uint64 would lose precision
+    col_l, col_r = col_l.astype(dtype, copy=False), col_r.astype(dtype, copy=False)
+    if dtype.kind == 'f' and (np.isnan(col_l).any() or np.isnan(col_r).any()):
+        return None
+    if dtype.kind in {'M', 'm'} and (np.isnat(col_l).any() or np.isnat(col_r).any()):
+        return None
+    return col_l, col_r
+
+
+def merge_keys(arlst_l, arlst_r):
+    """Return single, comparable key arrays for the key columns of two tables
+
+    Composite keys of integer, boolean and datetime columns are packed into a
+    single int64 preserving their lexicographical order. Returns None when the
+    keys cannot be merged, e.g. composite keys of strings or floats, NaN or
+    NaT keys (which never match), or packed keys exceeding int64.
+    """
+    pairs = [_merge_column_pair(col_l, col_r) for col_l, col_r in zip(arlst_l, arlst_r)]
+    if not pairs or any(pair is None for pair in pairs):
+        return None
+    if len(pairs) == 1:
+        return pairs[0]
+    keys_l = np.zeros(len(pairs[0][0]), dtype=np.int64)
+    keys_r = np.zeros(len(pairs[0][1]), dtype=np.int64)
+    span = 1
+    for col_l, col_r in pairs:
+        if col_l.dtype.kind not in {'b', 'i', 'u', 'M', 'm'}:
+            return None
+        if col_l.dtype.kind in {'M', 'm'}:
+            col_l, col_r = col_l.view(np.int64), col_r.view(np.int64)
+        both = [col for col in (col_l, col_r) if len(col)]
+        if not both:
+            continue
+        lo = min(int(col.min()) for col in both)
+        n_col = max(int(col.max()) for col in both) - lo + 1
+        span *= n_col
+        if span >= 2**62 or lo < -2**63 or lo + n_col > 2**63:
+            return None
+        keys_l = keys_l * n_col + (col_l.astype(np.int64) - lo)
+        keys_r = keys_r * n_col + (col_r.astype(np.int64) - lo)
+    return keys_l, keys_r
+
+
+def is_sorted(keys):
+    """Whether the keys are sorted ascending, an O(n) check.
+    """
+    return bool(np.all(keys[1:] >= keys[:-1]))
+
+
+def merge_arg_join(keys_l, keys_r, jointype="inner"):
+    """Join on sorted keys and return the row indices
+
+    Both `keys_l` and `keys_r` have to be sorted ascending. The matches are
+    found with binary searches for the (sorted) left keys in the right keys,
+    no hash tables are built. Returns the same row indices, in the same
+    order, as :mod:`arg_join` with codes of these keys.
+    """
+    lo = np.searchsorted(keys_r, keys_l, 'left')
+    cnt = np.searchsorted(keys_r, keys_l, 'right') - lo
+    left, right = expand_matches(lo, cnt, keep_unmatched=jointype in ("left", "outer"))
+    if jointype == "outer":
+        cnt_l = np.searchsorted(keys_l, keys_r, 'right') - np.searchsorted(keys_l, keys_r, 'left')
+        only_r = np.flatnonzero(cnt_l == 0)
+        right = np.concatenate([right, only_r])
+        left = np.concatenate([left, np.full(len(only_r), -1, dtype=left.dtype)])
+    return np.column_stack([right, left])
+
+
+def merge_order(key, sorted_by, key_r, sorted_by_r):
+    """Return the key positions in sort order if both tables are sorted by the keys
+
+    Returns a list `order` such that both tables are sorted by the keys
+    `[key[i] for i in order]` and `[key_r[i] for i in order]` respectively,
+    or None if they are not.
+    """
+    n = len(key)
+    if n == 0 or len(set(key)) != n or set(sorted_by[:n]) != set(key):
+        return None
+    order = [key.index(c) for c in sorted_by[:n]]
+    if tuple(key_r[i] for i in order) != tuple(sorted_by_r[:n]):
+        return None
+    return order
+
+
+def fill_value(tbl, dtype):
+    """Return the fill value for a column of `dtype`, used for outer joins
+    """
+    if dtype.kind == 'f':
+        return tbl.join_fill_value['float']
+    if dtype.kind in {'U', 'S'}:
+        return tbl.join_fill_value['string']
+    if dtype.kind in {'i', 'u'}:
+        return tbl.join_fill_value['integer']
+    raise ValueError("Outer join cannot be fullfilled when there are other "
+                     "columns than float, string or integer because Tabel "
+                     "doesn't know what to fill it up with.")
+
+
+def take_fill(tbl, col, idx):
+    """Take the rows `idx` from the column, row number -1 gives a fill value
+    """
+    missing = idx < 0
+    if not np.any(missing):
+        return col[idx]
+    value = fill_value(tbl, col.dtype)
+    if len(col) == 0:
+        return np.full(len(idx), value, dtype=col.dtype)
+    out = col[np.maximum(idx, 0)]
+    out[missing] = value
+    return out
+
+
+def group_index(arlst):
+    """Return the group structure of the (composite) key columns in `arlst`
+
+    Returns a tuple (codes, order, starts, counts, first_rows): the group code
+    of each row, the row numbers ordered by group, the start of each group in
+    that order, the number of rows of each group and the first row number of
+    each group.
+    """
+    codes, n_groups = factorize(arlst)
+    order = np.argsort(codes, kind='mergesort')
+    counts = np.bincount(codes, minlength=n_groups)
+    counts = counts[counts > 0]
+    starts = np.cumsum(counts) - counts
+    return codes, order, starts, counts, order[starts]
+
+
 def arg_hash(arlst):
     """Return defaultdict with list of rownumbers
+
+    .. deprecated::
+        Use `group_index` or `factorize`, which don't build Python lists.
     """
+    warnings.warn("arg_hash is deprecated, use group_index instead",
+                  DeprecationWarning, stacklevel=2)
+    _, order, starts, counts, first_rows = group_index(arlst)
     keylist = defaultdict(list)
-    for i, elem in enumerate(zip(*(arlst))):
-        keylist[elem].append(i)
+    for start, count, row in zip(starts, counts, first_rows):
+        keylist[tuple(col[row] for col in arlst)] = order[start:start+count].tolist()
     return keylist
 
-def arg_left_join(tbl_l, index1, tbl_r, index2):
-    """Join and return _column_indices
-    """
-    hash_r = arg_hash(tbl_r[:, index2].data)
-    idx = np.array([(s, i) for i, r in enumerate(zip(*tbl_l[:, index1].data))
-                    for s in hash_r.get(r, [-1])])
-    return idx
 
-def add_empty_row(tbl):
-    """Add an empty row using the fill values to the end of an Tabel
-    """
-    empty_row = []
-    for c in tbl.dtype.names:
-        if tbl.dtype[c] in NP_FLOAT_TYPES:
-            empty_row.append(tbl.join_fill_value['float'])
-        if tbl.dtype[c].kind in {'U', 'S'}:
-            empty_row.append(tbl.join_fill_value['string'])
-        if tbl.dtype[c] in NP_INT_TYPES:
-            empty_row.append(tbl.join_fill_value['integer'])
-    try:
-        tbl.row_append(empty_row)
-    except ValueError:
-        raise ValueError("Outer join cannot be fullfilled when there are other ",
-                         "columns than float, string or integer because Tabel ",
-                         "doesn't know what to fill it up with.")
+def _sum_dtype(dtype):
+    """The accumulator dtype np.sum would use"""
+    if dtype.kind in {'b', 'i'}:
+        return np.int_
+    if dtype.kind == 'u':
+        return np.uint
+    return None
+
+
+def _value_order(values, order, counts):
+    """Row numbers ordered by group and by value within each group"""
+    groups = np.repeat(np.arange(len(counts)), counts)
+    return order[np.lexsort((values[order], groups))]
+
+
+def _agg_sum(values, order, starts, counts):     # pylint: disable=unused-argument
+    return np.add.reduceat(values[order], starts, dtype=_sum_dtype(values.dtype))
+
 
-def remove_empty_row(tbl):
-    """Remove the last (emtpy) row of a Tabel, used for outer joins
+def _agg_mean(values, order, starts, counts):
+    dtype = np.float64 if values.dtype.kind in {'b', 'i', 'u'} else None
+    return np.add.reduceat(values[order], starts, dtype=dtype) / counts
+
+
+def _agg_min(values, order, starts, counts):
+    if values.dtype.kind in {'b', 'i', 'u', 'f', 'M', 'm'}:
+        return np.minimum.reduceat(values[order], starts)
+    return values[_value_order(values, order, counts)[starts]]
+
+
+def _agg_max(values, order, starts, counts):
+    if values.dtype.kind in {'b', 'i', 'u', 'f', 'M', 'm'}:
+        return np.maximum.reduceat(values[order], starts)
+    return values[_value_order(values, order, counts)[starts + counts - 1]]
+
+
+def _agg_count(values, order, starts, counts):   # pylint: disable=unused-argument
+    return counts
+
+
+def _agg_first(values, order, starts, counts):   # pylint: disable=unused-argument
+    return values[order[starts]]
+
+
+def _agg_last(values, order, starts, counts):
+    return values[order[starts + counts - 1]]
+
+
+def _agg_var(values, order, starts, counts):
+    mean = _agg_mean(values, order, starts, counts)
+    dev = values[order] - np.repeat(mean, counts)
+    return np.add.reduceat(dev * dev, starts) / counts
+
+
+def _agg_std(values, order, starts, counts):
+    return np.sqrt(_agg_var(values, order, starts, counts))
+
+
+def _agg_median(values, order, starts, counts):
+    ordered = values[_value_order(values, order, counts)]
+    if values.dtype.kind in {'b', 'i', 'u'}:
+        ordered = ordered.astype(np.float64)
+    median = (ordered[starts + (counts - 1) // 2] + ordered[starts + counts // 2]) / 2
+    if values.dtype.kind == 'f':
+        has_nan = np.add.reduceat(np.isnan(values[order]), starts, dtype=np.int_) > 0
+        median[has_nan] = np.nan
+    return median
+
+
+def _agg_nunique(values, order, starts, counts):
+    ordered = values[_value_order(values, order, counts)]
+    new = np.ones(len(ordered), dtype=np.int_)
+    new[1:] = ordered[1:] != ordered[:-1]
+    new[starts] = 1
+    return np.add.reduceat(new, starts)
+
+
+AGGREGATIONS = {'sum': _agg_sum, 'mean': _agg_mean, 'min': _agg_min, 'max': _agg_max,
+                'count': _agg_count, 'first': _agg_first, 'last': _agg_last,
+                'std': _agg_std, 'var': _agg_var, 'median': _agg_median,
+                'nunique': _agg_nunique}
+"""dict: Built-in group_by aggregations, evaluated with segmented numpy reductions."""
+
+
+def aggregate(fie, values, order, starts, counts):
+    """Aggregate `values` per group with the function or aggregation name `fie`
+
+    Built-in aggregations (see `AGGREGATIONS`), by name or by their numpy
+    function equivalent, use segmented numpy reductions. Any other callable is
+    called with the 1D array of values of each individual group.
     """
-    tbl.data = [dt[0:-1] for dt in tbl.data]
+    if isstring(fie):
+        function = AGGREGATIONS.get(fie)
+        if function is None:
+            raise ValueError("Unknown aggregation: {}".format(fie))
+        return function(values, order, starts, counts)
+    name = CALLABLE_AGGREGATIONS.get(fie)
+    if name is not None:
+        return AGGREGATIONS[name](values, order, starts, counts)
+    ordered = values[order]
+    return np.array([fie(ordered[s:s+c]) for s, c in zip(starts, counts)])
 
 
 class HashJoinMixin(object):
@@ -74,34 +424,33 @@ class HashJoinMixin(object):
             columns = ([c+suffixes[0] for c in col_l] +
                        key_r + [c+suffixes[1] for c in col_r])
             col_r = key_r + col_r
+        else:
+            raise NotImplementedError("No such jointype: {}".format(jointype))
 
-        data = self[idx[:, 1], col_l].data + tbl_r[idx[:, 0], col_r].data
-        return self.__class__(data, columns=columns)
-
-    def _arg_inner_join(self, index1, tbl_r, index2):
-        """Perform inner join and return row indices
-        """
-        hash_r = arg_hash(tbl_r[:, index2].data)
-        return np.array([(s, i) for i, r in enumerate(zip(*self[:, index1].data))
-                         for s in hash_r[r]])
+        data = ([take_fill(self, self[c], idx[:, 1]) for c in col_l] +
+                [take_fill(tbl_r, tbl_r[c], idx[:, 0]) for c in col_r])
+        return self.__class__(data, columns=columns, copy=False)
 
-    def _arg_outer_join(self, index1, tbl_r, index2):
-        """Perform outer join and return indices
+    def _arg_join(self, index1, tbl_r, index2, jointype="inner", n_jobs=None):
+        """Perform join and return row indices
         """
-        hash_l = arg_hash(self[:, index1].data)
-        hash_r = arg_hash(tbl_r[:, index2].data)
-
-        keys = set(hash_l.keys()).union(set(hash_r.keys()))
-
-        def iter_join(h_l, h_r, join_keys):
-            for join_key in join_keys:
-                for elem in h_l.get(join_key, [-1]):
-                    for other in h_r.get(join_key, [-1]):
-                        yield (elem, other)
-        idx = np.array(list(iter_join(hash_l, hash_r, keys)))
-        return idx[:, [1, 0]]
-
-    def join(self, tbl_r, key, key_r=None, jointype="inner", suffixes=('_l', '_r')):
+        from . import parallel                      # pylint: disable=cyclic-import
+        if parallel.n_workers(n_jobs) > 1:
+            arlst_l, arlst_r = self[:, index1].data, tbl_r[:, index2].data
+            if parallel.shareable(arlst_l + arlst_r):
+                return parallel.arg_join_partitioned(arlst_l, arlst_r, jointype, n_jobs)
+        order = merge_order(index1, self.sorted_by, index2, tbl_r.sorted_by)
+        if order is not None:
+            keys = merge_keys([self[index1[i]] for i in order], [tbl_r[index2[i]] for i in order])
+            # sorted_by goes stale when a view is written through its parent
+            if keys is not None and is_sorted(keys[0]) and is_sorted(keys[1]):
+                return merge_arg_join(keys[0], keys[1], jointype)
+        codes_l, codes_r, n_keys = factorize_pair(self[:, index1].data, tbl_r[:, index2].data)
+        return arg_join(codes_l, codes_r, n_keys, jointype)
+
+    @instrumented("join")
+    def join(self, tbl_r, key, key_r=None, jointype="inner", suffixes=('_l', '_r'),
+             n_jobs=None):
         """dbase join tables with ind column(s) as the keys.
 
         Performs a database style joins on the two tables, the current instance
@@ -126,6 +475,9 @@ class HashJoinMixin(object):
                 not in the left tabel.
             suffixes (tuple) :
                 Strings to be added to the left and right tabel column names.
+            n_jobs (int) :
+                Number of processes joining in parallel, -1 for all cores.
+                Defaults to joining in the current process.
 
         returns:
             The joined tabel
@@ -140,6 +492,24 @@ class HashJoinMixin(object):
             column is left out. For the `outer` jointype both keys are present
             and suffixed.
 
+            The key columns of both Tabels are factorized into shared integer
+            codes with numpy, the row indices of the joined Tabel are computed
+            from these codes without any per-row python looping. Rows are
+            ordered by the left Tabel, for `outer` joins followed by the rows
+            only present in the right Tabel.
+
+            When both Tabels are sorted on the keys, see
+            :mod:`tabel.Tabel.sorted_by`, a merge join is done instead, finding
+            the matching rows with binary searches on the sorted keys. This
+            skips the factorizing altogether and gives the same result. The
+            keys are checked to be in order first, such that a stale
+            `sorted_by` falls back to the factorized join.
+
+            With `n_jobs` both Tabels are hash partitioned on the keys and the
+            partitions are joined in a pool of processes, the key columns are
+            passed to the processes through shared memory. The result is
+            identical to joining in a single process.
+
         Examples:
             Join a Tabel into the current Tabel matching on column 'a':
 
@@ -156,37 +526,22 @@ class HashJoinMixin(object):
         """
         key = key if not isstring(key) else [key]
         key_r = key if key_r is None else key_r
+        key_r = key_r if not isstring(key_r) else [key_r]
 
-        if jointype == "inner":
-            idx = self._arg_inner_join(key, tbl_r, key_r)
-            return self._union(idx, key, tbl_r, key_r, jointype, suffixes)
-
-        if jointype == "outer":
-            idx = self._arg_outer_join(key, tbl_r, key_r)
-            add_empty_row(self)
-            add_empty_row(tbl_r)
-            outp = self._union(idx, key, tbl_r, key_r, jointype, suffixes)
-            remove_empty_row(self)
-            remove_empty_row(tbl_r)
-            return outp
-
-        if jointype == "left":
-            idx = arg_left_join(self, key, tbl_r, key_r)
-            add_empty_row(tbl_r)
-            outp = self._union(idx, key, tbl_r, key_r, jointype, suffixes)
-            remove_empty_row(tbl_r)
-            return outp
-
-        if jointype == "right":
-            idx = arg_left_join(tbl_r, key_r, self, key)
+        if jointype in ("inner", "left", "outer"):
+            with phase("arg_join"):
+                idx = self._arg_join(key, tbl_r, key_r, jointype, n_jobs)
+        elif jointype == "right":
+            with phase("arg_join"):
+                idx = tbl_r._arg_join(key_r, self, key, "left", n_jobs)  # pylint: disable=protected-access
             idx = idx[:, [1, 0]]
-            add_empty_row(self)
-            outp = self._union(idx, key, tbl_r, key_r, jointype, suffixes)
-            remove_empty_row(self)
-            return outp
-        raise NotImplementedError("No such jointype: {}".format(jointype))
+        else:
+            raise NotImplementedError("No such jointype: {}".format(jointype))
+        with phase("union"):
+            return self._union(idx, key, tbl_r, key_r, jointype, suffixes)
 
-    def group_by(self, key, aggregate_fie_col=None):
+    @instrumented("group_by")
+    def group_by(self, key, aggregate_fie_col=None, n_jobs=None):
         """Groups and aggregates Tabel.
 
         Arguments:
@@ -200,9 +555,34 @@ class HashJoinMixin(object):
                 the returned value is treated as a single element. Only the grouped
                 columns of `key` are returned if ommited.
 
+                Instead of a function, `function` can be the name of a built-in
+                aggregation: 'sum', 'mean', 'min', 'max', 'count', 'first',
+                'last', 'std', 'var', 'median' or 'nunique'. The aggregated
+                column is named `column` + "_" + the function name.
+
+            n_jobs (int) :
+                Number of processes aggregating in parallel, -1 for all cores.
+                Defaults to aggregating in the current process, which is also
+                used when a function in `aggregate_fie_col` is not picklable,
+                e.g. a lambda.
+
         Returns:
             Tabel object with requested columns
 
+        Notes:
+            The groups are computed once from integer codes of the key columns.
+            Built-in aggregations, either by name or by their numpy function
+            (`np.sum`, `np.mean`, `np.min`, `np.max`, `np.std`, `np.var`,
+            `np.median`, `len` and `first`), are evaluated for all groups at
+            once with segmented numpy reductions. Any other function is called
+            once per group, which is considerably slower. Groups are returned
+            in order of their first appearance.
+
+            With `n_jobs` the rows are hash partitioned on the keys, every group
+            falls in a single partition. The partitions are grouped and
+            aggregated in a pool of processes reading the columns from shared
+            memory, giving the same result as a single process.
+
         Examples:
             grouping by 'a' and then by 'b', agregating with taking the sum of
             'a' elements and taking the first 'c' element of each group:
@@ -218,19 +598,46 @@ class HashJoinMixin(object):
              200 |  40 |     120 |       200
             4 rows ['<U3', '<i8', '<i8', '<i8']
 
+            The same using built-in aggregations by name:
+
+            >>> tbl.group_by('b', [('sum', 'a'), ('mean', 'c'), ('count', 'a')])
+               b |   a_sum |   c_mean |   a_count
+            -----+---------+----------+-----------
+             100 |     120 |      100 |         6
+             200 |     180 |      200 |         6
+            2 rows ['<U3', '<i8', '<f8', '<i8']
+
         """
         if aggregate_fie_col is None:
             aggregate_fie_col = list()
-        key = key if not isstring(key) else [key]
-        hash_groups = arg_hash(self[:, key].data)
-        result = self.__class__()
-        for group in hash_groups.values():
-            row = {}
-            row.update({k:v for k, v in zip(key, self[group[0], key])})
+        key = list(key) if not isstring(key) else [key]
+        if len(self) == 0:
+            return self.__class__()
+        from . import parallel                      # pylint: disable=cyclic-import
+        arlst = self[:, key].data
+        value_columns = [self[col] for _, col in aggregate_fie_col]
+        aggregate_fie = [fie for fie, _ in aggregate_fie_col]
+        if parallel.n_workers(n_jobs) > 1 and parallel.shareable(arlst + value_columns) and \
+                parallel.picklable(aggregate_fie):
+            with phase("partitioned"):
+                first_rows, values = parallel.group_by_partitioned(
+                    arlst, value_columns, aggregate_fie, n_jobs)
+            columns = key + [col + "_" + (fie if isstring(fie) else fie.__name__)
+                             for fie, col in aggregate_fie_col]
+            return self.__class__([self[k][first_rows] for k in key] + values,
+                                  columns=columns, copy=False)
+        with phase("group_index"):
+            _, order, starts, counts, first_rows = group_index(arlst)
+            appearance = np.argsort(first_rows, kind='mergesort')
+        columns = list(key)
+        datastruct = [self[k][first_rows[appearance]] for k in key]
+        with phase("aggregate"):
             for fie, col in aggregate_fie_col:
-                row.update({col+"_"+fie.__name__:fie(self[group, col])})
-            result.row_append(row)
-        return result
+                name = fie if isstring(fie) else fie.__name__
+                columns.append(col+"_"+name)
+                values = aggregate(fie, self[col], order, starts, counts)
+                datastruct.append(values[appearance])
+        return self.__class__(datastruct, columns=columns, copy=False)
 
 
 def first(array):
@@ -249,3 +656,9 @@ def first(array):
 
     """
     return array[0] if len(array) > 0 else None
+
+
+CALLABLE_AGGREGATIONS = {np.sum: 'sum', np.mean: 'mean', np.amin: 'min', np.amax: 'max',
+                         np.std: 'std', np.var: 'var', np.median: 'median',
+                         len: 'count', first: 'first'}
+"""dict: Callables that group_by evaluates with the equivalent built-in aggregation."""
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+.. module:: tabel.index
+.. moduleauthor:: Bastiaan Bergman <Bastiaan.Bergman@gmail.com>
+
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import numpy as np
+from .hashjoin import group_index
+
+
+def _key_values(col):
+    """Return the elements of a key column as hashable python objects.
+    """
+    if col.dtype.kind in {'M', 'm'}:
+        return list(col)
+    return col.tolist()
+
+
+def _python_scalar(value):
+    """Convert numpy scalars, except datetimes, to python objects.
+    """
+    if isinstance(value, np.generic) and value.dtype.kind not in {'M', 'm'}:
+        return value.item()
+    return value
+
+
+class TabelIndex(object):
+    """Hash index from the key values of one or more columns to row numbers.
+
+    The rows are grouped per key with the same factorizing used by
+    :mod:`tabel.Tabel.group_by`, a python dict maps each key to its group.
+    Looking up a key is a dict lookup plus a slice of the grouped row numbers.
+
+    Parameters:
+        columns (tuple) :
+            names of the key columns.
+    """
+
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        self._groups = None
+        self._order = None
+        self._starts = None
+        self._counts = None
+
+    @property
+    def valid(self):
+        """bool: Whether the index is built and up to date.
+        """
+        return self._groups is not None
+
+    def invalidate(self):
+        """Drop the index data, to be rebuilt on the next lookup.
+        """
+        self._groups = None
+        self._order = self._starts = self._counts = None
+
+    def copy(self):
+        """Return an index on the same columns sharing the built data, which is
+        replaced rather than modified on a rebuild.
+        """
+        index = TabelIndex(self.columns)
+        index._groups, index._order = self._groups, self._order
+        index._starts, index._counts = self._starts, self._counts
+        return index
+
+    def build(self, tbl):
+        """(Re)build the index from the key columns of `tbl`.
+        """
+        arlst = [tbl[c] for c in self.columns]
+        if len(tbl) == 0:
+            self._groups, self._order = {}, np.zeros(0, dtype=np.int64)
+            self._starts = self._counts = np.zeros(0, dtype=np.int64)
+            return
+        _, self._order, self._starts, self._counts, first_rows = group_index(arlst)
+        keys = [_key_values(col[first_rows]) for col in arlst]
+        keys = keys[0] if len(keys) == 1 else zip(*keys)
+        self._groups = {key: i for i, key in enumerate(keys)}
+
+    def _key(self, key):
+        """Normalize a key to how it is stored in the dict.
+        """
+        if len(self.columns) == 1:
+            if isinstance(key, tuple) and len(key) == 1:
+                key = key[0]
+            return _python_scalar(key)
+        if len(key) != len(self.columns):
+            raise KeyError("Key {} does not match index columns {}".format(key, self.columns))
+        return tuple(_python_scalar(k) for k in key)
+
+    def rows(self, key):
+        """Return the row numbers, in ascending order, of the rows with `key`.
+        """
+        i = self._groups.get(self._key(key))
+        if i is None:
+            return np.zeros(0, dtype=np.int64)
+        return self._order[self._starts[i]:self._starts[i] + self._counts[i]]
+
+    def rows_many(self, keys):
+        """Return the row numbers of the rows matching any of `keys`, grouped
+        per key in the order of `keys`.
+        """
+        rows = [self.rows(key) for key in keys]
+        return np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
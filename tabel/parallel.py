@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+"""
+.. module:: tabel.parallel
+.. moduleauthor:: Bastiaan Bergman <Bastiaan.Bergman@gmail.com>
+
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import os
+import pickle
+import threading
+from contextlib import contextmanager
+import numpy as np
+from .hashjoin import factorize_pair, arg_join, group_index, aggregate
+from .util import ImpError
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing.shared_memory import SharedMemory
+    SHARED_MEMORY_PRESENT = True
+except ImpError:
+    SHARED_MEMORY_PRESENT = False
+
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+_HASH_MIX = np.uint64(0xFF51AFD7ED558CCD)
+_HASH_SHIFT = np.uint64(33)
+_STRING_MULTIPLIER = np.uint64(31)
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def n_workers(n_jobs):
+    """Return the number of processes for `n_jobs`, negative counts from the
+    number of cores: -1 uses all cores, -2 all but one and so on.
+    """
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        n_jobs = (os.cpu_count() or 1) + 1 + n_jobs
+    return max(int(n_jobs), 1)
+
+
+def _process_pool(n_jobs):
+    """Return the shared process pool with `n_jobs` workers, created once such
+    that repeated joins and group_bys do not pay for starting the processes.
+    A pool broken by a dying worker is replaced.
+    """
+    if not SHARED_MEMORY_PRESENT:
+        raise ImpError("multiprocessing.shared_memory (python 3.8+) is needed for n_jobs > 1")
+    with _POOLS_LOCK:
+        pool = _POOLS.get(n_jobs)
+        if pool is None or getattr(pool, "_broken", False):
+            pool = _POOLS[n_jobs] = ProcessPoolExecutor(n_jobs)
+        return pool
+
+
+def shareable(arlst):
+    """Whether all columns have a fixed size dtype that can be shared.
+    """
+    return all(np.asarray(col).dtype.kind in "biufcUSMm" for col in arlst)
+
+
+def picklable(objects):
+    """Whether all objects, e.g. aggregation functions, can be sent to worker
+    processes. Lambdas and nested functions can not.
+    """
+    try:
+        pickle.dumps(list(objects))
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+    return True
+
+
+def _hash_column(col):
+    """Return an uint64 hash of each element, equal elements hash equal.
+    """
+    if col.dtype.kind in {'U', 'S'}:
+        col = np.ascontiguousarray(col)
+        char = np.uint32 if col.dtype.kind == 'U' else np.uint8
+        width = col.dtype.itemsize // np.dtype(char).itemsize
+        chars = col.view(char).reshape(len(col), width).astype(np.uint64)
+        hashed = np.zeros(len(col), dtype=np.uint64)
+        for i in range(width):
+            # trailing padding does not change the hash, "a" in U1 and U3 are equal
+            hashed = np.where(chars[:, i] != 0, hashed * _STRING_MULTIPLIER + chars[:, i], hashed)
+        return hashed
+    if col.dtype.kind in {'M', 'm'}:
+        return col.view(np.int64).view(np.uint64)
+    if col.dtype.kind in {'f', 'c'}:
+        col = col.astype(np.float64) + 0.0     # -0.0 == 0.0
+        col[np.isnan(col)] = np.nan
+        return col.view(np.uint64)
+    return col.astype(np.int64).view(np.uint64)
+
+
+def _common_dtypes(arlst_l, arlst_r):
+    """Cast key column pairs of different numeric types to a common type, such
+    that equal keys have equal bits.
+    """
+    out_l, out_r = [], []
+    for col_l, col_r in zip(arlst_l, arlst_r):
+        col_l, col_r = np.asarray(col_l), np.asarray(col_r)
+        if col_l.dtype != col_r.dtype and not {col_l.dtype.kind, col_r.dtype.kind} & {'U', 'S'}:
+            dtype = np.result_type(col_l, col_r)
+            col_l, col_r = col_l.astype(dtype, copy=False), col_r.astype(dtype, copy=False)
+        out_l.append(col_l)
+        out_r.append(col_r)
+    return out_l, out_r
+
+
+def partition(arlst, n_parts):
+    """Hash partition rows by their (composite) key
+
+    Arguments:
+        arlst (list) :
+            the key columns.
+        n_parts (int) :
+            number of partitions.
+
+    Returns:
+        Tuple (rows, bounds): the row numbers ordered by partition, ascending
+        within each partition, and the `n_parts` + 1 boundaries of the
+        partitions in `rows`.
+    """
+    hashed = np.zeros(len(arlst[0]), dtype=np.uint64)
+    for col in arlst:
+        hashed = hashed * _HASH_MULTIPLIER + _hash_column(np.asarray(col))
+    hashed ^= hashed >> _HASH_SHIFT
+    hashed *= _HASH_MIX
+    hashed ^= hashed >> _HASH_SHIFT
+    parts = (hashed % np.uint64(n_parts)).astype(np.int64)
+    rows = np.argsort(parts, kind='mergesort')
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(parts, minlength=n_parts))])
+    return rows, bounds
+
+
+class SharedArrays(object):
+    """Copy arrays into shared memory, to be attached to by worker processes.
+
+    The `specs` attribute holds a picklable (name, dtype, shape) tuple per
+    array, see `attach`. Use as a context manager, the shared memory is freed
+    on exit.
+
+    Parameters:
+        arrays (list) :
+            numpy arrays with a fixed size dtype.
+    """
+
+    def __init__(self, arrays):
+        self._blocks = []
+        self.specs = []
+        try:
+            for arr in arrays:
+                arr = np.ascontiguousarray(arr)
+                block = SharedMemory(create=True, size=max(arr.nbytes, 1))
+                self._blocks.append(block)
+                np.ndarray(arr.shape, dtype=arr.dtype, buffer=block.buf)[...] = arr
+                self.specs.append((block.name, arr.dtype.str, arr.shape))
+        except BaseException:
+            self.free()
+            raise
+
+    def free(self):
+        """Close and unlink the shared memory blocks.
+        """
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.free()
+
+
+@contextmanager
+def attach(specs):
+    """Context manager yielding the arrays shared by `SharedArrays`.
+
+    The arrays are views on the shared memory, valid inside the with block.
+    """
+    blocks = [SharedMemory(name=name) for name, _, _ in specs]
+    arrays = [np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+              for block, (_, dtype, shape) in zip(blocks, specs)]
+    try:
+        yield arrays
+    finally:
+        del arrays[:]
+        for block in blocks:
+            block.close()
+
+
+def _take_partition(specs, lo, hi):
+    """Return the row numbers and the columns of one partition.
+
+    `specs` holds the rows ordered by partition followed by the columns.
+    """
+    with attach(specs) as arrays:
+        rows = arrays[0][lo:hi].copy()
+        return rows, [col[rows] for col in arrays[1:]]
+
+
+def _join_partition(specs_l, lo_l, hi_l, specs_r, lo_r, hi_r, jointype):
+    """Join one partition, see `arg_join_partitioned`
+    """
+    rows_l, arlst_l = _take_partition(specs_l, lo_l, hi_l)
+    rows_r, arlst_r = _take_partition(specs_r, lo_r, hi_r)
+    codes_l, codes_r, n_keys = factorize_pair(arlst_l, arlst_r)
+    idx = arg_join(codes_l, codes_r, n_keys, jointype)
+    for i, rows in enumerate([rows_r, rows_l]):
+        matched = idx[:, i] >= 0
+        idx[matched, i] = rows[idx[matched, i]]
+    return idx
+
+
+def arg_join_partitioned(arlst_l, arlst_r, jointype, n_jobs):
+    """Join on key columns in worker processes, returning the row indices
+
+    Both sides are hash partitioned by key, each pair of partitions is joined
+    in a process pool with the key columns passed through shared memory.
+    Returns the same (n, 2) array of row numbers as `hashjoin.arg_join`, in
+    the same order.
+    """
+    n_parts = n_workers(n_jobs)
+    arlst_l, arlst_r = _common_dtypes(arlst_l, arlst_r)
+    rows_l, bounds_l = partition(arlst_l, n_parts)
+    rows_r, bounds_r = partition(arlst_r, n_parts)
+    executor = _process_pool(n_parts)
+    with SharedArrays([rows_l] + arlst_l) as shared_l, \
+            SharedArrays([rows_r] + arlst_r) as shared_r:
+        futures = [executor.submit(_join_partition, shared_l.specs, bounds_l[p], bounds_l[p + 1],
+                                   shared_r.specs, bounds_r[p], bounds_r[p + 1], jointype)
+                   for p in range(n_parts)
+                   if bounds_l[p + 1] > bounds_l[p] or bounds_r[p + 1] > bounds_r[p]]
+        parts = [future.result() for future in futures]
+    if not parts:
+        return np.zeros((0, 2), dtype=np.int64)
+    idx = np.concatenate(parts)
+    # serial order: by left row, right rows ascending, right only rows last.
+    # Every partition is in that order already, a stable sort merges them.
+    first = np.where(idx[:, 1] >= 0, idx[:, 1], len(arlst_l[0]) + idx[:, 0])
+    return idx[np.argsort(first, kind='mergesort')]
+
+
+def _group_partition(specs, lo, hi, aggregate_fie):
+    """Group and aggregate one partition, see `group_by_partitioned`
+    """
+    rows, arlst = _take_partition(specs, lo, hi)
+    n_keys = len(arlst) - len(aggregate_fie)
+    _, order, starts, counts, first_rows = group_index(arlst[:n_keys])
+    values = [aggregate(fie, col, order, starts, counts)
+              for fie, col in zip(aggregate_fie, arlst[n_keys:])]
+    return rows[first_rows], values
+
+
+def group_by_partitioned(arlst, values, aggregate_fie, n_jobs):
+    """Group and aggregate in worker processes
+
+    Rows are hash partitioned by key, such that every group falls in one
+    partition, each partition is grouped and aggregated in a process pool
+    with the columns passed through shared memory. Aggregations given as
+    functions have to be picklable, see `picklable`.
+
+    Returns:
+        Tuple (first_rows, values): the first row number of each group and
+        the aggregated values of each column, groups in order of their first
+        appearance like `Tabel.group_by`.
+    """
+    n_parts = n_workers(n_jobs)
+    rows, bounds = partition(arlst, n_parts)
+    executor = _process_pool(n_parts)
+    with SharedArrays([rows] + list(arlst) + list(values)) as shared:
+        futures = [executor.submit(_group_partition, shared.specs, bounds[p], bounds[p + 1],
+                                   aggregate_fie)
+                   for p in range(n_parts) if bounds[p + 1] > bounds[p]]
+        parts = [future.result() for future in futures]
+    first_rows = np.concatenate([part[0] for part in parts])
+    appearance = np.argsort(first_rows, kind='mergesort')
+    values = [np.concatenate([part[1][i] for part in parts])[appearance]
+              for i in range(len(aggregate_fie))]
+    return first_rows[appearance], values
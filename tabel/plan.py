@@ -0,0 +1,577 @@
+#!/usr/bin/env python
+"""
+.. module:: tabel.plan
+.. moduleauthor:: Bastiaan Bergman <Bastiaan.Bergman@gmail.com>
+
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from .expr import Expression, rename_columns, split_conjunction
+from .util import isstring
+
+PLAN_CHUNK_ROWS = 2**18
+"""int: Number of rows per chunk when filtering csv files while reading."""
+
+
+def _as_list(columns):
+    """Return a single column name or a list of names as list
+    """
+    return [columns] if isstring(columns) else list(columns)
+
+
+class Predicate(object):
+    """A filter expression with the values of its variables.
+
+    Parameters:
+        expr (str) :
+            boolean expression, see :mod:`tabel.expr.Expression`.
+        variables (dict) :
+            values for names in the expression that are not columns.
+    """
+
+    def __init__(self, expr, variables=None):
+        self.expr = expr
+        self.variables = dict(variables or {})
+        self.names = Expression(expr).names - set(self.variables)
+
+    def rename(self, mapping):
+        """Return the predicate with its column names replaced.
+        """
+        return Predicate(rename_columns(self.expr, mapping), self.variables)
+
+    def split(self):
+        """Return the terms of the predicate if it is a conjunction "e1 & e2".
+        """
+        terms = split_conjunction(self.expr)
+        if len(terms) == 1:
+            return [self]
+        return [Predicate(term, self.variables) for term in terms]
+
+    @staticmethod
+    def merge(predicates):
+        """Merge predicates into as few as possible, one if the variables agree
+        """
+        merged = []
+        for pred in predicates:
+            last = merged[-1] if merged else None
+            if last is not None and all(last.variables.get(k, v) is v
+                                        for k, v in pred.variables.items()):
+                variables = dict(last.variables, **pred.variables)
+                merged[-1] = Predicate("({}) & ({})".format(last.expr, pred.expr), variables)
+            else:
+                merged.append(pred)
+        return merged
+
+    def __repr__(self):
+        return repr(self.expr)
+
+
+class Node(object):
+    """Base class of the steps of a query plan.
+    """
+    children = ()
+
+    def columns(self):
+        """Return the names of the output columns.
+        """
+        raise NotImplementedError()
+
+    def execute(self):
+        """Run the step and return the resulting Tabel.
+        """
+        raise NotImplementedError()
+
+    def describe(self):
+        """Return a one line description of the step.
+        """
+        raise NotImplementedError()
+
+    def explain(self, indent=0):
+        """Return the plan from this step down as indented lines.
+        """
+        lines = ["  " * indent + self.describe()]
+        for child in self.children:
+            lines += child.explain(indent + 1)
+        return lines
+
+
+class Scan(Node):
+    """Read a Tabel, from memory or from a file, optionally filtered.
+
+    Parameters:
+        source (Tabel or str) :
+            the Tabel, or the name of the file to read.
+        options (dict) :
+            keyword arguments for :mod:`tabel.read_tabel`.
+        projection (list) :
+            the columns to read, all if None.
+        predicates (list) :
+            `Predicate` objects the rows have to match.
+    """
+
+    def __init__(self, source, options=None, projection=None, predicates=()):
+        self.source = source
+        self.options = dict(options or {})
+        self.projection = projection
+        self.predicates = list(predicates)
+        self._all_columns = None
+
+    def copy(self, **kwargs):
+        """Return a copy with some attributes replaced.
+        """
+        scan = Scan(self.source, self.options, kwargs.get("projection", self.projection),
+                    kwargs.get("predicates", self.predicates))
+        scan._all_columns = self._all_columns   # pylint: disable=protected-access
+        return scan
+
+    @property
+    def in_memory(self):
+        """bool: Whether the source is a Tabel instead of a file.
+        """
+        return not isstring(self.source)
+
+    def all_columns(self):
+        """Return the names of all columns in the source.
+        """
+        if self._all_columns is None:
+            if self.in_memory:
+                self._all_columns = list(self.source.columns)
+            else:
+                from .tabel import read_columns     # pylint: disable=cyclic-import
+                self._all_columns = read_columns(self.source, self.options.get("fmt", "auto"),
+                                                 self.options.get("header", True))
+        return self._all_columns
+
+    def columns(self):
+        if self.projection is None:
+            return list(self.all_columns())
+        return list(self.projection)
+
+    def execute(self):
+        columns = self.columns()
+        if self.in_memory:
+            tbl = self.source[:, columns]
+        elif self.predicates:
+            tbl = self._read_filtered(columns)
+        else:
+            from .tabel import read_tabel           # pylint: disable=cyclic-import
+            tbl = read_tabel(self.source, columns=columns, **self.options)
+        for pred in self.predicates:
+            tbl = tbl.where(pred.expr, pred.variables)
+        return tbl
+
+    def _read_filtered(self, columns):
+        """Read a file keeping only the columns and rows needed.
+
+        npz columns are decompressed lazily and npy columns memory-mapped, such
+        that only the predicate columns are read in full. csv files are read
+        and filtered in chunks, see `_read_csv_filtered`.
+        """
+        # pylint: disable=cyclic-import
+        from .tabel import read_tabel, _file_format
+        options = dict(self.options)
+        fmt = _file_format(self.source, options.pop("fmt", "auto"))
+        if fmt in ("csv", "gz"):
+            return self._read_csv_filtered(columns, fmt, options)
+        if fmt == "npz":
+            options.setdefault("lazy", True)
+        elif fmt == "npy":
+            options.setdefault("mmap", True)
+        return read_tabel(self.source, fmt=fmt, columns=columns, **options)
+
+    def _read_csv_filtered(self, columns, fmt, options):
+        """Read and filter a csv file in chunks of `PLAN_CHUNK_ROWS` rows.
+
+        Inferred columns widen from chunk to chunk, e.g. from int to float, as
+        they would when the whole file is read at once. If they did, the file is
+        read again with the final dtypes, such that all rows are filtered on
+        the same dtypes as `read_tabel(...).where(...)` does.
+        """
+        # pylint: disable=cyclic-import
+        from .tabel import Tabel, read_tabel, iter_tabel
+        csv_options = {k: options[k] for k in ("header", "threads") if k in options}
+        dtypes, widen = options.get("dtypes"), True
+        while True:
+            chunks, schemas = [], set()
+            for chunk in iter_tabel(self.source, PLAN_CHUNK_ROWS, fmt=fmt, dtypes=dtypes,
+                                    widen=widen, **csv_options):
+                dtypes = [dt.dtype.type if dt.dtype.kind in {'U', 'S'} else dt.dtype
+                          for dt in chunk.data]
+                schemas.add(tuple(dtypes))
+                chunk = chunk[:, columns]
+                for pred in self.predicates:
+                    chunk = chunk.where(pred.expr, pred.variables)
+                chunks.append(chunk)
+            if len(schemas) <= 1:
+                break
+            widen = False
+        return Tabel.concat(chunks) if chunks else read_tabel(self.source, fmt=fmt,
+                                                              columns=columns, **options)
+
+    def describe(self):
+        source = "Tabel{}".format(list(self.source.shape)) if self.in_memory \
+            else repr(self.source)
+        text = "Scan {}".format(source)
+        if self.projection is not None:
+            text += " columns={}".format(self.projection)
+        if self.predicates:
+            text += " filter={}".format(" & ".join(repr(p) for p in self.predicates))
+        return text
+
+
+class Filter(Node):
+    """Keep the rows matching a predicate.
+    """
+
+    def __init__(self, child, predicate):
+        self.children = (child,)
+        self.predicate = predicate
+
+    def columns(self):
+        return self.children[0].columns()
+
+    def execute(self):
+        return self.children[0].execute().where(self.predicate.expr, self.predicate.variables)
+
+    def describe(self):
+        return "Filter {!r}".format(self.predicate)
+
+
+class Select(Node):
+    """Keep some of the columns.
+    """
+
+    def __init__(self, child, columns):
+        self.children = (child,)
+        self.selection = list(columns)
+
+    def columns(self):
+        return list(self.selection)
+
+    def execute(self):
+        return self.children[0].execute()[:, self.selection]
+
+    def describe(self):
+        return "Select {}".format(self.selection)
+
+
+class Sort(Node):
+    """Sort the rows, see :mod:`tabel.Tabel.sort`.
+    """
+
+    def __init__(self, child, columns):
+        self.children = (child,)
+        self.sort_columns = _as_list(columns)
+
+    def columns(self):
+        return self.children[0].columns()
+
+    def execute(self):
+        tbl = self.children[0].execute()
+        tbl = tbl[:, :]
+        tbl.sort(self.sort_columns)
+        return tbl
+
+    def describe(self):
+        return "Sort {}".format(self.sort_columns)
+
+
+class GroupBy(Node):
+    """Group and aggregate, see :mod:`tabel.Tabel.group_by`.
+    """
+
+    def __init__(self, child, key, aggregate_fie_col=None):
+        self.children = (child,)
+        self.key = _as_list(key)
+        self.aggregate_fie_col = list(aggregate_fie_col or [])
+
+    @staticmethod
+    def output_name(fie, col):
+        """Return the name of the aggregated column
+        """
+        return col + "_" + (fie if isstring(fie) else fie.__name__)
+
+    def columns(self):
+        return self.key + [self.output_name(fie, col) for fie, col in self.aggregate_fie_col]
+
+    def execute(self):
+        return self.children[0].execute().group_by(self.key, self.aggregate_fie_col)
+
+    def describe(self):
+        return "GroupBy {} {}".format(self.key, [self.output_name(fie, col)
+                                                 for fie, col in self.aggregate_fie_col])
+
+
+class Join(Node):
+    """Join two plans, see :mod:`tabel.Tabel.join`.
+    """
+
+    def __init__(self, left, right, key, key_r=None, jointype="inner", suffixes=("_l", "_r")):
+        self.children = (left, right)
+        self.key = _as_list(key)
+        self.key_r = self.key if key_r is None else _as_list(key_r)
+        self.jointype = jointype
+        self.suffixes = tuple(suffixes)
+
+    def copy(self, left, right):
+        """Return a copy with other inputs.
+        """
+        return Join(left, right, self.key, self.key_r, self.jointype, self.suffixes)
+
+    def sources(self):
+        """Return a dict of output column name: (side, input column name)
+
+        Side is 'left', 'right' or 'key' for the key columns of inner, left
+        and right joins that are equal on both sides.
+        """
+        col_l = [c for c in self.children[0].columns() if c not in self.key]
+        col_r = [c for c in self.children[1].columns() if c not in self.key_r]
+        s_l, s_r = self.suffixes
+        sources = {}
+        if self.jointype == "outer":
+            sources.update((c + s_l, ("left", c)) for c in self.key + col_l)
+            sources.update((c + s_r, ("right", c)) for c in self.key_r + col_r)
+            return sources
+        sources.update((c + s_l, ("left", c)) for c in col_l)
+        sources.update((c + s_r, ("right", c)) for c in col_r)
+        key_out = self.key_r if self.jointype == "right" else self.key
+        sources.update((c, ("key", i)) for i, c in enumerate(key_out))
+        return sources
+
+    def columns(self):
+        col_l = [c for c in self.children[0].columns() if c not in self.key]
+        col_r = [c for c in self.children[1].columns() if c not in self.key_r]
+        s_l, s_r = self.suffixes
+        if self.jointype == "outer":
+            return [c + s_l for c in self.key + col_l] + [c + s_r for c in self.key_r + col_r]
+        if self.jointype == "right":
+            return [c + s_l for c in col_l] + self.key_r + [c + s_r for c in col_r]
+        return self.key + [c + s_l for c in col_l] + [c + s_r for c in col_r]
+
+    def execute(self):
+        return self.children[0].execute().join(self.children[1].execute(), self.key, self.key_r,
+                                               self.jointype, self.suffixes)
+
+    def describe(self):
+        return "Join {} on {} = {}".format(self.jointype, self.key, self.key_r)
+
+
+def _filter(node, predicates):
+    """Put the predicates on top of node, merged into as few filters as possible
+    """
+    for pred in Predicate.merge(predicates):
+        node = Filter(node, pred)
+    return node
+
+
+def push_filters(node, predicates=()):
+    """Return the plan with all filters moved down as far as possible
+
+    Filters are split into their "&" terms, each term is moved through
+    selections and sorts, into the inputs of joins as far as the join type
+    allows and below group_by if it only uses key columns. The terms arriving
+    at a scan are merged into its predicate.
+    """
+    # pylint: disable=too-many-return-statements,too-many-branches
+    predicates = list(predicates)
+    if isinstance(node, Filter):
+        return push_filters(node.children[0], node.predicate.split() + predicates)
+    if isinstance(node, Scan):
+        return node.copy(predicates=Predicate.merge(node.predicates + predicates))
+    if isinstance(node, Select):
+        return Select(push_filters(node.children[0], predicates), node.selection)
+    if isinstance(node, Sort):
+        return Sort(push_filters(node.children[0], predicates), node.sort_columns)
+    if isinstance(node, GroupBy):
+        down = [p for p in predicates if p.names <= set(node.key)]
+        up = [p for p in predicates if not p.names <= set(node.key)]
+        child = push_filters(node.children[0], down)
+        return _filter(GroupBy(child, node.key, node.aggregate_fie_col), up)
+    if isinstance(node, Join):
+        return _push_join_filters(node, predicates)
+    return _filter(node, predicates)
+
+
+def _push_join_filters(node, predicates):
+    """Push predicates into the inputs of a join, see `push_filters`
+    """
+    sources = node.sources()
+    left, right, up = [], [], []
+    for pred in predicates:
+        origins = set(sources[name][0] for name in pred.names if name in sources)
+        if node.jointype == "outer" or len(origins) != 1 or \
+                not all(name in sources for name in pred.names):
+            up.append(pred)
+            continue
+        origin = origins.pop()
+        if origin == "key":
+            left.append(pred.rename({n: node.key[sources[n][1]] for n in pred.names}))
+            right.append(pred.rename({n: node.key_r[sources[n][1]] for n in pred.names}))
+        elif origin == "left" and node.jointype in ("inner", "left"):
+            left.append(pred.rename({n: sources[n][1] for n in pred.names}))
+        elif origin == "right" and node.jointype in ("inner", "right"):
+            right.append(pred.rename({n: sources[n][1] for n in pred.names}))
+        else:
+            up.append(pred)
+    join = node.copy(push_filters(node.children[0], left),
+                     push_filters(node.children[1], right))
+    return _filter(join, up)
+
+
+def prune_columns(node, required=None):
+    """Return the plan reading and passing on only the columns needed
+
+    Arguments:
+        node (Node) :
+            the plan.
+        required (set) :
+            the output columns needed, all if None.
+    """
+    # pylint: disable=too-many-return-statements
+    if isinstance(node, Scan):
+        if required is None:
+            return node
+        needed = set(required).union(*[p.names for p in node.predicates])
+        return node.copy(projection=[c for c in node.all_columns() if c in needed])
+    if isinstance(node, Select):
+        selection = node.selection if required is None else \
+            [c for c in node.selection if c in required]
+        return Select(prune_columns(node.children[0], set(selection)), selection)
+    if isinstance(node, Filter):
+        child_required = None if required is None else set(required) | node.predicate.names
+        return Filter(prune_columns(node.children[0], child_required), node.predicate)
+    if isinstance(node, Sort):
+        child_required = None if required is None else \
+            set(required) | set(node.sort_columns)
+        return Sort(prune_columns(node.children[0], child_required), node.sort_columns)
+    if isinstance(node, GroupBy):
+        aggs = [(fie, col) for fie, col in node.aggregate_fie_col
+                if required is None or GroupBy.output_name(fie, col) in required]
+        child_required = set(node.key) | set(col for _, col in aggs)
+        return GroupBy(prune_columns(node.children[0], child_required), node.key, aggs)
+    if isinstance(node, Join):
+        sources = node.sources()
+        names = sources if required is None else [n for n in required if n in sources]
+        left, right = set(node.key), set(node.key_r)
+        for name in names:
+            side, col = sources[name]
+            if side == "left":
+                left.add(col)
+            elif side == "right":
+                right.add(col)
+        return node.copy(prune_columns(node.children[0], left),
+                         prune_columns(node.children[1], right))
+    return node
+
+
+def optimize(node):
+    """Return the optimized plan, see `push_filters` and `prune_columns`
+    """
+    return prune_columns(push_filters(node))
+
+
+class LazyTabel(object):
+    """A query on one or more Tabels, run when collected.
+
+    Every method records a step and returns a new LazyTabel, nothing is read or
+    computed until :mod:`collect`. Then the plan is optimized: filters are
+    merged and pushed down to the readers and to the inputs of joins, and only
+    the columns used further on are read and passed on.
+
+    Parameters:
+        node (Node) :
+            the last step of the plan.
+
+    Examples:
+        >>> tbl = Tabel({'a':[1, 2, 3, 4], 'b':['x', 'y', 'x', 'y'], 'c':[1., 2., 3., 4.]})
+        >>> plan = tbl.lazy().filter("a > 1").group_by('b', [('sum', 'c')])
+        >>> print(plan.explain())
+        GroupBy ['b'] ['c_sum']
+          Scan Tabel[4, 3] columns=['a', 'b', 'c'] filter='a > 1'
+        >>> plan.collect()
+         b   |   c_sum
+        -----+---------
+         y   |       6
+         x   |       3
+        2 rows ['<U1', '<f8']
+    """
+
+    def __init__(self, node):
+        self.node = node
+
+    def select(self, columns):
+        """Keep only `columns`.
+        """
+        return LazyTabel(Select(self.node, _as_list(columns)))
+
+    def filter(self, expr, variables=None):
+        """Keep the rows matching `expr`, see :mod:`tabel.Tabel.where`.
+
+        Raises:
+            KeyError :
+                When `expr` uses names that are neither columns at this step of
+                the plan nor `variables`, e.g. columns left out by a select.
+        """
+        predicate = Predicate(expr, variables)
+        missing = predicate.names - set(self.node.columns())
+        if missing:
+            raise KeyError("Unknown names in expression {!r}: {}".format(expr, sorted(missing)))
+        return LazyTabel(Filter(self.node, predicate))
+
+    def join(self, tbl_r, key, key_r=None, jointype="inner", suffixes=('_l', '_r')):
+        """Join with a Tabel or LazyTabel, see :mod:`tabel.Tabel.join`.
+        """
+        right = tbl_r.node if isinstance(tbl_r, LazyTabel) else Scan(tbl_r)
+        return LazyTabel(Join(self.node, right, key, key_r, jointype, suffixes))
+
+    def group_by(self, key, aggregate_fie_col=None):
+        """Group and aggregate, see :mod:`tabel.Tabel.group_by`.
+        """
+        return LazyTabel(GroupBy(self.node, key, aggregate_fie_col))
+
+    def sort(self, columns):
+        """Sort the rows, see :mod:`tabel.Tabel.sort`.
+        """
+        return LazyTabel(Sort(self.node, columns))
+
+    @property
+    def columns(self):
+        """list: Names of the columns of the result.
+        """
+        return self.node.columns()
+
+    def explain(self, optimized=True):
+        """Return the (optimized) plan as text, the last step first.
+        """
+        node = optimize(self.node) if optimized else self.node
+        return "\n".join(node.explain())
+
+    def collect(self, optimized=True):
+        """Run the (optimized) plan and return the resulting Tabel.
+        """
+        node = optimize(self.node) if optimized else self.node
+        return node.execute()
+
+    def __repr__(self):
+        return "LazyTabel\n" + self.explain(optimized=False)
+
+
+def scan_tabel(filename, **kwargs):
+    """Start a lazy query on a file
+
+    Arguments:
+        filename (str) :
+            the file to read, see :mod:`tabel.read_tabel`.
+        kwargs :
+            passed on to :mod:`tabel.read_tabel`, e.g. fmt, header or dtypes.
+
+    Returns:
+        :mod:`tabel.plan.LazyTabel`, reading only the columns and (for csv
+        files) keeping only the rows needed once collected.
+
+    Examples:
+        >>> from tabel import scan_tabel
+        >>> plan = scan_tabel("orders.npz").filter("amount > 100")  # doctest: +SKIP
+        >>> plan.group_by('customer', [('sum', 'amount')]).collect()  # doctest: +SKIP
+    """
+    return LazyTabel(Scan(filename, kwargs))
@@ -0,0 +1,337 @@
+#!/usr/bin/env python
+"""
+.. module:: tabel.profiling
+.. moduleauthor:: Bastiaan Bergman <Bastiaan.Bergman@gmail.com>
+
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import functools
+import threading
+from timeit import default_timer
+from .util import ImpError
+
+try:
+    import tracemalloc
+    TRACEMALLOC_PRESENT = True
+except ImpError:
+    TRACEMALLOC_PRESENT = False
+
+try:
+    import cProfile
+    import pstats
+    CPROFILE_PRESENT = True
+except ImpError:
+    CPROFILE_PRESENT = False
+
+_HOOKS = []
+_STATE = threading.local()
+
+
+def add_hook(hook):
+    """Register a function called with every finished `OperationRecord`.
+
+    Operations are only instrumented while at least one hook is registered,
+    without hooks the instrumented methods run at (almost) full speed.
+    """
+    _HOOKS.append(hook)
+
+
+def remove_hook(hook):
+    """Unregister a hook added by `add_hook`.
+    """
+    _HOOKS.remove(hook)
+
+
+class OperationRecord(object):
+    """Measurements of one call of an instrumented operation.
+
+    Attributes:
+        name (str) :
+            operation, e.g. 'join' or 'read_tabel'.
+        seconds (float) :
+            wall time.
+        rows_in (int) :
+            rows of the Tabels going in, None if there are none.
+        rows_out (int) :
+            rows of the resulting Tabel, for in-place operations rows of the
+            Tabel after the operation, None if there is none.
+        bytes_net (int) :
+            memory allocated and not released during the operation, None if
+            not tracing memory.
+        bytes_peak (int) :
+            peak memory above the start of the operation, None if not tracing
+            memory or for nested operations.
+        phases (list) :
+            (name, seconds) of the sub-phases, in order.
+        depth (int) :
+            0 for operations called directly, 1 for operations called by
+            those and so on.
+    """
+    __slots__ = ("name", "seconds", "rows_in", "rows_out", "bytes_net", "bytes_peak",
+                 "phases", "depth")
+
+    def __init__(self, name, depth=0):
+        self.name = name
+        self.seconds = None
+        self.rows_in = None
+        self.rows_out = None
+        self.bytes_net = None
+        self.bytes_peak = None
+        self.phases = []
+        self.depth = depth
+
+    def as_dict(self):
+        """Return the record as dict, phases as dict of name: seconds.
+        """
+        record = {k: getattr(self, k) for k in self.__slots__}
+        record["phases"] = dict(self.phases)
+        return record
+
+    def __repr__(self):
+        return "OperationRecord({})".format(self.as_dict())
+
+
+def _stack():
+    """The records of the operations running in this thread, innermost last.
+    """
+    stack = getattr(_STATE, "stack", None)
+    if stack is None:
+        stack = _STATE.stack = []
+    return stack
+
+
+def _rows(obj):
+    """Number of rows of a Tabel or of a list of Tabels, None for anything else.
+    """
+    if hasattr(obj, "columns") and hasattr(obj, "data"):
+        return len(obj)
+    if isinstance(obj, (list, tuple)) and obj and all(_rows(o) is not None for o in obj):
+        return sum(_rows(o) for o in obj)
+    return None
+
+
+class _Phase(object):
+    """Context manager timing a sub-phase of the running operation.
+    """
+    __slots__ = ("name", "record", "t0")
+
+    def __init__(self, name, record):
+        self.name = name
+        self.record = record
+        self.t0 = None
+
+    def __enter__(self):
+        self.t0 = default_timer()
+        return self
+
+    def __exit__(self, *exc):
+        self.record.phases.append((self.name, default_timer() - self.t0))
+
+
+class _NoPhase(object):
+    """Context manager doing nothing, used when not instrumenting.
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_PHASE = _NoPhase()
+
+
+def phase(name):
+    """Context manager timing a sub-phase of the running operation
+
+    Does nothing unless hooks are registered and an instrumented operation is
+    running.
+
+    Examples:
+        >>> with phase("factorize"):
+        ...     pass
+    """
+    if not _HOOKS:
+        return _NO_PHASE
+    stack = _stack()
+    if not stack:
+        return _NO_PHASE
+    return _Phase(name, stack[-1])
+
+
+def instrumented(name):
+    """Decorator recording calls of a Tabel operation
+
+    Without registered hooks the operation is called directly, else an
+    `OperationRecord` is made of the call and passed to the hooks.
+    """
+    def decorate(fie):
+        @functools.wraps(fie)
+        def wrapped(*args, **kwargs):
+            if not _HOOKS:
+                return fie(*args, **kwargs)
+            return _record(name, fie, args, kwargs)
+        return wrapped
+    return decorate
+
+
+def _record(name, fie, args, kwargs):
+    """Call `fie` recording an `OperationRecord` for the hooks.
+    """
+    stack = _stack()
+    record = OperationRecord(name, len(stack))
+    rows_in = [n for n in (_rows(a) for a in args) if n is not None]
+    record.rows_in = sum(rows_in) if rows_in else None
+    tracing = TRACEMALLOC_PRESENT and tracemalloc.is_tracing()
+    if tracing:
+        if not stack and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        mem0 = tracemalloc.get_traced_memory()[0]
+    stack.append(record)
+    t0 = default_timer()
+    try:
+        result = fie(*args, **kwargs)
+    finally:
+        record.seconds = default_timer() - t0
+        stack.pop()
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        record.bytes_net = current - mem0
+        if record.depth == 0 and hasattr(tracemalloc, "reset_peak"):
+            record.bytes_peak = peak - mem0
+    record.rows_out = _rows(result)
+    if result is None and args:
+        record.rows_out = _rows(args[0])
+    for hook in list(_HOOKS):
+        hook(record)
+    return result
+
+
+class Profiler(object):
+    """Collects the records of Tabel operations, see `profile`.
+
+    Attributes:
+        records (list) :
+            `OperationRecord` of every finished operation, in order of
+            finishing (nested operations before the operation calling them).
+    """
+
+    def __init__(self, memory=False, cprofile=False):
+        self.records = []
+        self.memory = memory
+        self.cprofile = cprofile
+        self._profile = None
+        self._snapshot = None
+        self._started_tracing = False
+
+    def __call__(self, record):
+        self.records.append(record)
+
+    def start(self):
+        """Start recording, also tracing memory and cProfile when requested.
+        """
+        if self.memory:
+            if not TRACEMALLOC_PRESENT:
+                raise ImpError("tracemalloc (python 3.4+) is needed for memory=True")
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+        if self.cprofile:
+            if not CPROFILE_PRESENT:
+                raise ImpError("cProfile is not available")
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        add_hook(self)
+        return self
+
+    def stop(self):
+        """Stop recording.
+        """
+        remove_hook(self)
+        if self._profile is not None:
+            self._profile.disable()
+        if self._started_tracing:
+            self._snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def to_dicts(self):
+        """Return the records as list of dicts, see `OperationRecord.as_dict`.
+        """
+        return [record.as_dict() for record in self.records]
+
+    def to_tabel(self):
+        """Return the records as Tabel, one row per operation, without phases.
+        """
+        from .tabel import Tabel                    # pylint: disable=cyclic-import
+        columns = [c for c in OperationRecord.__slots__ if c != "phases"]
+        return Tabel([[getattr(record, c) for record in self.records] for c in columns],
+                     columns=columns) if self.records else Tabel()
+
+    def summary(self):
+        """Return a dict of operation name: (calls, total seconds, total seconds
+        per phase), for the operations called directly.
+        """
+        summary = {}
+        for record in self.records:
+            if record.depth:
+                continue
+            calls, seconds, phases = summary.get(record.name, (0, 0., {}))
+            for name, phase_seconds in record.phases:
+                phases[name] = phases.get(name, 0.) + phase_seconds
+            summary[record.name] = (calls + 1, seconds + record.seconds, phases)
+        return summary
+
+    def stats(self):
+        """Return the `pstats.Stats` of the cProfile run, needs `cprofile=True`.
+        """
+        if self._profile is None:
+            raise ValueError("Profiler was not started with cprofile=True")
+        return pstats.Stats(self._profile)
+
+    def memory_top(self, limit=10, key_type="lineno"):
+        """Return the `limit` largest `tracemalloc.Statistic` of the memory
+        still allocated at the end, needs `memory=True`.
+        """
+        if self._snapshot is None:
+            raise ValueError("Profiler was not started and stopped with memory=True")
+        return self._snapshot.statistics(key_type)[:limit]
+
+
+def profile(memory=False, cprofile=False):
+    """Context manager recording the Tabel operations called inside
+
+    Records for every call of join, group_by, sort, append, concat, save and
+    read_tabel the wall time, the rows in and out, the sub-phase timings and,
+    with `memory`, the bytes allocated.
+
+    Arguments:
+        memory (bool) :
+            trace memory allocations with tracemalloc, slows down allocations.
+        cprofile (bool) :
+            also run cProfile, see `Profiler.stats`.
+
+    Returns:
+        `Profiler`, with the records available on exit.
+
+    Examples:
+        >>> from tabel import Tabel
+        >>> tbl = Tabel({'a': [1, 2, 2], 'b': [1., 2., 3.]})
+        >>> with profile() as prof:
+        ...     _ = tbl.group_by('a', [('sum', 'b')])
+        >>> record = prof.records[0]
+        >>> record.name, record.rows_in, record.rows_out
+        ('group_by', 3, 2)
+        >>> [name for name, _ in record.phases]
+        ['group_index', 'aggregate']
+    """
+    return Profiler(memory, cprofile)
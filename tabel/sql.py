@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+.. module:: tabel.sql
+.. moduleauthor:: Bastiaan Bergman <Bastiaan.Bergman@gmail.com>
+
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import sys
+from operator import itemgetter
+import numpy as np
+from .builder import build_columns
+
+SQL_BATCH_ROWS = 10000
+"""int: Default number of rows fetched or inserted per database call."""
+
+_PLACEHOLDERS = {"qmark": "?", "numeric": ":{}", "named": ":{}", "format": "%s",
+                 "pyformat": "%s"}
+_SQL_TYPES = {'b': "BOOLEAN", 'i': "INTEGER", 'u': "INTEGER", 'f': "REAL", 'M': "TIMESTAMP",
+              'U': "TEXT", 'S': "BLOB", 'O': "TEXT"}
+
+
+def _fetch_batches(cursor, arraysize):
+    """Generate the rows of a cursor as batches of column values.
+    """
+    getters = [itemgetter(i) for i in range(len(cursor.description))]
+    while True:
+        rows = cursor.fetchmany(arraysize)
+        if not rows:
+            return
+        yield [list(map(getter, rows)) for getter in getters]
+
+
+def read_cursor(cursor, arraysize=None, dtypes=None, tabel_class=None):
+    """Read the result set of an executed DB-API cursor into a Tabel
+
+    Rows are fetched `arraysize` at a time, every batch is turned into one
+    array per column and copied into growing column buffers, see
+    `tabel.builder.build_columns`.
+
+    Arguments:
+        cursor (object) :
+            DB-API 2.0 cursor on which a query was executed.
+        arraysize (int) :
+            rows per `fetchmany` call, `SQL_BATCH_ROWS` if None.
+        dtypes (list or dict) :
+            dtypes of the columns, in order or by column name, inferred from
+            the first batch for the other columns.
+        tabel_class (class) :
+            class of the returned Tabel.
+
+    Returns:
+        Tabel with the columns named as in `cursor.description`.
+    """
+    columns = [d[0] for d in cursor.description]
+    return build_columns(_fetch_batches(cursor, arraysize or SQL_BATCH_ROWS), columns, dtypes,
+                         tabel_class)
+
+
+def _paramstyle(conn):
+    """Return the paramstyle of the DB-API module of a connection.
+    """
+    module = sys.modules.get(type(conn).__module__.split(".")[0])
+    return getattr(module, "paramstyle", "qmark")
+
+
+def _python_values(dta):
+    """Return the values of a column as list of python objects a database
+    driver can bind: datetime64 as datetime, NaN as None.
+    """
+    dta = np.asarray(dta)
+    if dta.dtype.kind == 'M':
+        return dta.astype("datetime64[us]").tolist()
+    values = dta.tolist()
+    if dta.dtype.kind == 'f' and np.isnan(dta).any():
+        values = [None if v != v else v for v in values]
+    return values
+
+
+def _quoted(name):
+    """Return a name as quoted SQL identifier, with embedded quotes doubled.
+    """
+    return '"{}"'.format(str(name).replace('"', '""'))
+
+
+def write_sql(conn, table, columns, data, batch_size=None, create=False, paramstyle=None):
+    """Insert columns into a database table with `executemany` in batches
+
+    Arguments:
+        conn (object) :
+            DB-API 2.0 connection.
+        table (str) :
+            name of the table, quoted when `create` is True, otherwise used
+            as written, so it can be schema-qualified.
+        columns (list) :
+            column names, also the names of the columns of the table.
+        data (list) :
+            column arrays.
+        batch_size (int) :
+            rows per `executemany` call, `SQL_BATCH_ROWS` if None.
+        create (bool) :
+            whether to create the table first, with a column type per dtype.
+        paramstyle (str) :
+            DB-API paramstyle, taken from the module of `conn` if None.
+    """
+    placeholder = _PLACEHOLDERS[paramstyle or _paramstyle(conn)]
+    names = ", ".join(_quoted(col) for col in columns)
+    cursor = conn.cursor()
+    if create:
+        table = _quoted(table)
+        types = [_SQL_TYPES.get(np.dtype(dta.dtype).kind, "TEXT") for dta in data]
+        cursor.execute('CREATE TABLE {} ({})'.format(table, ", ".join(
+            '{} {}'.format(_quoted(col), typ) for col, typ in zip(columns, types))))
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(table, names, ", ".join(
+        placeholder.format(i + 1) for i in range(len(columns))))
+    batch_size = batch_size or SQL_BATCH_ROWS
+    n = len(data[0]) if data else 0
+    for start in range(0, n, batch_size):
+        values = [_python_values(dta[start:start + batch_size]) for dta in data]
+        cursor.executemany(sql, list(zip(*values)))
+    cursor.close()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+"""
+.. module:: tabel.storage
+.. moduleauthor:: Bastiaan Bergman <Bastiaan.Bergman@gmail.com>
+
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import json
+import os
+import zipfile
+import numpy as np
+from .categorical import Categorical, CATEGORIES_SUFFIX
+from .compress import thread_pool
+from .strings import StringColumn, UTF8_SUFFIX
+
+NPY_META_FILE = "tabel.json"
+"""str: Name of the metadata file in a npy directory."""
+
+ENCODED_COLUMNS = {
+    CATEGORIES_SUFFIX: (Categorical, lambda col: (col.codes, col.categories), Categorical),
+    UTF8_SUFFIX: (StringColumn,
+                  lambda col: (col.offsets - col.offsets[0],
+                               col.data[col.offsets[0]:col.offsets[-1]]),
+                  lambda offsets, data: StringColumn(data, offsets))}
+"""dict: Column types saved as two arrays, by the suffix of the name of the
+second array: the type, a function returning both arrays and a function
+building the column from them."""
+
+
+def _encoding(dta):
+    """Return the suffix and the two arrays of an encoded column, None if the
+    column is a plain array.
+    """
+    for suffix, (cls, encode, _) in ENCODED_COLUMNS.items():
+        if isinstance(dta, cls):
+            return (suffix,) + tuple(encode(dta))
+    return None
+
+
+def decode_column(suffix, main, second):
+    """Return the column saved as the arrays `main` and `second`.
+    """
+    return ENCODED_COLUMNS[suffix][2](main, second)
+
+
+def encode_columns(columns, data):
+    """Return names and arrays to save, encoded columns as two arrays.
+
+    The first array of an encoded column (the codes of a Categorical, the
+    offsets of a StringColumn) is saved under the column name, the second
+    under the column name plus the suffix of its type, see `ENCODED_COLUMNS`.
+    """
+    names, arrays = [], []
+    for col, dta in zip(columns, data):
+        encoded = _encoding(dta)
+        if encoded is not None:
+            names += [col, col + encoded[0]]
+            arrays += list(encoded[1:])
+        else:
+            names.append(col)
+            arrays.append(dta)
+    return names, arrays
+
+
+def split_encoded(keys):
+    """Return the column names among the saved `keys` and a dict of column
+    name: (suffix, key of the second array) for the encoded columns.
+    """
+    encoded = {}
+    for k in keys:
+        for suffix in ENCODED_COLUMNS:
+            if k.endswith(suffix) and k[:-len(suffix)] in keys:
+                encoded[k[:-len(suffix)]] = (suffix, k)
+    seconds = set(key for _, key in encoded.values())
+    return [k for k in keys if k not in seconds], encoded
+
+
+def save_npy_dir(columns, data, dirname):
+    """Save columns as a directory of uncompressed .npy files.
+
+    Every column is written to its own `<i>.npy` file, column order, names and
+    dtypes go into a small json metadata file. The second array of encoded
+    columns, like the categories of a Categorical, goes into a
+    `<i><suffix>.npy` file.
+
+    Arguments:
+        columns (list) :
+            column names
+        data (list) :
+            column arrays
+        dirname (str) :
+            directory to write to, created if it does not exist.
+    """
+    for col, dta in zip(columns, data):
+        if dta.dtype.hasobject:
+            raise ValueError("Column {} of dtype object cannot be stored in npy format.".format(col))
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    files = ["{}.npy".format(i) for i in range(len(columns))]
+    encoded = [None] * len(columns)
+    for i, (fn, dta) in enumerate(zip(files, data)):
+        encoding = _encoding(dta)
+        if encoding is not None:
+            suffix, dta, second = encoding
+            encoded[i] = [suffix, "{}{}.npy".format(i, suffix)]
+            np.save(os.path.join(dirname, encoded[i][1]), second)
+        np.save(os.path.join(dirname, fn), dta)
+    meta = {"columns": list(columns), "files": files,
+            "dtypes": [dta.dtype.str for dta in data], "encoded": encoded}
+    with open(os.path.join(dirname, NPY_META_FILE), 'w') as f:
+        json.dump(meta, f)
+
+
+def select_columns(available, columns=None):
+    """Return the indices of `columns` in the list of `available` columns.
+
+    Arguments:
+        available (list) :
+            column names present in the file.
+        columns (list or None) :
+            column names to select, all columns if None.
+
+    Raises:
+        KeyError :
+            When a column is not available.
+    """
+    if columns is None:
+        return list(range(len(available)))
+    missing = [c for c in columns if c not in available]
+    if missing:
+        raise KeyError("Columns not found: {}, available are: {}".format(missing, available))
+    return [available.index(c) for c in columns]
+
+
+def read_npy_meta(dirname):
+    """Return the metadata (columns, files and dtypes) of a npy directory.
+    """
+    with open(os.path.join(dirname, NPY_META_FILE), 'r') as f:
+        return json.load(f)
+
+
+def read_npy_dir(dirname, mmap=False, columns=None):
+    """Read a directory of .npy files written by `save_npy_dir`.
+
+    Arguments:
+        dirname (str) :
+            directory to read from.
+        mmap (bool or str) :
+            If True, memory-map the column files read-only instead of reading
+            them, a mode string ('r', 'r+', 'c') is passed to `numpy.load` as
+            `mmap_mode`.
+        columns (list or None) :
+            names of the columns to read, all columns if None.
+
+    Returns:
+        dict with the datastruct and columns.
+    """
+    mmap_mode = 'r' if mmap is True else (mmap or None)
+    meta = read_npy_meta(dirname)
+    indices = select_columns(meta["columns"], columns)
+    datastruct = [np.load(os.path.join(dirname, meta["files"][i]), mmap_mode=mmap_mode)
+                  for i in indices]
+    encoded = meta.get("encoded") or [None] * len(meta["columns"])
+    for j, i in enumerate(indices):
+        if encoded[i] is not None:
+            suffix, fn = encoded[i]
+            datastruct[j] = decode_column(suffix, datastruct[j],
+                                          np.load(os.path.join(dirname, fn), mmap_mode=mmap_mode))
+    return dict(datastruct=datastruct, columns=[meta["columns"][i] for i in indices])
+
+
+class LazyColumn(object):
+    """Deferred column of a npz file.
+
+    Holds the shape and dtype of a column, read from the npy header only, and
+    decompresses the data on first use. The loaded array is kept, loading is
+    done only once.
+
+    Parameters:
+        filename (str) :
+            npz file name.
+        key (str) :
+            name of the array in the npz file.
+        shape (tuple) :
+            shape of the array.
+        dtype (numpy.dtype) :
+            dtype of the array.
+    """
+
+    def __init__(self, filename, key, shape, dtype):
+        self.filename = filename
+        self.key = key
+        self.shape = shape
+        self.dtype = dtype
+        self._array = None
+
+    def load(self):
+        """Return the column data as numpy.ndarray, reading it if not done before.
+        """
+        if self._array is None:
+            self._array = _read_npz_column(self.filename, self.key)
+        return self._array
+
+    @property
+    def loaded(self):
+        """bool: Whether the data has been read from disk.
+        """
+        return self._array is not None
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None):
+        return np.asarray(self.load(), dtype=dtype)
+
+    def __getitem__(self, key):
+        return self.load()[key]
+
+    def __setitem__(self, key, value):
+        self.load()[key] = value
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def __getattr__(self, name):
+        if name.startswith("__") or name == "_array":
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __repr__(self):
+        return "LazyColumn({!r}, {!r}, {}, {})".format(self.filename, self.key,
+                                                       self.shape, self.dtype.str)
+
+
+def _npy_header(fobj):
+    """Return shape and dtype from the header of an open npy file.
+    """
+    version = np.lib.format.read_magic(fobj)
+    if version == (1, 0):
+        shape, _, dtype = np.lib.format.read_array_header_1_0(fobj)
+    else:
+        shape, _, dtype = np.lib.format.read_array_header_2_0(fobj)
+    return shape, dtype
+
+
+def _read_npz_column(filename, key):
+    """Read a single column of a npz file.
+    """
+    with np.load(filename) as reader:
+        return reader[key]
+
+
+def read_npz(filename, columns=None, lazy=False, threads=1):
+    """Read (some of) the columns of a npz file.
+
+    Arguments:
+        filename (str) :
+            npz file name.
+        columns (list or None) :
+            names of the columns to read, all columns if None. Other columns
+            are not decompressed.
+        lazy (bool) :
+            If True, return `LazyColumn` objects that only decompress the data
+            on first use, instead of arrays. Encoded columns (Categorical,
+            StringColumn) are always read.
+        threads (int) :
+            number of columns decompressed concurrently.
+
+    Returns:
+        dict with the datastruct and columns.
+    """
+    with np.load(filename) as reader:
+        available, encoded = split_encoded(list(reader.keys()))
+        columns = [available[i] for i in select_columns(available, columns)]
+        seconds = {k: (encoded[k][0], reader[encoded[k][1]]) for k in columns if k in encoded}
+        if not lazy and threads <= 1:
+            datastruct = [reader[k] for k in columns]
+    if lazy:
+        datastruct = []
+        with zipfile.ZipFile(filename) as archive:
+            for k in columns:
+                with archive.open(k + ".npy") as fobj:
+                    shape, dtype = _npy_header(fobj)
+                datastruct.append(LazyColumn(filename, k, shape, dtype))
+    elif threads > 1:
+        with thread_pool(threads) as executor:
+            datastruct = list(executor.map(lambda k: _read_npz_column(filename, k), columns))
+    datastruct = [decode_column(seconds[k][0], np.asarray(dta), seconds[k][1])
+                  if k in seconds else dta for k, dta in zip(columns, datastruct)]
+    return dict(datastruct=datastruct, columns=columns)
@@ -0,0 +1,411 @@
+#!/usr/bin/env python
+"""
+.. module:: tabel.strings
+.. moduleauthor:: Bastiaan Bergman <Bastiaan.Bergman@gmail.com>
+
+"""
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import operator
+import numpy as np
+from .util import isstring
+
+UTF8_SUFFIX = ".utf8"
+"""str: Suffix of the name under which the bytes of a string column are saved."""
+
+
+def _byte_positions(starts, lengths):
+    """Return the positions in the byte buffer of `lengths` bytes from each of
+    `starts`, concatenated.
+    """
+    total = int(lengths.sum())
+    ends = np.cumsum(lengths)
+    return np.repeat(starts - (ends - lengths), lengths) + np.arange(total)
+
+
+def _row_bytes(col, start, stop):
+    """Return the utf-8 bytes of the rows `start` up to `stop` as list of bytes.
+    """
+    offsets = col.offsets[start:stop + 1]
+    buf = col.data[offsets[0]:offsets[-1]].tobytes()
+    bounds = (offsets - offsets[0]).tolist()
+    return [buf[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+def _from_byte_list(values):
+    """Return the StringColumn of a list of utf-8 bytes.
+    """
+    offsets = np.concatenate([[0], np.cumsum([len(value) for value in values], dtype=np.int64)])
+    return StringColumn(np.frombuffer(bytearray(b"".join(values)), dtype=np.uint8), offsets)
+
+
+def _encoded(value):
+    """Return the utf-8 bytes of a value, bytes are taken as they are.
+    """
+    return value if isinstance(value, bytes) else str(value).encode('utf-8')
+
+
+FACTORIZE_ROWS = 2**16
+"""int: Number of rows of a StringColumn hashed at once by `factorize`."""
+
+
+def factorize(cols):
+    """Return codes for StringColumns in one shared, sorted dictionary
+
+    The bytes of every row are looked up in a dict, `FACTORIZE_ROWS` rows at
+    a time, so memory stays proportional to the bytes of the distinct
+    strings; no fixed width copy padded to the longest string is made.
+
+    Returns:
+        Tuple (codes, uniques): an int64 code array per column, equal strings
+        have equal codes and codes order like the strings, and the sorted
+        distinct strings as list of utf-8 bytes.
+    """
+    groups = {}
+    codes = []
+    for col in cols:
+        col_codes = np.empty(len(col), dtype=np.int64)
+        for start in range(0, len(col), FACTORIZE_ROWS):
+            stop = min(start + FACTORIZE_ROWS, len(col))
+            col_codes[start:stop] = [groups.setdefault(value, len(groups))
+                                     for value in _row_bytes(col, start, stop)]
+        codes.append(col_codes)
+    uniques = list(groups)
+    order = sorted(range(len(uniques)), key=uniques.__getitem__)
+    rank = np.empty(len(uniques), dtype=np.int64)
+    rank[order] = np.arange(len(uniques))
+    return [rank[col_codes] for col_codes in codes], [uniques[i] for i in order]
+
+
+def _padded(values):
+    """Return a 2d uint8 array, the utf-8 bytes of each value padded with zeros,
+    and the number of bytes of each value.
+    """
+    values = np.asarray(values, dtype=np.str_).reshape(-1)
+    if not len(values):
+        return np.zeros((0, 1), dtype=np.uint8), np.zeros(0, dtype=np.int64)
+    encoded = np.char.encode(values, 'utf-8')
+    lengths = np.char.str_len(encoded).astype(np.int64)
+    width = max(encoded.dtype.itemsize, 1)
+    return np.ascontiguousarray(encoded, dtype='S{}'.format(width)).view(np.uint8).reshape(
+        len(encoded), width), lengths
+
+
+def _as_strings(value):
+    """Return `value` as StringColumn if it is one or a string array, else None
+    """
+    if isinstance(value, StringColumn):
+        return value
+    if np.asarray(value).dtype.kind in {'U', 'S', 'O'}:
+        return StringColumn.from_array(value)
+    return None
+
+
+def _concatenate(arrays, axis=0, out=None, **kwargs):
+    """np.concatenate for StringColumns and string arrays
+    """
+    if axis != 0 or out is not None or kwargs:
+        return NotImplemented
+    cols = [_as_strings(arr) for arr in arrays]
+    if any(col is None for col in cols):
+        return NotImplemented
+    shifts = np.cumsum([0] + [col.offsets[-1] - col.offsets[0] for col in cols[:-1]])
+    offsets = np.concatenate([[0]] + [col.offsets[1:] - col.offsets[0] + shift
+                                      for col, shift in zip(cols, shifts)])
+    data = np.concatenate([col.data[col.offsets[0]:col.offsets[-1]] for col in cols])
+    return StringColumn(data, offsets)
+
+
+def _delete(arr, obj, axis=None):                      # pylint: disable=unused-argument
+    """np.delete as a take of the remaining rows
+    """
+    keep = np.ones(len(arr), dtype=bool)
+    keep[obj] = False
+    return arr[keep]
+
+
+def _argsort(a, axis=-1, kind=None, order=None):
+    """np.argsort on the sorted codes, see `factorize`
+    """
+    return np.argsort(a.sort_key(), axis=axis, kind=kind, order=order)
+
+
+def _lexsort(keys, axis=-1):
+    """np.lexsort with the sorted codes of StringColumns as keys
+    """
+    return np.lexsort([key.sort_key() if isinstance(key, StringColumn) else key for key in keys],
+                      axis=axis)
+
+
+def _unique(ar, return_index=False, return_inverse=False, return_counts=False, axis=None,
+            **kwargs):
+    """np.unique on the sorted codes, the uniques are returned as StringColumn
+    """
+    (codes,), uniques = factorize([ar])
+    result = np.unique(codes, return_index, return_inverse, return_counts, axis, **kwargs)
+    # every code occurs, the unique codes are the positions in `uniques`
+    if isinstance(result, tuple):
+        return (_from_byte_list(uniques),) + result[1:]
+    return _from_byte_list(uniques)
+
+
+def _materialize(value):
+    """Replace StringColumns, also inside lists and tuples, by numpy arrays.
+    """
+    if isinstance(value, StringColumn):
+        return np.asarray(value)
+    if isinstance(value, (list, tuple)):
+        return type(value)(_materialize(v) for v in value)
+    return value
+
+
+_ARRAY_FUNCTIONS = {np.concatenate: _concatenate, np.delete: _delete, np.argsort: _argsort,
+                    np.lexsort: _lexsort, np.unique: _unique}
+
+
+class StringColumn(object):
+    """Variable length string column, utf-8 bytes in one buffer plus offsets.
+
+    Row `i` is ``data[offsets[i]:offsets[i+1]]`` decoded, like the string
+    arrays of Apache Arrow. Each row takes its own length in bytes plus eight
+    bytes of offset, where a numpy `<U` column takes four bytes times the
+    longest string for every row. Slicing, taking rows and comparing for
+    equality work on the bytes; getting a single element returns the string.
+    Sorting, unique, ordering comparisons and joins work on codes from a dict
+    of the distinct utf-8 byte strings, see `factorize`, which order like the
+    strings. Numpy functions without a dedicated implementation get the
+    decoded `<U` array.
+
+    A slice with step 1 is a view on the bytes: setting strings of the same
+    length in bytes writes through to the column, in place. Setting strings of
+    another length in a slice raises a ValueError, set them in the column,
+    which rebuilds its buffer and detaches existing slices.
+
+    Parameters:
+        data (numpy.ndarray) :
+            uint8 buffer with the utf-8 encoded strings.
+        offsets (numpy.ndarray) :
+            int64 start of every string in `data`, followed by the end of the
+            last one.
+
+    Examples:
+        >>> col = StringColumn.from_array(['a', 'bcd', '', 'ef'])
+        >>> col.offsets
+        array([0, 1, 4, 4, 6])
+        >>> col[1]
+        'bcd'
+        >>> col == 'ef'
+        array([False, False, False,  True])
+    """
+    ndim = 1
+    __hash__ = None
+
+    def __init__(self, data, offsets):
+        self.data = np.asarray(data, dtype=np.uint8)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self._view = False
+
+    @classmethod
+    def from_array(cls, values):
+        """Return the StringColumn encoding a `<U`, `S` or object array or list.
+
+        Lists and object arrays are encoded element by element, without
+        padding them to the longest string first.
+        """
+        if isinstance(values, StringColumn):
+            return values
+        if isinstance(values, (list, tuple)):
+            return _from_byte_list([_encoded(value) for value in values])
+        if isinstance(values, np.ndarray) and values.dtype.kind == 'O':
+            return _from_byte_list([_encoded(value) for value in values.ravel().tolist()])
+        padded, lengths = _padded(values)
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        return cls(padded[np.arange(padded.shape[1]) < lengths[:, None]], offsets)
+
+    @classmethod
+    def from_bytes(cls, values):
+        """Return the StringColumn of an `S` array holding utf-8 bytes.
+        """
+        values = np.ascontiguousarray(values)
+        width = max(values.dtype.itemsize, 1)
+        padded = values.astype('S{}'.format(width)).view(np.uint8).reshape(len(values), width)
+        lengths = np.char.str_len(values).astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        return cls(padded[np.arange(width) < lengths[:, None]], offsets)
+
+    @property
+    def lengths(self):
+        """numpy.ndarray: number of bytes of each string.
+        """
+        return np.diff(self.offsets)
+
+    @property
+    def dtype(self):
+        """numpy.dtype: flexible unicode dtype, the kind of the decoded values.
+        """
+        return np.dtype(np.str_)
+
+    @property
+    def shape(self):
+        """tuple: shape of the column.
+        """
+        return (len(self),)
+
+    @property
+    def size(self):
+        """int: number of elements.
+        """
+        return len(self)
+
+    @property
+    def nbytes(self):
+        """int: memory used by the bytes and the offsets.
+        """
+        return int(self.offsets[-1] - self.offsets[0]) + self.offsets.nbytes
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def sort_key(self):
+        """Return int64 codes of the strings, equal strings have equal codes
+        and codes order like the strings, see `factorize`.
+        """
+        return factorize([self])[0][0]
+
+    def __array__(self, dtype=None):
+        if not len(self):
+            return np.zeros(0, dtype=dtype or np.str_)
+        values = np.array(self.tolist(), dtype=np.str_)
+        return values if dtype is None else values.astype(dtype)
+
+    def __array_function__(self, func, types, args, kwargs):
+        handler = _ARRAY_FUNCTIONS.get(func)
+        if handler is not None:
+            result = handler(*args, **kwargs)
+            if result is not NotImplemented:
+                return result
+        return func(*_materialize(args), **{k: _materialize(v) for k, v in kwargs.items()})
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def _take(self, rows):
+        """Return a StringColumn of the rows `rows`, an integer array.
+        """
+        lengths = self.lengths[rows]
+        data = self.data[_byte_positions(self.offsets[rows], lengths)]
+        return StringColumn(data, np.concatenate([[0], np.cumsum(lengths)]))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                # a view on the bytes
+                col = StringColumn(self.data, self.offsets[start:max(stop, start) + 1])
+                col._view = True                        # pylint: disable=protected-access
+                return col
+            return self._take(np.arange(start, stop, step))
+        rows = np.arange(len(self))[key]
+        if np.ndim(rows) == 0:
+            return bytes(self.data[self.offsets[rows]:self.offsets[rows + 1]]).decode('utf-8')
+        return self._take(rows)
+
+    def __setitem__(self, key, value):
+        rows = np.arange(len(self))[key]
+        if not isinstance(value, StringColumn):
+            value = np.broadcast_to(np.asarray(value), np.shape(rows)).reshape(-1)
+        values = StringColumn.from_array(value)
+        lengths = values.lengths
+        if len(values) != np.size(rows):
+            raise ValueError("Cannot set {} strings into {} rows".format(len(values),
+                                                                         np.size(rows)))
+        rows = np.reshape(rows, -1)
+        if self.data.flags.writeable and np.array_equal(self.lengths[rows], lengths):
+            # same number of bytes per row, overwrite them in place
+            self.data[_byte_positions(self.offsets[rows], lengths)] = \
+                values.data[values.offsets[0]:values.offsets[-1]]
+            return
+        if getattr(self, "_view", False):
+            raise ValueError("Strings of another length set in a slice of a string column, "
+                             "set them in the column itself")
+        take = np.arange(len(self))
+        take[rows] = len(self) + np.arange(len(values))
+        result = np.concatenate([self, values])._take(take)
+        self.data, self.offsets = result.data, result.offsets
+
+    def __eq__(self, other):
+        if isstring(other) or isinstance(other, (bytes, np.bytes_)):
+            other_data = np.frombuffer(other if isinstance(other, bytes) else
+                                       other.encode('utf-8'), dtype=np.uint8)
+            other_starts = np.zeros(len(self), dtype=np.int64)
+            other_lengths = np.full(len(self), len(other_data))
+        elif isinstance(other, StringColumn) or \
+                (np.ndim(other) == 1 and np.asarray(other).dtype.kind in {'U', 'S', 'O'}):
+            other = StringColumn.from_array(other)
+            if len(other) != len(self):
+                raise ValueError("Operands of different length: {} {}".format(
+                    len(self), len(other)))
+            other_data, other_starts, other_lengths = other.data, other.offsets[:-1], \
+                other.lengths
+        else:
+            return np.asarray(self) == other
+        lengths = self.lengths
+        rows = np.flatnonzero(lengths == other_lengths)
+        positions = _byte_positions(self.offsets[rows], lengths[rows])
+        other_positions = _byte_positions(other_starts[rows], lengths[rows])
+        differ = self.data[positions] != other_data[other_positions]
+        row_of_byte = np.repeat(np.arange(len(rows)), lengths[rows])
+        equal = np.zeros(len(self), dtype=bool)
+        equal[rows] = np.bincount(row_of_byte[differ], minlength=len(rows)) == 0
+        return equal
+
+    def __ne__(self, other):
+        return ~(self == other)
+
+    def _compare(self, other, fie):
+        """Order with a string or string column on the utf-8 bytes, with
+        anything else decoded
+        """
+        if isstring(other) or isinstance(other, (bytes, np.bytes_)):
+            other = _from_byte_list([_encoded(other)])
+        elif isinstance(other, StringColumn) or \
+                (np.ndim(other) == 1 and np.asarray(other).dtype.kind in {'U', 'S', 'O'}):
+            other = StringColumn.from_array(other)
+            if len(other) != len(self):
+                raise ValueError("Operands of different length: {} {}".format(
+                    len(self), len(other)))
+        else:
+            return fie(np.asarray(self), other)
+        (codes, other_codes), _ = factorize([self, other])
+        return fie(codes, other_codes)
+
+    def __lt__(self, other):
+        return self._compare(other, operator.lt)
+
+    def __le__(self, other):
+        return self._compare(other, operator.le)
+
+    def __gt__(self, other):
+        return self._compare(other, operator.gt)
+
+    def __ge__(self, other):
+        return self._compare(other, operator.ge)
+
+    def astype(self, dtype, copy=True):                 # pylint: disable=unused-argument
+        """Return the decoded values as numpy array of `dtype`.
+        """
+        return np.asarray(self).astype(dtype)
+
+    def copy(self):
+        """Return a copy holding only its own bytes.
+        """
+        return StringColumn(self.data[self.offsets[0]:self.offsets[-1]].copy(),
+                            self.offsets - self.offsets[0])
+
+    def tolist(self):
+        """Return the decoded values as list.
+        """
+        return [value.decode('utf-8') for value in _row_bytes(self, 0, len(self))]
+
+    def __repr__(self):
+        return "StringColumn({})".format(np.asarray(self))
@@ -6,10 +6,27 @@
 """
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
+from itertools import islice
+from operator import itemgetter
+import re
+import weakref
 import numpy as np
 from .numpy_types import *                              # pylint: disable=wildcard-import
-from .hashjoin import HashJoinMixin
-from .util import ImpError, isstring
+from .hashjoin import HashJoinMixin, fill_value
+from .builder import TabelBuilder, read_records
+from .expr import ExpressionMixin
+from .compress import open_gzip, savez_compressed
+from .executor import column_map
+from .profiling import instrumented, phase
+from .index import TabelIndex
+from .categorical import Categorical, code_dtype
+from .strings import StringColumn
+from .arrow import (to_arrow_table, from_arrow_table, save_parquet, save_feather, read_parquet,
+                    read_feather, read_arrow_columns, ARROW_FORMATS)
+from .sql import read_cursor, write_sql
+from .storage import (save_npy_dir, read_npy_dir, read_npy_meta, read_npz, select_columns,
+                      LazyColumn, encode_columns, split_encoded)
+from .util import ImpError, isstring, gc_paused
 
 try:
     from tabulate import tabulate
@@ -35,18 +52,46 @@ except ImpError as e:
     import warnings                             # pylint: disable=ungrouped-imports
     warnings.warn("Dependencies could not be loaded: {}".format(e))
 
-try:
-    import gzip
-except ImpError as e:
-    import warnings
-    warnings.warn("Dependencies could not be loaded: {}".format(e))
-
 try:
     import pandas as pd     # to take pandas data and transform it to native
     PD_PRESENT = True
 except ImpError:
     PD_PRESENT = False
 
+CATEGORIZE_MAX_RATIO = 0.5
+"""float: Maximum fraction of unique values of string columns categorized by default."""
+
+_TYPE_NAMES = {Categorical: "category", StringColumn: "string"}
+
+
+def _from_pandas_categorical(cat, copy=True):
+    """Return a pandas.Categorical of strings as Categorical, None if it has
+    missing values or other categories.
+    """
+    if not cat.categories.inferred_type == "string" or np.any(cat.codes < 0):
+        return None
+    values = np.asarray(cat.categories, dtype=np.str_)
+    order = np.argsort(values, kind='mergesort')
+    codes = cat.codes
+    if np.any(order != np.arange(len(order))):
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        codes = rank[codes]
+    elif copy:
+        codes = codes.copy()
+    return Categorical(codes.astype(code_dtype(len(values)), copy=False), values[order])
+
+
+def _to_pandas_column(dta, copy=True):
+    """Return a column for a pandas.DataFrame, Categoricals as pandas.Categorical.
+    """
+    if isinstance(dta, Categorical):
+        return pd.Categorical.from_codes(dta.codes.copy() if copy else dta.codes,
+                                         dta.categories)
+    if isinstance(dta, (StringColumn, LazyColumn)):
+        return np.asarray(dta)
+    return dta
+
 
 def transpose(datastruct):
     """Transpose rows and columns.
@@ -66,19 +111,77 @@ def transpose(datastruct):
         transposed datastruct, list containing lists with the data for each
         column.
     """
-    shape = (len(datastruct), len(datastruct[0]))
-    datastruct_out = [[] for i in range(shape[1])]      # pylint: disable=unused-variable
-    for row in datastruct:
-        assert len(row) == shape[1]
-        for col, c in zip(datastruct_out, row):
-            col.append(c)
-    return datastruct_out
+    assert len(set(map(len, datastruct))) == 1
+    return [list(map(itemgetter(i), datastruct)) for i in range(len(datastruct[0]))]
 
 
 T = transpose
 """Convenience alias for :mod:`tabel.transpose`."""
 
-class Tabel(HashJoinMixin):
+_INT_TYPES = (int, np.integer)
+
+
+class _ReadOnly(ValueError):
+    """Assignment into a read-only column, not to be taken for an invalid key.
+    """
+
+
+def _invalidating(method):
+    """Wrap a list method to drop the cached positions of `ColumnNames`.
+    """
+    def wrapped(self, *args):
+        self._positions = None                  # pylint: disable=protected-access
+        return method(self, *args)
+    wrapped.__name__ = method.__name__
+    wrapped.__doc__ = method.__doc__
+    return wrapped
+
+
+class ColumnNames(list):
+    """List of column names with a cached name to position map.
+
+    Behaves as a list, :attr:`tabel.Tabel.columns` can still be changed in
+    place. Every change drops the map, it is rebuilt on the next lookup.
+    """
+    _positions = None
+
+    def position(self, name):
+        """Return the position of the first column called `name`, None if there
+        is none or `name` is not hashable.
+        """
+        positions = self._positions
+        if positions is None:
+            positions = {}
+            for i in range(len(self) - 1, -1, -1):
+                try:
+                    positions[self[i]] = i
+                except TypeError:
+                    pass
+            self._positions = positions
+        try:
+            return positions.get(name)
+        except TypeError:
+            return None
+
+    __setitem__ = _invalidating(list.__setitem__)
+    __delitem__ = _invalidating(list.__delitem__)
+    __iadd__ = _invalidating(list.__iadd__)
+    __imul__ = _invalidating(list.__imul__)
+    append = _invalidating(list.append)
+    extend = _invalidating(list.extend)
+    insert = _invalidating(list.insert)
+    pop = _invalidating(list.pop)
+    remove = _invalidating(list.remove)
+    sort = _invalidating(list.sort)
+    reverse = _invalidating(list.reverse)
+    if hasattr(list, "clear"):
+        clear = _invalidating(list.clear)
+    if hasattr(list, "__setslice__"):                   # python 2
+        __setslice__ = _invalidating(list.__setslice__)
+        __delslice__ = _invalidating(list.__delslice__)
+
+
+class Tabel(HashJoinMixin, ExpressionMixin):
     """Tabel datastructure
 
     Data table with rows and columns, rows are numbered columns are named. Each
@@ -96,7 +199,9 @@ class Tabel(HashJoinMixin):
             strings of column number.
         copy (boolean) :
             Wether to make a copy of the data or to reference to the current
-            memory location (when possible), default: True
+            memory location (when possible), default: True. Numeric columns of
+            a `pandas.DataFrame` are then shared with the DataFrame, see also
+            :mod:`tabel.Tabel.to_pandas`.
 
     Notes:
 
@@ -137,6 +242,11 @@ class Tabel(HashJoinMixin):
 
     join_fill_value = {"float": np.nan, "integer": 999999, "string": ""}
     """dict: Fill vallues to be used when doing outer joins"""
+    column_threads = 1
+    """int: Number of threads processing the columns concurrently when sorting,
+    slicing rows, deleting rows and converting types, see
+    :mod:`tabel.executor.column_map`. Set on the class for all Tabels or on an
+    instance."""
 
 
     def __init__(self, datastruct=None, columns=None, copy=True):
@@ -148,11 +258,8 @@ class Tabel(HashJoinMixin):
             checked with the property :func:`~tabel.Tabel.valid`.
             """
         self.columns = list()
-        """list :
-            string names of columns. Can be maniulated directly, if desired, as
-            long as the structure remains valid within this framwork. Validity
-            can be checked with the method :func:`~tabel.Tabel.valid`.
-            """
+        self._sorted_by = ()
+        self._indexes = {}
         if datastruct is not None:
             if hasattr(datastruct, "items"):
                 datastruct_iter = datastruct.items()
@@ -182,11 +289,93 @@ class Tabel(HashJoinMixin):
         if not self.valid:
             raise ValueError("Invalid Table created.")
 
+    def __copy__(self):
+        """Shallow copy, with its own indexes such that creating or dropping
+        one on the copy leaves this Tabel alone.
+        """
+        tbl = self.__class__.__new__(self.__class__)
+        tbl.__dict__.update(self.__dict__)
+        tbl._indexes = {cols: index.copy()
+                        for cols, index in getattr(self, "_indexes", {}).items()}
+        return tbl
+
+    def _mutated(self, sorted_by=()):
+        """Record a change of the data
+
+        Sets the sort order still known after the change and invalidates the
+        indexes, they are rebuilt on their next use.
+        """
+        self._sorted_by = tuple(sorted_by)
+        for index in getattr(self, "_indexes", {}).values():
+            index.invalidate()
+
+    def _written(self):
+        """Record a write through indexing, also in the Tabels this Tabel is a
+        slice view of, as the write may land in their buffers.
+        """
+        tbl = self
+        while tbl is not None:
+            tbl._mutated()                          # pylint: disable=protected-access
+            base = getattr(tbl, "_base", None)
+            tbl = base() if base is not None else None
+
+    @property
+    def sorted_by(self):
+        """tuple: Names of the columns the rows are known to be sorted by,
+        primary key first.
+
+        Set by :mod:`tabel.Tabel.sort` and cleared by any change through
+        indexing or appending. Changes made directly to :attr:`data` are not
+        tracked, re-sort or set ``tbl.sorted_by = ()`` after such changes.
+        """
+        sorted_by = getattr(self, "_sorted_by", ())
+        n = 0
+        while n < len(sorted_by) and sorted_by[n] in self.columns:
+            n += 1
+        return sorted_by[:n]
+
+    @sorted_by.setter
+    def sorted_by(self, columns):
+        self._sorted_by = tuple(columns)
+
     def _columnize(self, value, copy=True):
+        if isinstance(value, LazyColumn):
+            return value
+        if isinstance(value, (Categorical, StringColumn)):
+            return value.copy() if copy else value
+        if PD_PRESENT and isinstance(getattr(value, "dtype", None), pd.CategoricalDtype):
+            value = _from_pandas_categorical(value.values, copy)
+            if value is not None:
+                return value
         if isstring(value) or (not hasattr(value, "__iter__")):
             value = [value] * max(1, len(self))
         return np.array(value, copy=copy)
 
+    @property
+    def columns(self):
+        """list :
+            string names of columns. Can be maniulated directly, if desired, as
+            long as the structure remains valid within this framwork. Validity
+            can be checked with the method :func:`~tabel.Tabel.valid`. Kept as
+            a :class:`ColumnNames` list, which maps names to positions in
+            constant time.
+            """
+        columns = self.__dict__.get("columns")
+        if not isinstance(columns, ColumnNames):
+            columns = self.__dict__["columns"] = ColumnNames(columns or [])
+        return columns
+
+    @columns.setter
+    def columns(self, value):
+        self.__dict__["columns"] = ColumnNames(value)
+
+    def _column_data(self, c):
+        """Return the array of column index c, loading a lazy column first.
+        """
+        if isinstance(self.data[c], LazyColumn):
+            self.data[c] = self.data[c].load()
+        return self.data[c]
+
     def row_append(self, row):
         """Append a row reccord at the end of the Tabel.
 
@@ -201,7 +390,12 @@ class Tabel(HashJoinMixin):
                 has zero length.
         Returns:
             Nothing. Change in-place.
+
+        Notes:
+            Every call copies all columns to append a single element. To build a
+            Tabel from many rows use :mod:`tabel.Tabel.builder` instead.
         """
+        indexes = getattr(self, "_indexes", {})
         if len(self) == 0:
             self.__init__(row)
         elif hasattr(row, "items"):
@@ -216,10 +410,46 @@ class Tabel(HashJoinMixin):
         else:
             raise ValueError("Number of elements in {row} not equal ".format(row=row),
                              "to number of columns in Tabel.")
+        self._indexes = indexes
+        self._mutated()
 
         if not self.valid:
             raise ValueError("Invalid datastructure.")
 
+    @classmethod
+    def builder(cls, schema, widen=False, capacity=1024):
+        """Return a builder to efficiently build a Tabel row by row.
+
+        Arguments:
+            schema (object) :
+                list of (name, dtype) tuples, dict of name: dtype, or a structured
+                numpy dtype (e.g. `Tabel.dtype`), describing the columns.
+            widen (bool) :
+                Whether to re-allocate a column with a promoted dtype when a value
+                does not fit, e.g. a longer string in a '<U3' column. If False, a
+                ValueError is raised instead.
+            capacity (int) :
+                Initial number of rows reserved.
+
+        Returns:
+            :mod:`tabel.TabelBuilder` object, its `append` method takes rows as
+            tuples or dicts, its `build` method returns the Tabel.
+
+        Examples:
+            >>> bld = Tabel.builder([('a', int), ('b', '<U3')])
+            >>> for i in range(3):
+            ...     bld.append((i, str(i) * 2))
+            >>> bld.build()
+               a |   b
+            -----+-----
+               0 |  00
+               1 |  11
+               2 |  22
+            3 rows ['<i8', '<U3']
+        """
+        return TabelBuilder(schema, widen=widen, capacity=capacity, tabel_class=cls)
+
+    @instrumented("append")
     def append(self, tbl):
         """Append new Tabel to the current Tabel.
 
@@ -235,7 +465,12 @@ class Tabel(HashJoinMixin):
 
         Returns:
             Nothing, change in-place.
+
+        Notes:
+            Every call copies all data of the current Tabel. To append many
+            Tabels use :mod:`tabel.Tabel.concat` instead.
         """
+        indexes = getattr(self, "_indexes", {})
         if len(self) == 0 and isinstance(tbl, Tabel):
             self.__init__(tbl.data, columns=tbl.columns)
 
@@ -257,27 +492,112 @@ class Tabel(HashJoinMixin):
                 self.data[ci] = np.concatenate([self.data[ci], dta])
         else:
             raise ValueError("Tabel type not recognized.")
+        self._indexes = indexes
+        self._mutated()
 
         if not self.valid:
             raise ValueError("Invalid datastructure.")
 
+    @classmethod
+    @instrumented("concat")
+    def concat(cls, tbls, fill=False):
+        """Concatenate many Tabels into a new Tabel.
+
+        Columns are aligned by name, the dtype of each resulting column is
+        determined once from all Tabels and each resulting column is allocated
+        and filled only once. This is much faster than appending Tabels one by
+        one with :mod:`tabel.Tabel.append` when there are many of them.
+
+        Arguments:
+            tbls (iterable) :
+                Tabel or pandas.DataFrame objects to be concatenated in order.
+                Tabels without any columns are ignored.
+            fill (bool) :
+                If False (default) all Tabels should have the same columns, the
+                order of columns does not need to match. If True, columns
+                missing in some of the Tabels are filled up with the values of
+                `join_fill_value` for those rows.
+
+        Returns:
+            New Tabel object with the columns in order of first appearance.
+
+        Raises:
+            ValueError :
+                When the columns do not match and fill is False, or when a
+                column that needs filling is not of float, string or integer type.
+
+        Examples:
+            >>> tbl = Tabel({'a': [1, 2], 'b': ['x', 'y']})
+            >>> Tabel.concat([tbl, tbl, Tabel({'a': [3]})], fill=True)
+               a | b
+            -----+-----
+               1 | x
+               2 | y
+               1 | x
+               2 | y
+               3 |
+            5 rows ['<i8', '<U1']
+        """
+        parts = []
+        for tbl in tbls:
+            if isinstance(tbl, Tabel):
+                part = dict(zip(tbl.columns, tbl.data))
+            elif PD_PRESENT and isinstance(tbl, pd.DataFrame):
+                part = {col: np.asarray(dta) for col, dta in tbl.items()}
+            else:
+                raise ValueError("Tabel type not recognized.")
+            if part:
+                parts.append((len(tbl), part))
+
+        columns = []
+        for _, part in parts:
+            columns += [col for col in part if col not in columns]
+        if not fill:
+            for _, part in parts:
+                if set(part) != set(columns):
+                    raise ValueError("Not the same columns in Tabel: {} {}".format(
+                        columns, list(part)))
+
+        total = sum(length for length, _ in parts)
+        datastruct = []
+        for col in columns:
+            if set(type(part.get(col)) for _, part in parts) in ({Categorical}, {StringColumn}):
+                datastruct.append(np.concatenate([part[col] for _, part in parts]))
+                continue
+            dtype = np.result_type(*[part[col].dtype for _, part in parts if col in part])
+            column = np.empty(total, dtype=dtype)
+            start = 0
+            for length, part in parts:
+                column[start:start+length] = part[col] if col in part else fill_value(cls, dtype)
+                start += length
+            datastruct.append(column)
+        return cls(datastruct, columns=columns, copy=False)
+
     def __iadd__(self, other):
         self.append(other)
         return self
 
-    def _column_index(self, c):
-        if not isinstance(c, np.ndarray):
-            try:
-                return self.columns.index(c)
-            except (TypeError, ValueError) as e:    # pylint: disable=unused-variable
-                pass
+    def _column_position(self, c):
+        """Return the index of column c, a name or a number, None if c does not
+        address a single existing column.
+        """
+        if isinstance(c, (slice, list, np.ndarray)):
+            return None
+        ci = self.columns.position(c)
+        if ci is not None:
+            return ci
+        if not isinstance(c, _INT_TYPES):
             try:
                 c = int(c)
-                assert c < len(self.columns)
-                return c
-            except (TypeError, ValueError, AssertionError) as e:  # pylint: disable=unused-variable
-                pass
-        raise ValueError("Not a single, existing column: {}".format(c))
+            except (TypeError, ValueError) as e:    # pylint: disable=unused-variable
+                return None
+        return int(c) if c < len(self.columns) else None
+
+    def _column_index(self, c):
+        ci = self._column_position(c)
+        if ci is None:
+            raise ValueError("Not a single, existing column: {}".format(c))
+        return ci
 
     def _column_indices(self, c):
         # Slice or ndarray of indices or booleans?
@@ -369,11 +689,18 @@ class Tabel(HashJoinMixin):
         ('John', 1.82, False)
         """
         # A whole single column?
-        try:
-            c = self.columns.index(key)
-            return self.data[c]
-        except (ValueError) as e:       # pylint: disable=unused-variable
-            pass
+        c = self.columns.position(key)
+        if c is not None:
+            return self._column_data(c)
+
+        # A pair or a whole single row, the common cases first
+        if isinstance(key, tuple) and len(key) == 2:
+            try:
+                return self._getitem(*key)
+            except (ValueError, TypeError) as e:    # pylint: disable=unused-variable
+                raise KeyError("Invalid key: {}".format(key))
+        if isinstance(key, _INT_TYPES):
+            return tuple(dt[key] for dt in self.data)
 
         # A pair provided?
         try:
@@ -400,19 +727,29 @@ class Tabel(HashJoinMixin):
         Returns :
 
         """
+        # Single element or single column?
+        ci = self._column_position(c)
+        if ci is not None and isinstance(r, (_INT_TYPES, slice, list, np.ndarray)):
+            return self._column_data(ci)[r]
+
+        # Single row?
+        if isinstance(r, _INT_TYPES) and isinstance(c, (slice, list, np.ndarray)):
+            c = self._column_indices(c)
+            return tuple(self.data[ci][r] for ci in c)
+
         if not isinstance(r, np.ndarray):
             # Single element?
             try:
                 r = int(r)
                 c = self._column_index(c)
-                return self.data[c][r]
+                return self._column_data(c)[r]
             except (ValueError, TypeError) as e:        # pylint: disable=unused-variable
                 pass
 
         # Single column?
         try:
             c = self._column_index(c)
-            return self.data[c][r]
+            return self._column_data(c)[r]
         except (ValueError, TypeError) as e:        # pylint: disable=unused-variable
             pass
 
@@ -429,8 +766,18 @@ class Tabel(HashJoinMixin):
         try:
             c = self._column_indices(c)
             columns = [self.columns[ci] for ci in c]
-            data = [self.data[ci][r] for ci in c]
-            return Tabel(data, columns, copy=False)
+            if isinstance(r, slice):
+                data = [self._column_data(ci)[r] for ci in c]
+            else:
+                data = column_map(lambda col: col[r], [self._column_data(ci) for ci in c],
+                                  threads=self.column_threads)
+            tbl = Tabel(data, columns, copy=False)
+            if isinstance(r, slice):
+                tbl._base = weakref.ref(self)           # pylint: disable=protected-access
+            if (isinstance(r, slice) and (r.step is None or r.step > 0)) or \
+                    (isinstance(r, np.ndarray) and r.dtype.kind == 'b'):
+                tbl.sorted_by = self.sorted_by
+            return tbl
         except (ValueError, TypeError, KeyError) as e:      # pylint: disable=unused-variable
             raise KeyError("Invalid key provided: ({}, {})".format(r, c))
 
@@ -523,13 +870,12 @@ class Tabel(HashJoinMixin):
             Note how in the first case the type of the name column stays "<U8"
             while seccond case the type of the Name column changes to "<i8".
         """
+        self._written()
         # Replace whole single column?
-        try:
-            c = self.columns.index(key)
+        c = self.columns.position(key)
+        if c is not None:
             self.data[c] = self._columnize(value)
             return
-        except (ValueError) as e:                   # pylint: disable=unused-variable
-            pass
 
         # Add new column?
         if isstring(key):
@@ -542,6 +888,8 @@ class Tabel(HashJoinMixin):
             (r, c) = key
             self._setitem(r, c, value)
             return
+        except _ReadOnly:
+            raise
         except (ValueError, TypeError) as e:        # pylint: disable=unused-variable
             pass
 
@@ -567,6 +915,18 @@ class Tabel(HashJoinMixin):
         Returns :
             Nothing
         """
+        # Single element or single column, the common cases?
+        ci = self._column_position(c)
+        if ci is not None and isinstance(r, (_INT_TYPES, slice, list, np.ndarray)):
+            try:
+                self.data[ci][r] = value
+                return
+            except (ValueError, TypeError) as e:    # pylint: disable=unused-variable
+                if isinstance(self.data[ci], np.ndarray) and not self.data[ci].flags.writeable:
+                    raise _ReadOnly("Column {} is read-only, memory-mapped or shared with "
+                                     "Arrow, use Tabel(tbl.dict) for a writable "
+                                     "copy".format(self.columns[ci]))
+
         # Single element?
         try:
             r = int(r)
@@ -669,9 +1029,14 @@ class Tabel(HashJoinMixin):
             c = self.columns.index(key)
             self.columns.pop(c)
             self.data.pop(c)
+            sorted_by = self.sorted_by
+            self._mutated(sorted_by[:sorted_by.index(key)] if key in sorted_by else sorted_by)
+            self._indexes = {cols: index for cols, index in self._indexes.items()
+                             if key not in cols}
         else: # otherwise try to delete rows using numpy.delete()
-            for i in range(len(self.data)):
-                self.data[i] = np.delete(self.data[i], key)
+            self.data[:] = column_map(lambda col: np.delete(col, key), self.data,
+                                      threads=self.column_threads)
+            self._mutated(self.sorted_by)
 
     def __len__(self):
         if self.data:
@@ -709,7 +1074,8 @@ class Tabel(HashJoinMixin):
                          for r in range(min(len(self), self.max_repr_rows))],
                         self.columns, tablefmt=self.repr_layout)
         len_str = "\n{} rows".format(len(self))
-        typ_str = " {}".format([dt.dtype.descr[0][1] for dt in self.data])
+        typ_str = " {}".format([_TYPE_NAMES.get(type(dt)) or dt.dtype.descr[0][1]
+                                for dt in self.data])
         return tabl + len_str + typ_str
 
     @property
@@ -718,7 +1084,7 @@ class Tabel(HashJoinMixin):
         """
         return np.dtype([(c, dt.dtype) for c, dt in zip(self.columns, self.data)])
 
-    def astype(self, dtypes):
+    def astype(self, dtypes, threads=None):
         """Returns a type-converted tabel.
 
         Converts the tabel according to the provided list of dtypes and returns
@@ -732,6 +1098,10 @@ class Tabel(HashJoinMixin):
                 `Tabel.shape`) See Tabel.dtype for the current types of the
                 Tabel.
 
+            threads (int) :
+                Number of threads converting columns concurrently, defaults to
+                :attr:`column_threads`.
+
         Returns:
 
             Tabel object with the columns converted to the new dtype.
@@ -739,7 +1109,177 @@ class Tabel(HashJoinMixin):
         Examples:
 
         """
-        return Tabel({k: v.astype(dty) for k, v, dty in zip(self.columns, self.data, dtypes)})
+        threads = self.column_threads if threads is None else threads
+        data = column_map(lambda col, dty: col.astype(dty), self.data, dtypes, threads=threads)
+        return Tabel(dict(zip(self.columns, data)))
+
+    @classmethod
+    def from_records(cls, records, columns=None, dtypes=None, batch_rows=None):
+        """Return a new Tabel of an iterable of records.
+
+        Records are taken `batch_rows` at a time, so any iterator works,
+        including generators that never hold all records at once. Each batch
+        is converted to one array per column (with `numpy.fromiter` for
+        columns of a given numeric dtype) and copied into growing typed
+        column buffers. None becomes NaN in float columns, including inferred
+        numeric columns, and an empty string in string columns.
+
+        Arguments:
+            records (iterable) :
+                tuples, lists, namedtuples or dicts, all of the same kind. A
+                numpy structured array is split into its fields.
+            columns (list) :
+                column names. Defaults to the keys of the first dict, the
+                fields of the first namedtuple, or column numbers as strings.
+                For dicts only these keys are taken.
+            dtypes (list or dict) :
+                dtypes of the columns, either a list in the order of the
+                columns or a dict with column names as keys. Columns without a
+                dtype are inferred from the first batch and widened when later
+                batches need it. The fields of a structured array are cast.
+            batch_rows (int) :
+                records per batch, `tabel.builder.RECORD_BATCH_ROWS` if None.
+
+        Returns:
+            Tabel with a row per record.
+
+        Raises:
+            ValueError :
+                When tuple records are not all of the same length, or a
+                column of a given integer or boolean dtype has a None.
+
+        Examples:
+            >>> Tabel.from_records(((i, 'x' * i) for i in range(3)), columns=['a', 'b'])
+               a | b
+            -----+-----
+               0 |
+               1 | x
+               2 | xx
+            3 rows ['<i8', '<U2']
+        """
+        return read_records(records, columns, dtypes, batch_rows, tabel_class=cls)
+
+    @classmethod
+    def from_cursor(cls, cursor, arraysize=None, dtypes=None):
+        """Return a new Tabel of the result set of a database cursor.
+
+        Rows are fetched in batches of `arraysize` with `fetchmany`, each batch
+        goes straight into typed column buffers. Unlike
+        ``Tabel(transpose(cursor.fetchall()))`` the result set is never held
+        as a list of tuples at once. NULLs become NaN in numeric columns and
+        empty strings in string columns; a column given an integer or boolean
+        dtype raises a ValueError on NULLs.
+
+        Arguments:
+            cursor (object) :
+                DB-API 2.0 cursor on which a query was executed.
+            arraysize (int) :
+                rows per batch, `tabel.sql.SQL_BATCH_ROWS` if None.
+            dtypes (list or dict) :
+                dtypes of the columns, either a list in the order of the
+                columns or a dict with column names as keys. Columns without a
+                dtype are inferred from the first batch and widened when later
+                batches need it.
+
+        Returns:
+            Tabel with the columns named as in the cursor description.
+
+        Examples:
+            >>> import sqlite3
+            >>> conn = sqlite3.connect(":memory:")
+            >>> cursor = conn.execute("SELECT 1 AS a, 'x' AS b UNION ALL SELECT 2, 'yz'")
+            >>> Tabel.from_cursor(cursor)
+               a | b
+            -----+-----
+               1 | x
+               2 | yz
+            2 rows ['<i8', '<U2']
+        """
+        return read_cursor(cursor, arraysize, dtypes, tabel_class=cls)
+
+    def to_sql(self, conn, table, batch_size=None, create=False):
+        """Insert the rows into a database table.
+
+        Rows are inserted with `executemany`, `batch_size` rows per call.
+        Commit the transaction on the connection to keep them.
+
+        Arguments:
+            conn (object) :
+                DB-API 2.0 connection.
+            table (str) :
+                name of the table, its column names should be those of the
+                Tabel. Quoted when `create` is True.
+            batch_size (int) :
+                rows per `executemany` call, `tabel.sql.SQL_BATCH_ROWS` if None.
+            create (bool) :
+                whether to create the table first, with generic SQL column
+                types (INTEGER, REAL, TEXT, ...) following the dtypes.
+
+        Returns:
+            Nothing.
+
+        Examples:
+            >>> import sqlite3
+            >>> conn = sqlite3.connect(":memory:")
+            >>> Tabel({'a': [1, 2], 'b': ['x', 'y']}).to_sql(conn, "t", create=True)
+            >>> conn.execute("SELECT * FROM t").fetchall()
+            [(1, 'x'), (2, 'y')]
+        """
+        write_sql(conn, table, self.columns, [self._column_data(c) for c in range(len(self.data))],
+                  batch_size, create)
+
+    def to_pandas(self, copy=True):
+        """Return the Tabel as `pandas.DataFrame`.
+
+        Arguments:
+            copy (bool) :
+                If False, numeric and datetime64[ns] columns are shared with
+                the DataFrame instead of copied, which takes constant time.
+                Changes to the values then show in both. Categoricals become
+                a `pandas.Categorical` sharing the codes. String columns are
+                always converted to object columns.
+
+        Returns:
+            pandas.DataFrame with the columns of the Tabel.
+
+        Examples:
+            >>> tbl = Tabel({'a': [1, 2], 'b': ['x', 'y']})
+            >>> df = tbl.to_pandas(copy=False)
+            >>> np.shares_memory(df['a'].values, tbl['a'])
+            True
+        """
+        if not PD_PRESENT:
+            raise ImpError("pandas is needed for to_pandas")
+        return pd.DataFrame({col: _to_pandas_column(dta, copy)
+                             for col, dta in zip(self.columns, self.data)},
+                            columns=list(self.columns), copy=copy)
+
+    def to_arrow(self):
+        """Return the Tabel as `pyarrow.Table`.
+
+        Numeric and datetime columns are handed over without copying,
+        StringColumns share their bytes and offsets (as large_string),
+        Categoricals become dictionary arrays sharing the codes. Numpy string
+        and boolean columns are converted. Needs `pyarrow`.
+
+        Examples:
+            >>> Tabel({'a': [1, 2], 'b': ['x', 'y']}).to_arrow().column_names  # doctest: +SKIP
+            ['a', 'b']
+        """
+        return to_arrow_table(self.columns, self.data)
+
+    @classmethod
+    def from_arrow(cls, table):
+        """Return a new Tabel of a `pyarrow.Table`.
+
+        Numeric and datetime columns of a single chunk without nulls are used
+        without copying, as read-only views on the Arrow buffers. Strings
+        become a :class:`tabel.StringColumn` sharing the Arrow bytes, string
+        dictionaries a :class:`tabel.Categorical`. Nulls become NaN in numeric
+        columns, integer and boolean columns with nulls turn to float, and
+        empty strings in string columns. Needs `pyarrow`.
+        """
+        return cls(copy=False, **from_arrow_table(table))
 
     @property
     def dict(self):
@@ -766,15 +1306,21 @@ class Tabel(HashJoinMixin):
         len_chk = (np.all([len(d) == len(self.data[0]) for d in self.data]))
         return wid_chk and len_chk
 
-    def sort(self, columns):
+    @instrumented("sort")
+    def sort(self, columns, threads=None):
         """Sort the Tabel.
 
         Sorting in-place the Tabel according to columns provided. Rows always stay together,
-        just the order of rows is affectd.
+        just the order of rows is affectd. The last column listed is the primary
+        sort key. The sort order is remembered in :attr:`sorted_by`, joins on
+        sorted columns use a faster merge join.
 
         Arguments:
             columns (string or list) :
                 column name or column names to be sorted, listed in-order.
+            threads (int) :
+                Number of threads reordering columns concurrently, defaults to
+                :attr:`column_threads`.
 
         returns:
             Nothing. Sorting in-place.
@@ -791,11 +1337,214 @@ class Tabel(HashJoinMixin):
             3 rows ['<U1', '<i8']
         """
         columns = columns if hasattr(columns, '__iter__') and not isstring(columns) else [columns]
-        ind = np.lexsort([self.data[self.columns.index(c)] for c in columns])
-        for i in range(len(self.columns)):
-            self.data[i] = self.data[i][ind]
+        with phase("lexsort"):
+            ind = np.lexsort(tuple(self.data[self.columns.index(c)] for c in columns))
+        threads = self.column_threads if threads is None else threads
+        with phase("take"):
+            self.data[:] = column_map(lambda col: col[ind], self.data, threads=threads)
+        self._mutated(reversed(columns))
+
+    def categorize(self, columns=None, max_ratio=CATEGORIZE_MAX_RATIO):
+        """Dictionary-encode string columns.
+
+        Converts in-place string columns to :class:`tabel.Categorical`: integer
+        codes into a sorted array of the unique values. Repetitive string
+        columns take less memory this way, and comparing with a string,
+        sorting, joining and grouping on them work on the integer codes.
+        Categorical columns are saved and read as such in the npz and npy
+        formats.
+
+        Arguments:
+            columns (string or list) :
+                column name or column names to encode. Default None encodes
+                every string column with at most `max_ratio` unique values per
+                row.
+            max_ratio (float) :
+                maximum fraction of unique values for columns picked
+                automatically.
+
+        Returns:
+            Nothing. Encoding in-place.
+
+        Examples:
+            >>> tbl = Tabel({'a':['nl', 'be', 'nl', 'nl'], 'b':list(range(4))})
+            >>> tbl.categorize('a')
+            >>> tbl
+             a   |   b
+            -----+-----
+             nl  |   0
+             be  |   1
+             nl  |   2
+             nl  |   3
+            4 rows ['category', '<i8']
+        """
+        if columns is None:
+            columns = [c for c, col in zip(self.columns, self.data)
+                       if not isinstance(col, Categorical) and col.dtype.kind in {'U', 'S'}]
+            encoded = {c: Categorical.from_array(self[c]) for c in columns}
+            encoded = {c: col for c, col in encoded.items()
+                       if len(col.categories) <= max_ratio * len(col)}
+        else:
+            columns = columns if hasattr(columns, '__iter__') and not isstring(columns) \
+                else [columns]
+            encoded = {c: Categorical.from_array(self[c]) for c in columns}
+        for c, col in encoded.items():
+            self.data[self.columns.index(c)] = col
+
+    def compact_strings(self, columns=None):
+        """Store string columns as variable length utf-8.
+
+        Converts in-place string columns to :class:`tabel.StringColumn`: the
+        utf-8 bytes of all rows in one buffer plus an offset per row. A numpy
+        `<U` column takes four bytes times its longest string for every row,
+        columns of free text with a few long values shrink the most, and
+        appending a longer string does not widen the whole column. Taking
+        rows, comparing, sorting, joining and grouping work on the bytes,
+        numpy functions without a dedicated implementation decode to a `<U`
+        array. StringColumns are saved
+        and read as such in the npz and npy formats.
+
+        Arguments:
+            columns (string or list) :
+                column name or column names to convert. Default None converts
+                every `<U` and `S` column.
+
+        Returns:
+            Nothing. Converting in-place.
+
+        Examples:
+            >>> tbl = Tabel({'a':['short', 'a much longer text', ''], 'b':list(range(3))})
+            >>> tbl.compact_strings()
+            >>> tbl['a'].nbytes
+            55
+            >>> tbl
+             a                  |   b
+            --------------------+-----
+             short              |   0
+             a much longer text |   1
+                                |   2
+            3 rows ['string', '<i8']
+        """
+        if columns is None:
+            columns = [c for c, col in zip(self.columns, self.data)
+                       if isinstance(col, np.ndarray) and col.dtype.kind in {'U', 'S'}]
+        columns = columns if hasattr(columns, '__iter__') and not isstring(columns) \
+            else [columns]
+        for c in columns:
+            ci = self.columns.index(c)
+            self.data[ci] = StringColumn.from_array(self.data[ci])
+
+    def create_index(self, columns):
+        """Create a hash index on one or more columns.
+
+        The index maps every (composite) key to its row numbers, such that
+        :mod:`tabel.Tabel.lookup` and :mod:`tabel.Tabel.loc_rows` find the
+        matching rows in constant time per key instead of scanning the whole
+        column. The index is kept with the Tabel; changes through indexing,
+        including through a slice of this Tabel, appending, deleting or
+        sorting invalidate it and it is rebuilt on its next use.
+
+        Arguments:
+            columns (string or list) :
+                column name or column names of the key.
+
+        Returns:
+            Nothing.
+
+        Examples:
+            >>> tbl = Tabel({'a':['b', 'g', 'd', 'g'], 'b':list(range(4))})
+            >>> tbl.create_index('a')
+            >>> tbl.lookup('g')
+             a   |   b
+            -----+-----
+             g   |   1
+             g   |   3
+            2 rows ['<U1', '<i8']
+        """
+        columns = (columns,) if isstring(columns) else tuple(columns)
+        for c in columns:
+            if c not in self.columns:
+                raise ValueError("Not an existing column: {}".format(c))
+        index = TabelIndex(columns)
+        index.build(self)
+        self._indexes[columns] = index
+
+    def drop_index(self, columns):
+        """Remove the index on `columns`, see :mod:`tabel.Tabel.create_index`.
+        """
+        columns = (columns,) if isstring(columns) else tuple(columns)
+        self._indexes.pop(columns, None)
+
+    def _index(self, columns=None):
+        """Return the up to date index on `columns`, or the only index if None
+        """
+        indexes = getattr(self, "_indexes", {})
+        if columns is None:
+            if len(indexes) != 1:
+                raise KeyError("Provide the index columns, indexes: {}".format(list(indexes)))
+            index = next(iter(indexes.values()))
+        else:
+            columns = (columns,) if isstring(columns) else tuple(columns)
+            if columns not in indexes:
+                raise KeyError("No index on columns: {}".format(columns))
+            index = indexes[columns]
+        if not index.valid:
+            index.build(self)
+        return index
+
+    def lookup(self, key, columns=None):
+        """Return the rows matching `key` using an index.
+
+        Arguments:
+            key (object) :
+                value of the key, a tuple of values for a composite key.
+            columns (string or list) :
+                columns of the index to use, may be omitted if the Tabel has
+                a single index. See :mod:`tabel.Tabel.create_index`.
+
+        Returns:
+            Tabel with the matching rows, in their original order.
+        """
+        return self[self._index(columns).rows(key), :]
+
+    def loc_rows(self, keys, columns=None):
+        """Return the rows matching any of `keys` using an index.
 
-    def save(self, filename, fmt='auto', header=True):
+        Arguments:
+            keys (iterable) :
+                key values, tuples of values for a composite key.
+            columns (string or list) :
+                columns of the index to use, may be omitted if the Tabel has
+                a single index.
+
+        Returns:
+            Tabel with the matching rows, grouped per key in the order of
+            `keys`.
+        """
+        return self[self._index(columns).rows_many(keys), :]
+
+    def lazy(self):
+        """Start a lazy query on this Tabel, see :mod:`tabel.plan.LazyTabel`.
+
+        Returns:
+            LazyTabel, recording filters, selections, joins, group_by and
+            sorts to be optimized and run at once by its `collect` method.
+
+        Examples:
+            >>> tbl = Tabel({'a':[1, 5, 7], 'b':['x', 'x', 'y']})
+            >>> tbl.lazy().filter("a > 3").select('b').collect()
+             b
+            -----
+             x
+             y
+            2 rows ['<U1']
+        """
+        from .plan import LazyTabel, Scan             # pylint: disable=cyclic-import
+        return LazyTabel(Scan(self))
+
+    @instrumented("save")
+    def save(self, filename, fmt='auto', header=True, threads=1, formats=None,
+             float_format=None):
         """Save to file
 
         Saves the Tabel data including a header with the column names to a file
@@ -807,7 +1556,8 @@ class Tabel(HashJoinMixin):
                 filename, should include path
 
             fmt (str) :
-                formatting, valid values are: 'auto', 'csv', 'npz', 'gz'
+                formatting, valid values are: 'auto', 'csv', 'npz', 'gz', 'npy',
+                'parquet', 'arrow', 'feather'
 
                 ``auto`` :
                     Determine the filetype from the fiel extension.
@@ -818,47 +1568,113 @@ class Tabel(HashJoinMixin):
                     standard `gzip` module.
                 ``npz`` :
                     Write to compressed `numpy` native binary format.
+                ``npy`` :
+                    Write to a directory named `filename` with an uncompressed
+                    `numpy` .npy file per column and a small json file with the
+                    column names and dtypes. Can be opened memory-mapped in
+                    constant time, see :mod:`tabel.read_tabel`.
+                ``parquet`` :
+                    Write to a parquet file, needs `pyarrow`.
+                ``arrow`` :
+                    Write to an uncompressed Arrow IPC file, needs `pyarrow`.
+                    Can be read memory-mapped without copying.
+                ``feather`` :
+                    Write to a compressed Arrow IPC (feather) file, needs
+                    `pyarrow`.
 
             header (bool) :
                 whether to write a header line with the column names, only used for
                 csv and gz
 
+            threads (int) :
+                number of threads compressing concurrently, only used for gz and
+                npz. gz files are then written as a series of independently
+                compressed blocks (a valid multi-member gzip file) that
+                :mod:`tabel.read_tabel` can also decompress in threads.
+
+            formats (dict) :
+                printf style format per column name, e.g. ``{'price': '%.2f'}``,
+                only used for csv and gz. Columns without a format are written
+                as `str` of their values.
+
+            float_format (str) :
+                printf style format of all float columns without an entry in
+                `formats`, e.g. '%.6g', only used for csv and gz.
+
         Returns:
             Nothing.
+
+        Examples:
+            >>> tbl.save("prices.csv", formats={'price': '%.2f'})   # doctest: +SKIP
         """
         if fmt == 'auto':
             fmt = os.path.splitext(filename)[1].replace('.', '')
 
         if fmt == 'csv':
             with open(filename, 'w') as f:
-                self._write_csv(f, header)
+                self._write_csv(f, header, formats, float_format)
 
         elif fmt == "gz":
-            with gzip.open(filename, 'wt') as f:
-                self._write_csv(f, header)
+            with open_gzip(filename, 'wt', threads) as f:
+                self._write_csv(f, header, formats, float_format)
+
+        elif fmt == 'npz' and threads > 1:
+            savez_compressed(filename, *encode_columns(self.columns, self.data),
+                             threads=threads)
 
         elif fmt == 'npz':
-            np.savez_compressed(filename, **{k: v for k, v in zip(self.columns, self.data)})
+            names, arrays = encode_columns(self.columns, self.data)
+            np.savez_compressed(filename, **{k: v for k, v in zip(names, arrays)})
+
+        elif fmt == 'npy':
+            save_npy_dir(self.columns, self.data, filename)
+
+        elif fmt == 'parquet':
+            save_parquet(self.columns, self.data, filename)
+
+        elif fmt in ('arrow', 'feather'):
+            save_feather(self.columns, self.data, filename,
+                         compression='uncompressed' if fmt == 'arrow' else None)
 
         else:
-            raise ValueError("Only formats supported: csv, npz, gz")
+            raise ValueError("Only formats supported: csv, npz, gz, npy, parquet, arrow, feather")
 
-    def _write_csv(self, f, header=True):
+    def _write_csv(self, f, header=True, formats=None, float_format=None):
         """Writing csv filesself.
 
+        Formats `CSV_WRITE_ROWS` rows of each column at once into strings,
+        joins them into lines and writes them in one call. The output is that
+        of the `csv` module with the default (excel) dialect.
+
         Arguments:
             f (object) :
                 file handle
             header (bool) :
                 whether to write the columns header
+            formats (dict) :
+                printf style format per column name.
+            float_format (str) :
+                printf style format of the other float columns.
         """
-        writer = csv.writer(f)
         if header:
-            writer.writerow(self.columns)
-        writer.writerows(zip(*self.data))
-
-
-def read_tabel(filename, fmt='auto', header=True):
+            csv.writer(f).writerow(self.columns)
+        formats = formats or {}
+        missing = set(formats) - set(self.columns)
+        if missing:
+            raise ValueError("Formats for columns not found: {}".format(sorted(missing)))
+        fmts = [formats.get(col, float_format if np.dtype(dta.dtype).kind == 'f' else None)
+                for col, dta in zip(self.columns, self.data)]
+        single = len(self.data) == 1
+        for start in range(0, len(self), CSV_WRITE_ROWS):
+            fields = [_csv_fields(dta[start:start + CSV_WRITE_ROWS], fmt, single)
+                      for dta, fmt in zip(self.data, fmts)]
+            f.write(_CSV_LINETERMINATOR.join(map(_CSV_DELIMITER.join, zip(*fields))))
+            f.write(_CSV_LINETERMINATOR)
+
+
+@instrumented("read_tabel")
+def read_tabel(filename, fmt='auto', header=True, chunksize=None, dtypes=None, mmap=False,
+               columns=None, lazy=False, threads=1, row_groups=None, filters=None):
     """Read data from disk
 
     Read data from disk and return a Tabel object.
@@ -867,45 +1683,247 @@ def read_tabel(filename, fmt='auto', header=True):
         filename (str) :
             filename sring, including path and extension.
         fmt (str) :
-            format specifier, supports: 'csv', 'npz', 'gz'.
+            format specifier, supports: 'csv', 'npz', 'gz', 'npy', 'parquet',
+            'arrow', 'feather'. Directories are read as 'npy'.
         header (bool) :
             whether to expect a header (True) or not (False) or try to sniff
             (None), only used for csv and gz
+        chunksize (int) :
+            If provided, return a generator of Tabels of (at most) `chunksize`
+            rows instead of a single Tabel, see :mod:`tabel.iter_tabel`. Only
+            used for csv and gz.
+        dtypes (list or dict) :
+            dtypes of the columns, either a list in the order of the columns or
+            a dict with column names as keys. Columns without a dtype are
+            inferred from the data as int, float, bool or string; dates are
+            only parsed into a datetime64 dtype provided here. Only used for
+            csv and gz.
+        mmap (bool or str) :
+            Only used for npy, arrow and feather. If True the column files are memory-mapped
+            read-only: opening takes constant time, data is paged in by the
+            operating system when accessed and shared between processes
+            opening the same files. A mode string ('r', 'r+' or 'c' for
+            copy-on-write) is passed on as `mmap_mode` to `numpy.load`. Arrow
+            files are memory-mapped read-only.
+        columns (list) :
+            If provided, only read the columns with these names, in this order.
+            For npz, npy, parquet, arrow and feather the other columns are not
+            read from disk at all, for csv and gz they are not parsed.
+        lazy (bool) :
+            Only used for npz. If True the columns are decompressed on first
+            access instead of when reading the file. Opening a wide archive and
+            using a few of its columns then costs only the time and memory of
+            those columns.
+        threads (int) :
+            Number of threads decompressing concurrently. For npz the columns
+            are decompressed in parallel, gz files only if they were saved with
+            threads.
+        row_groups (list) :
+            Only used for parquet. If provided, only read the row groups with
+            these indices.
+        filters (list) :
+            Only used for parquet. Filters in the pyarrow format, e.g.
+            ``[("a", ">", 3)]``, only the matching rows are returned and row
+            groups that cannot match, judging by their statistics, are not
+            read at all.
 
     Returns:
         Tabel object containing the data.
+
+    Examples:
+        Share a large reference table between worker processes:
+
+        >>> tbl.save("reference.npy")                           # doctest: +SKIP
+        >>> tbl = read_tabel("reference.npy", mmap=True)        # doctest: +SKIP
+
+        Read two columns from a wide archive:
+
+        >>> tbl = read_tabel("wide.npz", columns=["a", "b"])     # doctest: +SKIP
+
+        Read the rows with a > 3 from a parquet file:
+
+        >>> tbl = read_tabel("data.parquet", filters=[("a", ">", 3)])  # doctest: +SKIP
+
+    Notes:
+        Columns read from parquet, arrow and feather files are writable
+        copies. With ``mmap=True`` the numeric columns of uncompressed arrow
+        files are read-only views on the memory-mapped Arrow buffers, as are
+        memory-mapped npy columns, use ``Tabel(tbl.dict)`` for a writable
+        copy. :meth:`Tabel.from_arrow` keeps them as read-only views too.
     """
-    if fmt == 'auto':
-        fmt = os.path.splitext(filename)[1].replace('.', '')
-    if fmt == "csv":
-        with open(filename, 'r') as f:      # , newline=""
-            data = _read_csv(f, header)
-    elif fmt == "gz":
-        with gzip.open(filename, 'rt') as f:
-            data = _read_csv(f, header)
+    fmt = _file_format(filename, fmt)
+    if chunksize is not None:
+        return iter_tabel(filename, chunksize, fmt=fmt, header=header, dtypes=dtypes,
+                          threads=threads)
+    if fmt in ("csv", "gz"):
+        with _open_csv(filename, fmt, threads) as f:
+            data = _read_csv(f, header, dtypes, columns)
     elif fmt == "npz":
-        reader = np.load(filename)
-        columns = reader.keys()
-        datastruct = [reader[k] for k in columns]
-        data = dict(datastruct=datastruct, columns=columns)
+        data = read_npz(filename, columns, lazy, threads)
+    elif fmt == "npy":
+        data = read_npy_dir(filename, mmap, columns)
+    elif fmt == "parquet":
+        data = read_parquet(filename, columns, row_groups, filters)
+    elif fmt in ("arrow", "feather"):
+        data = read_feather(filename, columns, mmap)
     else:
-        raise ValueError("Only formats supported: csv, npz, gz")
-    return Tabel(**data)
+        raise ValueError("Only formats supported: csv, npz, gz, npy, parquet, arrow, feather")
+    return Tabel(copy=False, **data)
 
 
-def _read_csv(f, header=True):
-    """Reading csv.
+def read_columns(filename, fmt='auto', header=True):
+    """Return the column names of a file without reading its data
+
+    Arguments:
+        filename (str) :
+            filename sring, including path and extension.
+        fmt (str) :
+            format specifier, supports: 'csv', 'npz', 'gz', 'npy', 'parquet',
+            'arrow', 'feather'.
+        header (bool) :
+            whether to expect a header (True) or not (False) or try to sniff
+            (None), only used for csv and gz
+
+    Returns:
+        list of column names.
+    """
+    fmt = _file_format(filename, fmt)
+    if fmt in ("csv", "gz"):
+        with _open_csv(filename, fmt) as f:
+            return _csv_reader(f, header)[1]
+    if fmt == "npz":
+        with np.load(filename) as reader:
+            return split_encoded(list(reader.keys()))[0]
+    if fmt == "npy":
+        return read_npy_meta(filename)["columns"]
+    if fmt in ARROW_FORMATS:
+        return read_arrow_columns(filename, fmt)
+    raise ValueError("Only formats supported: csv, npz, gz, npy, parquet, arrow, feather")
+
+
+def _file_format(filename, fmt='auto'):
+    """Return the format of a file, from its extension if `fmt` is 'auto'
+    """
+    if fmt != 'auto':
+        return fmt
+    return "npy" if os.path.isdir(filename) else os.path.splitext(filename)[1].replace('.', '')
+
+
+def iter_tabel(filename, chunksize, fmt='auto', header=True, dtypes=None, threads=1,
+               widen=False):
+    """Read a csv file from disk in chunks
+
+    Generator yielding Tabel objects of `chunksize` rows, the last one holding
+    the remaining rows, such that large files can be processed (filtered,
+    aggregated) chunk by chunk without ever holding all data in memory.
+
+    All chunks have the same columns and the same dtypes. Dtypes not provided
+    with the `dtypes` argument are inferred from the first chunk, string
+    columns keep the string type but their width follows the longest string
+    in each chunk. With `widen` an inferred column that does not fit a later
+    chunk is widened instead, following the order in which columns are
+    inferred (int, float, string), from that chunk on.
+
+    Arguments:
+        filename (str) :
+            filename sring, including path and extension.
+        chunksize (int) :
+            number of rows per Tabel.
+        fmt (str) :
+            format specifier, supports: 'csv', 'gz'.
+        header (bool) :
+            whether to expect a header (True) or not (False) or try to sniff
+            (None)
+        dtypes (list or dict) :
+            dtypes of the columns, either a list in the order of the columns or
+            a dict with column names as keys.
+        threads (int) :
+            number of threads decompressing gz files saved with threads.
+        widen (bool) :
+            whether to widen the dtype of inferred columns when a chunk does
+            not fit, instead of raising.
+
+    Yields:
+        Tabel objects containing the data.
+
+    Raises:
+        ValueError :
+            When a chunk cannot be converted into the dtypes of the first chunk,
+            and `widen` is False or the column's dtype was provided.
+
+    Examples:
+        Summing a column of a large file chunk by chunk:
+
+        >>> total = 0
+        >>> for tbl in iter_tabel("large.csv", 100000):         # doctest: +SKIP
+        ...     total += np.sum(tbl['amount'])
+    """
+    # pylint: disable=too-many-locals
+    if fmt == 'auto':
+        fmt = os.path.splitext(filename)[1].replace('.', '')
+    if fmt not in ("csv", "gz"):
+        raise ValueError("Only formats supported for reading in chunks: csv, gz")
+    if chunksize < 1:
+        raise ValueError("chunksize should be a positive integer: {}".format(chunksize))
+    with _open_csv(filename, fmt, threads) as f:
+        reader, columns = _csv_reader(f, header)
+        dtypes = _column_dtypes(columns, dtypes)
+        inferred = [dtype is None for dtype in dtypes]
+        while True:
+            with gc_paused():
+                rows = list(islice(reader, chunksize))
+                n_rows = len(rows)
+                parse_dtypes = dtypes
+                if widen:
+                    parse_dtypes = [_widening(dtype) if infer and dtype is not None else dtype
+                                    for dtype, infer in zip(dtypes, inferred)]
+                try:
+                    datastruct = _csv_columns(rows, parse_dtypes)
+                except ValueError as e:
+                    raise ValueError("Chunk does not match the dtypes {}: {}".format(dtypes, e))
+                del rows
+            if n_rows == 0:
+                break
+            dtypes = [dt.dtype.type if dt.dtype.kind in {'U', 'S'} else dt.dtype
+                      for dt in datastruct]
+            yield Tabel(datastruct, columns=columns, copy=False)
+            if n_rows < chunksize:
+                break
+
+
+def _open_csv(filename, fmt, threads=1):
+    """Open a csv or gz file for reading text
+    """
+    if fmt == "gz":
+        return open_gzip(filename, 'rt', threads)
+    return open(filename, 'r')      # , newline=""
+
+
+def _column_dtypes(columns, dtypes):
+    """Return a list with a dtype, or None if to be inferred, for each column
+    """
+    if dtypes is None:
+        return [None] * len(columns)
+    if hasattr(dtypes, "items"):
+        return [dtypes.get(c) for c in columns]
+    if len(dtypes) != len(columns):
+        raise ValueError("Number of dtypes {} not equal to number of columns {}".format(
+            len(dtypes), len(columns)))
+    return list(dtypes)
+
+
+def _csv_reader(f, header=True):
+    """Return a csv reader positioned at the first data row, and the columns.
+
     Arguments:
         f (object) :
             filehandle to ope file
         header (bool, None) :
             whether to expect a header (True) or not (False) or try to sniff
-            (None), only used for csv and gz
-
-    returns (dict) :
-        dictionary containing the data
+            (None)
     """
-    dialect, sniff_header = _csv_sniff(f)
+    with phase("sniff"):
+        dialect, sniff_header = _csv_sniff(f)
     reader = csv.reader(f, dialect)
     columns = next(reader)
     if header is None:
@@ -913,20 +1931,171 @@ def _read_csv(f, header=True):
     if not header:
         columns = [str(i) for i in range(len(columns))]
         f.seek(0)
-    datastruct = [[] for i in range(len(columns))]
-    for row in reader:
-        for data_col, c in zip(datastruct, row):
-            data_col.append(c)
-    np_types = NP_INT_TYPES + NP_FLOAT_TYPES
-    datastruct = list(map(np.array, datastruct))
-    for i, data_col in enumerate(datastruct):
-        for np_type in np_types:
-            try:
-                datastruct[i] = data_col.astype(np_type)
-            except ValueError:
-                continue
-            break
-    data = dict(datastruct=datastruct, columns=columns)
+    return reader, columns
+
+
+CSV_INFER_ROWS = 1000
+"""int: Number of rows used to infer the dtypes of csv columns."""
+
+CSV_WRITE_ROWS = 65536
+"""int: Number of rows formatted and written at once when saving csv files."""
+
+_CSV_DELIMITER = ","
+_CSV_LINETERMINATOR = "\r\n"
+_CSV_QUOTE = re.compile('[,"\r\n]')
+
+
+def _csv_strings(values):
+    """Return a list of strings as the `csv` module writes them, quoting those
+    with a delimiter, quote or newline.
+    """
+    text = "".join(values)
+    if not any(c in text for c in ',"\r\n'):
+        return values
+    return ['"' + v.replace('"', '""') + '"' if _CSV_QUOTE.search(v) else v for v in values]
+
+
+def _csv_fields(dta, fmt=None, single=False):
+    """Return the values of a column as list of csv fields
+
+    Gives the same text as the `csv` module does value by value, without
+    making a numpy scalar per value: integers, booleans and float64 are
+    formatted as python numbers (`repr` for floats), other numbers and dates
+    in one numpy call. With a printf style `fmt` the values are formatted by
+    it. Categoricals format their categories only.
+
+    Arguments:
+        dta (numpy.ndarray) :
+            column (part) to format.
+        fmt (str) :
+            printf style format, e.g. '%.3f', str of the values if None.
+        single (bool) :
+            whether the column is the only one, then empty strings are quoted
+            to tell them from empty lines.
+    """
+    if isinstance(dta, Categorical):
+        categories = _csv_fields(dta.categories, fmt, single)
+        return [categories[code] for code in dta.codes.tolist()]
+    dta = np.asarray(dta)
+    if fmt is not None:
+        values = _csv_strings(list(map(fmt.__mod__, dta.tolist())))
+    elif dta.dtype.kind in {'b', 'i', 'u'}:
+        return list(map(str, dta.tolist()))
+    elif dta.dtype.kind == 'f' and dta.dtype.itemsize == 8:
+        return list(map(repr, dta.tolist()))
+    elif dta.dtype.kind in {'f', 'c', 'm', 'M'}:
+        return dta.astype(str).tolist()
+    elif dta.dtype.kind == 'U':
+        values = _csv_strings(dta.tolist())
+    else:
+        values = _csv_strings(["" if v is None else repr(v) if isinstance(v, float) else str(v)
+                               for v in dta.tolist()])
+    if single:
+        values = ['""' if v == "" else v for v in values]
+    return values
+
+_BOOL_STRINGS = {'True': True, 'False': False, 'true': True, 'false': False,
+                 'TRUE': True, 'FALSE': False}
+_INFER_DTYPES = [np.dtype(NP_INT_TYPES[0]), np.dtype(NP_FLOAT_TYPES[0]), np.dtype(bool),
+                 np.dtype(str)]
+
+
+def _parse_column(values, dtype):
+    """Parse a sequence of strings straight into an array of dtype
+
+    Raises ValueError if a string cannot be converted.
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'b':
+        try:
+            return np.fromiter(map(_BOOL_STRINGS.__getitem__, values), dtype, len(values))
+        except KeyError as e:
+            raise ValueError("Not a boolean: {}".format(e))
+    if dtype.kind in {'i', 'u', 'f'}:
+        return np.fromiter(values, dtype, len(values))
+    if dtype.kind == 'M' and not all(v[:1].isdigit() or v == 'NaT' for v in values):
+        raise ValueError("Not a date or time")
+    return np.array(values, dtype=dtype)
+
+
+def _infer_column(values, candidates=None):
+    """Parse a sequence of strings into an array of the inferred dtype
+
+    The dtype is inferred from the first `CSV_INFER_ROWS` strings, trying
+    integer, float, bool and string in that order, or the `candidates` dtypes
+    if provided. If the whole column does not fit the inferred dtype the next
+    dtypes are tried. Dates are not inferred, they stay strings unless a
+    datetime64 dtype is provided.
+    """
+    candidates = _INFER_DTYPES if candidates is None else candidates
+    sample = values[:CSV_INFER_ROWS]
+    for i, dtype in enumerate(candidates):
+        try:
+            _parse_column(sample, dtype)
+        except ValueError:
+            continue
+        break
+    for dtype in candidates[i:]:
+        try:
+            return _parse_column(values, dtype)
+        except ValueError:
+            continue
+    return np.array(values)
+
+
+def _widening(dtype):
+    """Return the tuple of inferred dtypes a column of `dtype` can widen to,
+    itself first. Numbers never widen to bool, numbers don't parse as such.
+    """
+    kind = np.dtype(dtype).kind
+    return tuple(dt for dt in _INFER_DTYPES
+                 if dt.kind == kind or (dt.kind == 'f' and kind == 'i') or dt.kind == 'U')
+
+
+def _csv_columns(rows, dtypes, usecols=None):
+    """Convert csv rows (lists of strings) into a list of column arrays
+
+    Each column is parsed in a single pass straight into an array of the
+    provided dtype, or of a dtype inferred from a sample if not provided, or
+    from a tuple of candidate dtypes, see `_infer_column`.
+    Only the column indices in `usecols` are parsed, if provided. Best called
+    with the garbage collector paused, see `util.gc_paused`.
+    """
+    with phase("tokenize"):
+        rows = [row for row in rows if row]
+        if set(map(len, rows)) - {len(dtypes)}:
+            raise ValueError("Not all rows have {} fields.".format(len(dtypes)))
+        columns = list(zip(*rows)) if rows else [()] * len(dtypes)
+        del rows
+    if usecols is not None:
+        columns = [columns[i] for i in usecols]
+        dtypes = [dtypes[i] for i in usecols]
+    with phase("parse"):
+        return [_infer_column(values, dtype) if dtype is None or isinstance(dtype, tuple)
+                else _parse_column(values, dtype) for values, dtype in zip(columns, dtypes)]
+
+
+def _read_csv(f, header=True, dtypes=None, columns=None):
+    """Reading csv.
+    Arguments:
+        f (object) :
+            filehandle to ope file
+        header (bool, None) :
+            whether to expect a header (True) or not (False) or try to sniff
+            (None), only used for csv and gz
+        dtypes (list, dict or None) :
+            dtypes of the columns, inferred if not provided
+        columns (list or None) :
+            names of the columns to parse, all if not provided
+
+    returns (dict) :
+        dictionary containing the data
+    """
+    reader, names = _csv_reader(f, header)
+    usecols = select_columns(names, columns)
+    with gc_paused():
+        datastruct = _csv_columns(reader, _column_dtypes(names, dtypes), usecols)
+    data = dict(datastruct=datastruct, columns=[names[i] for i in usecols])
     return data
 
 
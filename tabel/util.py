@@ -6,7 +6,9 @@
 """
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
+import gc
 import sys
+from contextlib import contextmanager
 
 
 if sys.version_info >= (3, 0):
@@ -26,3 +28,19 @@ def isstring(strng):
     if PV == 3:
         return isinstance(strng, str)
     raise NotImplementedError("Unknown python verison: {}".format(PV))
+
+
+@contextmanager
+def gc_paused():
+    """Context manager pausing the cyclic garbage collector.
+
+    Building millions of small containers (e.g. csv rows) triggers the garbage
+    collector over and over, while none of them are part of a reference cycle.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
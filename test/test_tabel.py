@@ -3,9 +3,13 @@ import os
 local_path = os.path.abspath(os.path.join(os.getcwd(), "../"))
 sys.path.insert(0,local_path)
 
-from tabel import Tabel, read_tabel, T, first
+from tabel import Tabel, read_tabel, iter_tabel, T, first
 import os
 import pytest
+import gzip
+import zipfile
+import tabel
+from tabel import compress, executor, hashjoin, expr
 import numpy as np
 from itertools import product
 from copy import copy, deepcopy
@@ -80,6 +84,29 @@ class TestAppend(object):
                 assert ftbl.valid
                 assert len(ftbl) == fl + 1
 
+    def test_concat(self, tbls):
+        for tbl in tbls:
+            tbl_c = Tabel.concat([tbl, tbl[::-1, :], tbl])
+            assert tbl_c.valid
+            assert len(tbl_c) == 3 * len(tbl)
+            assert tbl_c.columns == tbl.columns
+
+    def test_concat_combinations(self):
+        tbl = Tabel.concat([Tabel(), Tabel({'a':2, 'b':"x"}), pd.DataFrame({'b':["yz"], 'a':[2.5]}),
+                            Tabel({'b':["abc", "d"], 'a':[1, 2]})])
+        assert tbl.columns == ['a', 'b']
+        assert list(tbl['a']) == [2, 2.5, 1, 2]
+        assert list(tbl['b']) == ["x", "yz", "abc", "d"]
+        with pytest.raises(ValueError):
+            Tabel.concat([Tabel({'a':2, 'b':"x"}), Tabel({'a':3})])
+        tbl = Tabel.concat([Tabel({'a':2, 'b':"x"}), Tabel({'a':3, 'c':1.5})], fill=True)
+        assert tbl.columns == ['a', 'b', 'c']
+        assert tbl[1, 'b'] == Tabel.join_fill_value['string']
+        assert naneq(tbl['c'], [np.nan, 1.5])
+        with pytest.raises(ValueError):
+            Tabel.concat([Tabel({'a':2, 'b':True}), Tabel({'a':3})], fill=True)
+        assert len(Tabel.concat([])) == 0
+
     def test_row_append_combinations(self):
         first_tbl = [Tabel(), Tabel({'a':2,'b':3}), Tabel({'a':"ff",'b':"ffr"})]
         seccond_tbl = [{'a':22,'b':13}, [22,33], (44,55), np.array([33,33]),
@@ -93,6 +120,128 @@ class TestAppend(object):
                 assert len(ftbl) == fl + 1
 
 
+class TestBuilder(object):
+    def test_builder(self):
+        bld = Tabel.builder([('a', int), ('b', '<U3'), ('c', float)], capacity=2)
+        for i in range(10):
+            bld.append((i, str(i), i / 2))
+        bld.append({'c': 1.5, 'a': 10, 'b': 'abc'})
+        tbl = bld.build()
+        assert tbl.valid
+        assert len(tbl) == 11
+        assert tbl.dtype == np.dtype([('a', int), ('b', '<U3'), ('c', float)])
+        assert tbl[10] == (10, 'abc', 1.5)
+        bld.append((11, '11', 5.5))
+        assert len(tbl) == 11
+        assert len(bld.build()) == 12
+
+    def test_builder_promotion(self):
+        bld = Tabel.builder(Tabel({'a': [1], 'b': ['abc']}).dtype)
+        with pytest.raises(ValueError):
+            bld.append((1, 'abcd'))
+        with pytest.raises(ValueError):
+            bld.append((1.5, 'abc'))
+        with pytest.raises(ValueError):
+            bld.append((1, 'a', 'b'))
+        assert len(bld) == 0
+        bld = Tabel.builder([('a', int), ('b', '<U3')], widen=True)
+        bld.append((1, 'abc'))
+        bld.append((2.5, 'abcd'))
+        tbl = bld.build()
+        assert tbl.dtype == np.dtype([('a', float), ('b', '<U4')])
+        assert tbl[0] == (1.0, 'abc')
+
+    def test_builder_datetime(self):
+        import datetime
+        bld = Tabel.builder([('d', 'datetime64[D]')])
+        bld.append((datetime.date(2020, 1, 2),))
+        bld.append((np.datetime64('2020-01-03'),))
+        with pytest.raises(ValueError):
+            bld.append(('abc',))
+        with pytest.raises(ValueError):
+            bld.append((datetime.datetime(2020, 1, 4, 12),))
+        bld.widen = True
+        bld.append((datetime.datetime(2020, 1, 4, 12),))
+        tbl = bld.build()
+        assert tbl['d'].dtype == np.dtype('datetime64[us]')
+        assert list(tbl['d'].astype('datetime64[D]').astype(str)) == \
+            ['2020-01-02', '2020-01-03', '2020-01-04']
+
+    def test_builder_columns(self):
+        bld = Tabel.builder([('a', int), ('b', '<U3')], capacity=2)
+        bld.extend_columns([np.arange(5), ['x', 'yy', 'zzz', 'x', 'y']])
+        bld.append((5, 'abc'))
+        with pytest.raises(ValueError):
+            bld.extend_columns([[1.5], ['a']])
+        with pytest.raises(ValueError):
+            bld.extend_columns([[1, 2], ['a']])
+        assert len(bld) == 6
+        bld.widen = True
+        bld.extend_columns([[1.5], ['abcd']])
+        tbl = bld.build()
+        assert bld.dtypes == [np.dtype(float), np.dtype('<U4')]
+        assert list(tbl['a']) == [0, 1, 2, 3, 4, 5, 1.5]
+        assert tbl[6] == (1.5, 'abcd')
+
+    def test_builder_empty(self):
+        tbl = Tabel.builder({'a': int}).build()
+        assert tbl.valid
+        assert len(tbl) == 0
+        assert tbl.columns == ['a']
+
+
+class TestFromRecords(object):
+    def test_tuples(self):
+        from collections import namedtuple
+        Rec = namedtuple('Rec', ['a', 'b', 'c'])
+        recs = [Rec(i, i / 2, str(i)) for i in range(25)]
+        tbl = Tabel.from_records(recs, batch_rows=4)
+        assert tbl.columns == ['a', 'b', 'c']
+        assert tbl.dtype == np.dtype([('a', int), ('b', float), ('c', '<U2')])
+        assert tbl[24] == (24, 12.0, '24')
+        tbl = Tabel.from_records(iter([(1, 'x'), (2, 'yy')]))
+        assert tbl.columns == ['0', '1']
+        assert list(tbl['1']) == ['x', 'yy']
+        with pytest.raises(ValueError):
+            Tabel.from_records([(1, 2), (3,)])
+        with pytest.raises(ValueError):
+            Tabel.from_records([(1, 2)], columns=['a'])
+
+    def test_dicts(self):
+        recs = ({'a': i, 'b': 'x' * (i % 3), 'c': None} for i in range(10))
+        tbl = Tabel.from_records(recs, columns=['b', 'a'], dtypes={'a': np.int32},
+                                 batch_rows=3)
+        assert tbl.columns == ['b', 'a']
+        assert tbl['a'].dtype == np.int32
+        assert list(tbl['a']) == list(range(10))
+        assert tbl[5] == ('xx', 5)
+
+    def test_none_and_widening(self):
+        tbl = Tabel.from_records([(1, None, 'a'), (None, None, None), (2.5, 'b', 'cc')],
+                                 batch_rows=2)
+        assert tbl['0'].dtype == float
+        assert np.isnan(tbl['0'][1])
+        assert list(tbl['1']) == ['', '', 'b']
+        assert list(tbl['2']) == ['a', '', 'cc']
+        tbl = Tabel.from_records([(1,), (None,)], dtypes=[float])
+        assert np.isnan(tbl['0'][1])
+        for dtype in [int, bool]:
+            with pytest.raises(ValueError):
+                Tabel.from_records([(1,), (None,)], dtypes=[dtype])
+
+    def test_structured_and_empty(self):
+        arr = np.array([(1, 2.)], dtype=[('a', int), ('b', float)])
+        tbl = Tabel.from_records(arr)
+        assert tbl.columns == ['a', 'b']
+        assert tbl[0] == (1, 2.)
+        tbl = Tabel.from_records(arr, columns=['x', 'y'], dtypes={'x': float, 'y': np.float32})
+        assert tbl.dtype == np.dtype([('x', float), ('y', np.float32)])
+        assert len(Tabel.from_records([])) == 0
+        tbl = Tabel.from_records([], columns=['a', 'b'], dtypes=[int, '<U1'])
+        assert tbl.columns == ['a', 'b']
+        assert tbl['b'].dtype == np.dtype('<U1')
+
+
 class TestSlice(object):
     def test_slice_type(self, tbls):
         for tbl in tbls:
@@ -125,6 +274,24 @@ class TestSlice(object):
                 ind = ind if isinstance(ind, np.ndarray) else np.array([ind])
                 assert type(tbl[ind,:]) == Tabel
 
+    def test_column_names(self):
+        tbl = Tabel({'a':[1, 2], 'b':[3, 4], 'c':[5, 6]})
+        assert tbl[1, 'c'] == 6 and tbl[1, 2] == 6 and tbl[1, -1] == 6
+        tbl.columns[2] = 'z'
+        assert list(tbl['z']) == [5, 6]
+        with pytest.raises(KeyError):
+            tbl['c']
+        tbl.columns = ['x', 'y', 'z']
+        tbl[0, 'y'] = 7
+        assert tbl[0] == (1, 7, 5)
+        del tbl['x']
+        assert list(tbl['z']) == [5, 6] and tbl[0, 0] == 7
+        tbl['w'] = 0
+        assert tbl.columns == ['y', 'z', 'w'] and list(tbl[:, 'w']) == [0, 0]
+        tbl_c = deepcopy(tbl)
+        tbl_c.columns.reverse()
+        assert tbl_c['w'] is tbl_c.data[0] and tbl['w'] is tbl.data[2]
+
     def test_slice_permiseable(self, tbls):
         row_it = [slice(0,2,None), [0,1], np.array([True,False,True]), 0, np.array([0,1]),
                   np.array([False, True, False]), slice(0,3,2)]
@@ -189,7 +356,7 @@ class TestSetter(object):
 class TestSaveNRead(object):
     def test_save_n_read(self, tbls, tmpdir):
         for header in [True, False]:
-            for fmt in ['csv', 'gz', 'npz']:
+            for fmt in ['csv', 'gz', 'npz', 'npy']:
                 for tbl in tbls:
                     if len(tbl) > 0:
                         fn = os.path.join(str(tmpdir), "test."+fmt)
@@ -205,6 +372,170 @@ class TestSaveNRead(object):
                             assert set(tbl_r.columns) == set(tbl.columns), (tbl, tbl_r)
                             assert len(tbl_r) == len(tbl), (tbl, tbl_r)
 
+    def test_csv_writer(self, tmpdir):
+        import csv
+        r = np.random.RandomState(0)
+        strs = np.array(['a,b', 'q"x', '', 'nl\nx', 'cr\r', ' sp', '\xe9', 'plain'])
+        tbl = Tabel({'f': r.rand(100) * 10. ** r.randint(-30, 30, 100), 'i': r.randint(-99, 99, 100),
+                     'b': r.rand(100) > .5, 'd': r.randint(0, 9999, 100).astype('M8[D]'),
+                     'u': strs[r.randint(0, len(strs), 100)], 'g': r.rand(100).astype(np.float32),
+                     'o': np.array([None, 1, 2.5, 'x,y'] * 25, dtype=object)})
+        tbl['f'][:3] = [np.nan, np.inf, -0.]
+        tbl_c = tbl[:, ['u', 'i']]
+        tbl_c.categorize(['u'])
+        for t in [tbl, tbl_c, tbl[:, ['u']], Tabel({'a': np.arange(0)})]:
+            fn = str(tmpdir.join("test.csv"))
+            t.save(fn)
+            expected = str(tmpdir.join("expected.csv"))
+            with open(expected, 'w') as f:
+                writer = csv.writer(f)
+                writer.writerow(t.columns)
+                writer.writerows(zip(*t.data))
+            with open(fn) as f, open(expected) as f_e:
+                assert f.read() == f_e.read()
+
+    def test_csv_formats(self, tmpdir):
+        tbl = Tabel({'p': [1.2345, 2.], 'q': [1, 2], 'r': [0.5, 0.25]})
+        fn = str(tmpdir.join("test.gz"))
+        tbl.save(fn, formats={'p': '%.2f', 'q': '%03d'}, float_format='%.1e')
+        with gzip.open(fn, 'rb') as f:
+            assert f.read() == b"p,q,r\r\n1.23,001,5.0e-01\r\n2.00,002,2.5e-01\r\n"
+        with pytest.raises(ValueError):
+            tbl.save(fn, formats={'x': '%d'})
+
+    def test_read_mmap(self, tmpdir):
+        tbl = Tabel({'a':np.arange(10), 'b':["x"*i for i in range(10)], 'c':np.arange(10) / 4})
+        dn = os.path.join(str(tmpdir), "test.npy")
+        tbl.save(dn)
+        fn_ext = os.path.join(str(tmpdir), "test_dir")
+        tbl.save(fn_ext, fmt="npy")
+        for fn in [dn, fn_ext]:
+            tbl_r = read_tabel(fn, mmap=True)
+            assert tbl_r.columns == tbl.columns
+            assert tbl_r.dtype == tbl.dtype
+            assert all(np.all(c_r == c) for c_r, c in zip(tbl_r.data, tbl.data))
+            assert all(isinstance(c.base, np.memmap) for c in tbl_r.data)
+            with pytest.raises((ValueError, KeyError)):
+                tbl_r[0, 'a'] = 12
+        tbl_r = read_tabel(dn, mmap='c')
+        tbl_r[0, 'a'] = 12
+        assert read_tabel(dn)[0, 'a'] == 0
+        with pytest.raises(ValueError):
+            Tabel({'a': np.array([None, 1])}).save(dn)
+
+    def test_read_columns(self, tmpdir):
+        tbl = Tabel({'a':np.arange(10), 'b':["x"*i for i in range(10)], 'c':np.arange(10) / 4})
+        for ext in ["npz", "npy", "csv"]:
+            fn = os.path.join(str(tmpdir), "test." + ext)
+            tbl.save(fn)
+            tbl_r = read_tabel(fn, columns=['c', 'a'])
+            assert tbl_r.columns == ['c', 'a']
+            assert tbl_r.dtype == tbl[:, ['c', 'a']].dtype
+            assert np.all(tbl_r['c'] == tbl['c'])
+            with pytest.raises(KeyError):
+                read_tabel(fn, columns=['a', 'x'])
+
+    def test_read_lazy(self, tmpdir):
+        tbl = Tabel({'a':np.arange(10), 'b':["x"*i for i in range(10)], 'c':np.arange(10) / 4})
+        fn = os.path.join(str(tmpdir), "test.npz")
+        tbl.save(fn)
+        tbl_r = read_tabel(fn, lazy=True)
+        assert tbl_r.shape == tbl.shape
+        assert tbl_r.dtype == tbl.dtype
+        assert not any(c.loaded for c in tbl_r.data)
+        assert isinstance(tbl_r['b'], np.ndarray)
+        assert np.all(tbl_r['b'] == tbl['b'])
+        assert not tbl_r.data[0].loaded
+        assert tbl_r[3] == tbl[3]
+        assert np.all(tbl_r[2:5, 'c'] == tbl[2:5, 'c'])
+        tbl_r.sort(['a'])
+        assert tbl_r.valid
+        assert tbl_r[:, ['a', 'c']].dtype == tbl[:, ['a', 'c']].dtype
+
+    def test_save_threads(self, tmpdir):
+        tbl = Tabel({'a':np.arange(1000), 'b':np.arange(1000) / 7, 'c':["x"*(i % 5) for i in range(1000)]})
+        for ext in ["npz", "gz"]:
+            fn = os.path.join(str(tmpdir), "test." + ext)
+            tbl.save(fn, threads=3)
+            for threads in [1, 2]:
+                tbl_r = read_tabel(fn, threads=threads)
+                assert tbl_r.dtype == tbl.dtype
+                assert all(np.all(c_r == c) for c_r, c in zip(tbl_r.data, tbl.data))
+        fn = os.path.join(str(tmpdir), "test.gz")
+        with compress.ParallelGzipWriter(fn, 2, block_size=100) as f:
+            f.write(b"0123456789" * 101)
+        assert len(compress.gzip_members(fn)) == 11
+        with gzip.open(fn, 'rb') as f:
+            assert f.read() == b"0123456789" * 101
+        tbl.save(fn)
+        assert compress.gzip_members(fn) is None
+        assert read_tabel(fn, threads=2).shape == tbl.shape
+
+    def test_save_threads_zip64(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(compress, "ZIP64_LIMIT", 100)
+        tbl = Tabel({'a':np.arange(1000), 'b':np.array([None, 1] * 500)})
+        fn = os.path.join(str(tmpdir), "test.npz")
+        tbl.save(fn, threads=2)
+        with zipfile.ZipFile(fn) as zf:
+            assert zf.testzip() is None
+        with np.load(fn, allow_pickle=True) as reader:
+            assert np.all(reader['a'] == tbl['a'])
+            assert list(reader['b']) == list(tbl['b'])
+
+    def test_read_dtypes(self, tmpdir):
+        tbl = Tabel({'a':[1, 2, 3], 'b':[1.5, 2, 3], 'c':[True, False, True],
+                     'd':np.array(['2019-01-01', '2019-02-01', 'NaT'], dtype='datetime64[D]'),
+                     'e':["x", "", "yz"]})
+        fn = os.path.join(str(tmpdir), "test.csv")
+        tbl.save(fn)
+        tbl_r = read_tabel(fn)
+        assert [dt for _, dt in tbl_r.dtype.descr] == ['<i8', '<f8', '|b1', '<U10', '<U2']
+        tbl_r = read_tabel(fn, dtypes={'d': 'datetime64[D]'})
+        assert tbl_r.dtype == tbl.dtype
+        assert tbl_r[0] == tbl[0]
+        tbl_r = read_tabel(fn, dtypes=[float, float, bool, str, str])
+        assert [dt for _, dt in tbl_r.dtype.descr] == ['<f8', '<f8', '|b1', '<U10', '<U2']
+        tbl_r = read_tabel(fn, dtypes={'a': np.int16})
+        assert tbl_r['a'].dtype == np.int16
+        assert tbl_r['b'].dtype == float
+        with pytest.raises(ValueError):
+            read_tabel(fn, dtypes={'e': float})
+
+    def test_read_infer_fallback(self, tmpdir, monkeypatch):
+        import tabel.tabel
+        monkeypatch.setattr(tabel.tabel, "CSV_INFER_ROWS", 2)
+        fn = os.path.join(str(tmpdir), "test.csv")
+        Tabel({'a':[1, 2, 3.5, 4], 'b':["1", "2", "3", "x"], 'c':[1, 2, 3, 4]}).save(fn)
+        tbl_r = read_tabel(fn)
+        assert [dt for _, dt in tbl_r.dtype.descr] == ['<f8', '<U1', '<i8']
+
+    def test_read_chunks(self, tmpdir):
+        tbl = Tabel({'a':np.arange(10), 'b':["x"*i for i in range(10)], 'c':np.arange(10) / 4})
+        for fmt in ['csv', 'gz']:
+            fn = os.path.join(str(tmpdir), "test."+fmt)
+            tbl.save(fn)
+            chunks = list(read_tabel(fn, chunksize=3))
+            assert [len(chunk) for chunk in chunks] == [3, 3, 3, 1]
+            for chunk in chunks:
+                assert chunk.columns == tbl.columns
+                assert chunk['a'].dtype == tbl['a'].dtype
+                assert chunk['b'].dtype.kind == 'U'
+                assert chunk['c'].dtype == tbl['c'].dtype
+            assert np.all(np.concatenate([chunk['c'] for chunk in chunks]) == tbl['c'])
+            chunks = list(iter_tabel(fn, 4, dtypes={'a': float}))
+            assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+            assert all(chunk['a'].dtype == float for chunk in chunks)
+            with pytest.raises(ValueError):
+                list(iter_tabel(fn, 4, dtypes=[int, int, float]))
+
+    def test_read_chunks_schema(self, tmpdir):
+        fn = os.path.join(str(tmpdir), "test.csv")
+        Tabel({'a':["1", "2", "x"], 'b':[1, 2, 3]}).save(fn)
+        with pytest.raises(ValueError):
+            list(iter_tabel(fn, 2))
+        assert len(next(iter_tabel(fn, 2, dtypes=[str, int]))) == 2
+
+
 class TestGroupBy(object):
     def test_group_by(self):
         tbl = Tabel({'a':[10,20,30, 40]*3, 'b':["100","200"]*6, 'c':[100,200]*6})
@@ -217,6 +548,88 @@ class TestGroupBy(object):
         idx = np.argsort(tbl_g['a'])
         assert np.all(tbl_g[idx, 'a'] == [10,20,30,40])
 
+    def test_group_by_named(self):
+        tbl = Tabel({'a':[1, 2, 2, 3, 3, 3], 'b':['x', 'y', 'x', 'y', 'x', 'x'],
+                     'c':[1.0, 2.0, 3.0, 4.0, 5.0, 9.0]})
+        aggs = ['sum', 'mean', 'min', 'max', 'count', 'first', 'last', 'std', 'var',
+                'median', 'nunique']
+        tbl_g = tbl.group_by('a', [(agg, 'c') for agg in aggs] + [('nunique', 'b')])
+        assert list(tbl_g['a']) == [1, 2, 3]
+        assert list(tbl_g['c_sum']) == [1.0, 5.0, 18.0]
+        assert list(tbl_g['c_mean']) == [1.0, 2.5, 6.0]
+        assert list(tbl_g['c_min']) == [1.0, 2.0, 4.0]
+        assert list(tbl_g['c_max']) == [1.0, 3.0, 9.0]
+        assert list(tbl_g['c_count']) == [1, 2, 3]
+        assert list(tbl_g['c_first']) == [1.0, 2.0, 4.0]
+        assert list(tbl_g['c_last']) == [1.0, 3.0, 9.0]
+        assert np.allclose(tbl_g['c_std'], [0.0, 0.5, np.std([4.0, 5.0, 9.0])])
+        assert np.allclose(tbl_g['c_var'], [0.0, 0.25, np.var([4.0, 5.0, 9.0])])
+        assert list(tbl_g['c_median']) == [1.0, 2.5, 5.0]
+        assert list(tbl_g['c_nunique']) == [1, 2, 3]
+        assert list(tbl_g['b_nunique']) == [1, 2, 2]
+
+    def test_group_by_fallback(self):
+        tbl = Tabel({'a':[3, 1, 3, 1], 'b':['x', 'y', 'z', 'w']})
+        tbl_g = tbl.group_by('a', [(lambda x: "".join(x), 'b'), (max, 'b')])
+        assert list(tbl_g['a']) == [3, 1]
+        assert list(tbl_g['b_<lambda>']) == ['xz', 'yw']
+        assert list(tbl_g['b_max']) == ['z', 'y']
+        with pytest.raises(ValueError):
+            tbl.group_by('a', [('nonsense', 'b')])
+
+    def test_aggregation_key_error(self, monkeypatch):
+        def failing(values, order, starts, counts):
+            raise KeyError("inside")
+        monkeypatch.setitem(hashjoin.AGGREGATIONS, 'failing', failing)
+        with pytest.raises(KeyError):
+            Tabel({'a': [1, 2]}).group_by('a', [('failing', 'a')])
+
+    def test_arg_hash(self):
+        with pytest.warns(DeprecationWarning):
+            keylist = hashjoin.arg_hash([np.array([3, 1, 3, 1, 3]), np.array(['x', 'y', 'x', 'y', 'z'])])
+        assert dict(keylist) == {(3, 'x'): [0, 2], (1, 'y'): [1, 3], (3, 'z'): [4]}
+        assert keylist[(2, 'x')] == []
+
+    def test_group_by_parallel(self):
+        r = np.random.RandomState(0)
+        tbl = Tabel({'a':r.randint(0, 30, 300), 'b':r.choice(['x', 'yy', 'zzz'], 300),
+                     'c':r.rand(300)})
+        aggs = [('sum', 'c'), ('median', 'c'), ('count', 'a'), ('max', 'b'), (first, 'c')]
+        for key in ['a', 'b', ['b', 'a']]:
+            ref = tbl.group_by(key, aggs)
+            tbl_g = tbl.group_by(key, aggs, n_jobs=2)
+            assert tbl_g.columns == ref.columns
+            assert all(np.array_equal(c_r, c_g) for c_r, c_g in zip(ref.data, tbl_g.data))
+        tbl_g = tbl.group_by('a', [(lambda x: x.max() - x.min(), 'c')], n_jobs=2)
+        assert np.allclose(tbl_g['c_<lambda>'], tbl.group_by('a', [('max', 'c')])['c_max'] -
+                           tbl.group_by('a', [('min', 'c')])['c_min'])
+
+    def test_shared_arrays_cleanup(self, monkeypatch):
+        from tabel import parallel
+        created = []
+
+        class FailingSharedMemory(parallel.SharedMemory):
+            def __init__(self, *args, **kwargs):
+                if len(created) == 1:
+                    raise OSError("no space left")
+                super(FailingSharedMemory, self).__init__(*args, **kwargs)
+                created.append(self.name)
+
+        monkeypatch.setattr(parallel, "SharedMemory", FailingSharedMemory)
+        with pytest.raises(OSError):
+            parallel.SharedArrays([np.arange(10), np.arange(10)])
+        monkeypatch.undo()
+        with pytest.raises(FileNotFoundError):
+            parallel.SharedMemory(name=created[0])
+
+    def test_process_pool_reuse(self):
+        from tabel import parallel
+        tbl = Tabel({'a':[1, 2, 3, 1], 'c':[1., 2, 3, 4]})
+        tbl.group_by('a', [('sum', 'c')], n_jobs=2)
+        pool = parallel._process_pool(2)
+        tbl.join(tbl, 'a', n_jobs=2)
+        assert parallel._process_pool(2) is pool
+
 
 class TestShapeNLen(object):
     def test_shape_n_len(self, tbls):
@@ -278,6 +691,82 @@ class TestJoin(object):
         assert "c_r" in tbl_j.columns
         assert len(tbl_j) == 6
 
+    def test_left_right_join(self):
+        tbl = Tabel({"a":[0, 1, 2, 2], "b": ['a','b'] *2})
+        tbl_b = Tabel({"a":[2, 3, 2], "c": [1.1, 2.2, 3.3]})
+        tbl_j = tbl.join(tbl_b, "a", jointype='left')
+        assert list(tbl_j['a']) == [0, 1, 2, 2, 2, 2]
+        assert naneq(tbl_j['c_r'], [np.nan, np.nan, 1.1, 3.3, 1.1, 3.3])
+        tbl_j = tbl.join(tbl_b, "a", jointype='right')
+        assert list(tbl_j['a']) == [2, 2, 3, 2, 2]
+        assert list(tbl_j['b_l']) == ['a', 'b', '', 'a', 'b']
+
+    def test_composite_key_join(self):
+        tbl = Tabel({"a":[1, 1, 2, 2], "b": ['x','y'] *2, "c":[1, 2, 3, 4]})
+        tbl_b = Tabel({"a":[2, 1, 1], "b": ['x', 'y', 'z'], "d":[5, 6, 7]})
+        tbl_j = tbl.join(tbl_b, ["a", "b"])
+        assert tbl_j.columns == ['a', 'b', 'c_l', 'd_r']
+        assert tbl_j[0] == (1, 'y', 2, 6)
+        assert tbl_j[1] == (2, 'x', 3, 5)
+        assert len(tbl_j) == 2
+
+    def test_empty_join(self):
+        tbl = Tabel({"a":list(range(4)), "b": ['a','b'] *2})
+        tbl_b = Tabel({"a":list(range(10, 14)), "c": ['d','e'] *2})
+        tbl_j = tbl.join(tbl_b, "a")
+        assert len(tbl_j) == 0
+        assert tbl_j.columns == ['a', 'b_l', 'c_r']
+        tbl_j = tbl.join(tbl_b, "a", jointype='outer')
+        assert len(tbl_j) == 8
+        assert len(tbl) == 4 and len(tbl_b) == 4
+
+    def test_merge_join(self, monkeypatch):
+        tbl = Tabel({"a":[2, 1, 1, 3, 2], "b":[1, 2, 1, 1, 1], "c":[1., 2, 3, 4, 5]})
+        tbl_b = Tabel({"a":[1, 2, 2, 4], "b":[2, 1, 1, 1], "d":['w', 'x', 'y', 'z']})
+        tbl.sort(['b', 'a'])
+        tbl_b.sort(['b', 'a'])
+        assert tbl.sorted_by == ('a', 'b')
+        expected = {}
+        for key in ["a", ["a", "b"], ["b", "a"]]:
+            for jointype in ["inner", "left", "right", "outer"]:
+                expected[str(key), jointype] = Tabel(tbl.dict).join(Tabel(tbl_b.dict), key,
+                                                                    jointype=jointype)
+        monkeypatch.setattr(hashjoin, "factorize_pair", None)
+        for key in ["a", ["a", "b"], ["b", "a"]]:
+            for jointype in ["inner", "left", "right", "outer"]:
+                ref = expected[str(key), jointype]
+                tbl_j = tbl.join(tbl_b, key, jointype=jointype)
+                assert tbl_j.columns == ref.columns
+                assert all(np.array_equal(r.astype(str), j.astype(str))
+                           for r, j in zip(ref.data, tbl_j.data))
+        with pytest.raises(TypeError):
+            tbl.join(tbl_b, "b")
+
+    def test_merge_join_stale(self):
+        tbl = Tabel({'a': [1, 2, 3, 4], 'b': [1, 2, 3, 4]})
+        tbl.sort('a')
+        tbl_s = tbl[0:4, :]
+        tbl[3, 'a'] = 0
+        tbl_r = Tabel({'a': [0], 'c': [7]})
+        tbl_r.sort('a')
+        tbl_j = tbl_s.join(tbl_r, 'a', jointype='outer')
+        assert len(tbl_j) == 4
+        assert list(tbl_j['c_r']) == [999999, 999999, 999999, 7]
+
+    def test_parallel_join(self):
+        r = np.random.RandomState(0)
+        tbl = Tabel({"a":r.randint(0, 20, 200), "b":r.choice(['x', 'yy', ''], 200),
+                     "c":np.where(r.rand(200) < .1, np.nan, r.randint(0, 5, 200))})
+        tbl_b = Tabel({"a":r.randint(0, 25, 50).astype(float), "b":r.choice(['x', 'z'], 50),
+                       "c":r.randint(0, 5, 50) * 1.0, "d":r.rand(50)})
+        for key in ["a", "c", ["b", "a"]]:
+            for jointype in ["inner", "left", "right", "outer"]:
+                ref = tbl.join(tbl_b, key, jointype=jointype)
+                tbl_j = tbl.join(tbl_b, key, jointype=jointype, n_jobs=3)
+                assert tbl_j.columns == ref.columns
+                assert all(c_r.dtype == c_j.dtype and naneq(c_r, c_j)
+                           for c_r, c_j in zip(ref.data, tbl_j.data))
+
 
 class TestSort(object):
     def test_sort(self):
@@ -288,6 +777,564 @@ class TestSort(object):
         tbl.sort(['aa', 'b'])
         assert tbl[1] == ('g',1)
 
+    def test_sorted_by(self):
+        tbl = Tabel({'a':[3, 1, 2], 'b':list(range(3)), 'c':[1., 2, 3]})
+        assert tbl.sorted_by == ()
+        tbl.sort(['b', 'a'])
+        assert tbl.sorted_by == ('a', 'b')
+        assert tbl[1:, :].sorted_by == ('a', 'b')
+        assert tbl[tbl['c'] > 1, ['a', 'c']].sorted_by == ('a',)
+        assert tbl[[2, 0], :].sorted_by == ()
+        del tbl[0]
+        assert tbl.sorted_by == ('a', 'b')
+        del tbl['b']
+        assert tbl.sorted_by == ('a',)
+        tbl['d'] = 1
+        assert tbl.sorted_by == ()
+        tbl.sort('a')
+        tbl.row_append((0, 0., 1))
+        assert tbl.sorted_by == ()
+
+    def test_column_threads(self, monkeypatch):
+        monkeypatch.setattr(executor, "COLUMN_MIN_BYTES", 0)
+        r = np.random.RandomState(0)
+        tbl = Tabel({'a':r.randint(0, 9, 50), 'b':r.rand(50), 'c':r.choice(['x', 'yz'], 50)})
+        tbl_t = Tabel(tbl.dict)
+        tbl_t.column_threads = 3
+        tbl.sort(['b', 'a'])
+        tbl_t.sort(['b', 'a'])
+        mask = tbl['b'] > .5
+        for tbl_s, tbl_ts in [(tbl, tbl_t), (tbl[mask, :], tbl_t[mask, :]),
+                              (tbl[[3, 1, 4], :], tbl_t[[3, 1, 4], :])]:
+            assert all(np.array_equal(c, c_t) for c, c_t in zip(tbl_s.data, tbl_ts.data))
+        del tbl[[0, 5]]
+        del tbl_t[[0, 5]]
+        assert all(np.array_equal(c, c_t) for c, c_t in zip(tbl.data, tbl_t.data))
+        tbl_a = tbl.astype([float, int, '<U3'], threads=2)
+        assert tbl_a.dtype == np.dtype([('a', float), ('b', int), ('c', '<U3')])
+        assert np.array_equal(tbl_a['b'], tbl['b'].astype(int))
+
+
+class TestIndex(object):
+    def test_lookup(self):
+        tbl = Tabel({'a':[3, 1, 3, 2], 'b':['x', 'y', 'x', 'z'], 'c':[1., 2, 3, 4]})
+        tbl.create_index('a')
+        assert list(tbl.lookup(3)['c']) == [1, 3]
+        assert list(tbl.lookup(np.int64(3))['c']) == [1, 3]
+        assert len(tbl.lookup(5)) == 0
+        assert list(tbl.loc_rows([2, 5, 3])['c']) == [4, 1, 3]
+        tbl.create_index(['a', 'b'])
+        with pytest.raises(KeyError):
+            tbl.lookup(3)
+        assert list(tbl.lookup((3, 'x'), ['a', 'b'])['c']) == [1, 3]
+        with pytest.raises(ValueError):
+            tbl.create_index('d')
+
+    def test_index_copy(self):
+        tbl = Tabel({'a':[3, 1, 3, 2], 'b':['x', 'y', 'x', 'z']})
+        tbl.create_index('a')
+        tbl_c = copy(tbl)
+        assert tbl_c._indexes is not tbl._indexes
+        assert list(tbl_c.lookup(3)['b']) == ['x', 'x']
+        tbl_c.create_index('b')
+        tbl_c.drop_index('a')
+        assert list(tbl._indexes) == [('a',)]
+        assert list(tbl.lookup(3)['b']) == ['x', 'x']
+
+    def test_index_invalidation(self):
+        tbl = Tabel({'a':[3, 1, 3, 2], 'c':[1., 2, 3, 4]})
+        tbl.create_index('a')
+        tbl.row_append((3, 5.))
+        assert list(tbl.lookup(3)['c']) == [1, 3, 5]
+        tbl.append(Tabel({'a':[1], 'c':[6.]}))
+        assert list(tbl.lookup(1)['c']) == [2, 6]
+        tbl[0, 'a'] = 1
+        assert list(tbl.lookup(1)['c']) == [1, 2, 6]
+        del tbl[1]
+        assert list(tbl.lookup(1)['c']) == [1, 6]
+        tbl.sort('c')
+        tbl.sort('a')
+        assert list(tbl.lookup(3)['c']) == [3, 5]
+        del tbl['a']
+        with pytest.raises(KeyError):
+            tbl.lookup(3)
+
+    def test_index_view_write(self):
+        tbl = Tabel({'a':[1, 2, 3, 4], 'c':[1., 2, 3, 4]})
+        tbl.create_index('a')
+        tbl.sort('a')
+        tbl_s = tbl[0:2, :]
+        tbl_v = tbl_s[0:1, :]
+        tbl_v[0, 'a'] = 99
+        assert list(tbl.lookup(99)['c']) == [1.]
+        assert len(tbl.lookup(1)) == 0
+        assert tbl.sorted_by == ()
+
+class TestExpression(object):
+    def test_where(self):
+        tbl = Tabel({'a':[1, 5, 7, 2], 'b':['x', 'x', 'y', 'x'], 'c':[.5, 1., 2., np.nan]})
+        for engine in [None, 'numpy']:
+            assert list(tbl.where("a > 3 & b == 'x'", engine=engine)['a']) == [5]
+            assert list(tbl.where("a > 3 | ~(b == 'x')", engine=engine)['a']) == [5, 7]
+            assert list(tbl.where("1 < a <= 5", engine=engine)['a']) == [5, 2]
+            assert list(tbl.where("a > lim", {'lim': 4}, engine=engine)['a']) == [5, 7]
+        assert list(tbl.where("b in ['y', 'z'] or a == 1")['a']) == [1, 7]
+        assert list(tbl.where("isnan(c)")['a']) == [2]
+        for bad in ["a >", "import os", "a.b", "__import__('os')", "a + 1"]:
+            with pytest.raises(ValueError):
+                tbl.where(bad)
+        with pytest.raises(KeyError):
+            tbl.where("d > 1")
+
+    def test_eval(self, monkeypatch):
+        monkeypatch.setattr(expr, "EXPR_BLOCK_ROWS", 3)
+        tbl = Tabel({'a':np.arange(10), 'b':np.arange(10) / 2})
+        for engine in [None, 'numpy']:
+            assert np.allclose(tbl.eval("a * b + 2", engine=engine), tbl['a'] * tbl['b'] + 2)
+        tbl.eval("c = where(a > 2, a, -a)")
+        assert list(tbl['c'][:4]) == [0, -1, -2, 3]
+        assert len(Tabel({'a':np.array([], dtype=int)}).eval("a * 2")) == 0
+
+    def test_numexpr(self):
+        pytest.importorskip("numexpr")
+        tbl = Tabel({'a':np.arange(10), 'b':np.arange(10) / 2, 'c':['x'] * 10})
+        assert np.allclose(tbl.eval("a * b + 2", engine='numexpr'), tbl['a'] * tbl['b'] + 2)
+        with pytest.raises(ValueError):
+            tbl.where("c == 'x'", engine='numexpr')
+
+    def test_numexpr_fallback(self):
+        pytest.importorskip("numexpr")
+        tbl = Tabel({'a':np.arange(4), 'b':['x', 'y', 'z', 'x'], 'c':['x', 'q', 'z', 'q'],
+                     'd':np.arange(4, dtype=np.int8), 'f':[True, False, True, False]})
+        assert list(tbl.where("b == c")['a']) == [0, 2]
+        assert tbl.eval("d + 1").dtype == np.int8
+        tbl_c = deepcopy(tbl)
+        tbl_c.categorize(['b', 'c'], max_ratio=1)
+        assert list(tbl_c.where("b == c & a > 0")['a']) == [2]
+        tbl_c.compact_strings(['b', 'c'])
+        assert list(tbl_c.where("b == c")['a']) == [0, 2]
+
+    def test_engine_dtypes(self):
+        tbl = Tabel({'a':np.arange(-2, 2), 'i':np.arange(4, dtype=np.int32),
+                     'b':np.arange(4) / 2, 'g':np.arange(4, dtype=np.float32)})
+        for expr in ["abs(a)", "abs(i)", "abs(-a)", "abs(b)", "abs(g)", "abs(a * b)",
+                     "abs(a / 2)", "a + i", "where(a > 0, a, 0)", "sqrt(b)"]:
+            ref = tbl.eval(expr, engine='numpy')
+            res = tbl.eval(expr)
+            assert res.dtype == ref.dtype, expr
+            assert np.array_equal(res, ref), expr
+
+    def test_invert(self):
+        tbl = Tabel({'a':np.arange(6), 'f':[True, False, True, False, True, True]})
+        for engine in [None, 'numpy']:
+            assert len(tbl.where("f == ~f", engine=engine)) == 0
+            assert list(tbl.where("~f", engine=engine)['a']) == [1, 3]
+            assert list(tbl.where("~a > -3", engine=engine)['a']) == [0, 1]
+            assert list(tbl.where("~(a > 3) & f", engine=engine)['a']) == [0, 2]
+            assert list(tbl.where("(a & 1) == 1", engine=engine)['a']) == [1, 3, 5]
+            assert list(tbl.eval("a | 8", engine=engine)) == [8, 9, 10, 11, 12, 13]
+
+class TestPlan(object):
+    @staticmethod
+    def same(tbl, tbl_e):
+        return tbl.columns == tbl_e.columns and all(naneq(tbl[c], tbl_e[c]) for c in tbl.columns)
+
+    def test_pushdown(self):
+        tbl = Tabel({'k':[1, 2, 3, 4], 'x':[.1, .2, .3, .4], 'w':['a', 'b', 'a', 'b']})
+        tbl_r = Tabel({'k':[1, 2, 2, 5], 'y':[10, 20, 30, 40]})
+        query = tbl.lazy().join(tbl_r, 'k').filter("x_l > .15").filter("k < lim", {'lim': 3})
+        query = query.select(['k', 'y_r'])
+        plan = query.explain()
+        assert "Filter" not in plan
+        assert "columns=['k', 'x'] filter='(x > .15) & (k < lim)'" in plan
+        assert "columns=['k', 'y'] filter='k < lim'" in plan
+        assert query.columns == ['k', 'y_r']
+        assert self.same(query.collect(), query.collect(optimized=False))
+        assert list(query.collect()['y_r']) == [20, 30]
+        for jointype in ['left', 'right', 'outer']:
+            query = tbl.lazy().join(tbl_r, 'k', jointype=jointype).filter("y_r > 15")
+            expected = tbl.join(tbl_r, 'k', jointype=jointype).where("y_r > 15")
+            assert self.same(query.collect(), expected)
+
+    def test_group_by_sort(self):
+        tbl = Tabel({'a':[3, 1, 2, 1, 3], 'b':[1., 2., 3., 4., 5.], 'c':list('vwxyz')})
+        query = tbl.lazy().sort('b').group_by('a', [('sum', 'b'), ('max', 'c')])
+        query = query.filter("a > 1 & b_sum > 3").select(['a', 'b_sum'])
+        plan = query.explain()
+        assert "columns=['a', 'b'] filter='a > 1'" in plan
+        assert "Filter 'b_sum > 3'" in plan
+        assert self.same(query.collect(), query.collect(optimized=False))
+        assert list(tbl['a']) == [3, 1, 2, 1, 3]
+
+    def test_scan(self, tmpdir):
+        tbl = Tabel({'a':np.arange(10), 'b':np.arange(10) / 2, 'c':['x', 'y'] * 5})
+        for ext in ["npz", "csv", "npy"]:
+            fn = os.path.join(str(tmpdir), "test." + ext)
+            tbl.save(fn)
+            query = tabel.scan_tabel(fn).filter("c == 'y'").select(['a'])
+            assert "columns=['a', 'c']" in query.explain()
+            assert list(query.collect()['a']) == [1, 3, 5, 7, 9]
+            assert tabel.scan_tabel(fn).collect().columns == ['a', 'b', 'c']
+        with pytest.raises(KeyError):
+            tabel.scan_tabel(fn).select(['a']).filter("c == 'y'")
+
+    def test_scan_widen(self, tmpdir, monkeypatch):
+        from tabel import plan
+        monkeypatch.setattr(plan, "PLAN_CHUNK_ROWS", 4)
+        fn = os.path.join(str(tmpdir), "test.csv")
+        Tabel({'a':np.array(['1', '2', '3', '4', '5', '6.5', '7', '8', '9', '10']),
+               'b':np.array(['1', '2', '3', '4', '5', '6', '7', '8', '9', 'x'])}).save(fn)
+        expected = read_tabel(fn).where("a > 4")
+        assert [dt for _, dt in expected.dtype.descr] == ['<f8', '<U1']
+        tbl = tabel.scan_tabel(fn).filter("a > 4").collect()
+        assert self.same(tbl, expected)
+        assert [chunk['a'].dtype.kind for chunk in iter_tabel(fn, 4, widen=True)] == ['i', 'f', 'f']
+        with pytest.raises(ValueError):
+            list(iter_tabel(fn, 4))
+
+class TestCategorical(object):
+    def test_categorical(self):
+        col = tabel.Categorical.from_array(['nl', 'be', 'nl', 'de'])
+        assert list(col.categories) == ['be', 'de', 'nl']
+        assert col[0] == 'nl'
+        assert list(col[1:3]) == ['be', 'nl']
+        assert list(col == 'nl') == [True, False, True, False]
+        assert list(col > 'be') == [True, False, True, True]
+        assert list(col <= 'c') == [False, True, False, False]
+        assert not np.any(col == 'fr')
+        col[3] = 'fr'
+        assert list(col) == ['nl', 'be', 'nl', 'fr']
+        assert list(col.categories) == ['be', 'de', 'fr', 'nl']
+
+    def test_slice_view(self):
+        col = tabel.Categorical.from_array(['nl', 'be', 'nl', 'de'])
+        part = col[0:2]
+        part[1] = 'de'
+        assert list(part) == ['nl', 'de']
+        assert list(col) == ['nl', 'de', 'nl', 'de']
+        with pytest.raises(ValueError):
+            part[1] = 'zzz'
+        assert list(col.categories) == ['be', 'de', 'nl']
+        part = col[[0, 1]]
+        part[1] = 'zzz'
+        assert list(part) == ['nl', 'zzz']
+        tbl = Tabel({'a':[1, 2, 3], 'b':['x', 'y', 'x']})
+        tbl.categorize(['b'], max_ratio=1)
+        tbl_s = tbl[0:2, :]
+        tbl_s[0, 'a'] = 5
+        tbl_s[0, 'b'] = 'y'
+        assert tbl[0] == (5, 'y')
+
+    def test_categorize(self):
+        tbl = Tabel({'a':['x', 'y'] * 5, 'b':list('abcdefghij'), 'c':np.arange(10)})
+        tbl.categorize()
+        assert isinstance(tbl['a'], tabel.Categorical)
+        assert not isinstance(tbl['b'], tabel.Categorical)
+        tbl.categorize('b')
+        assert isinstance(tbl['b'], tabel.Categorical)
+        assert tbl[1] == ('y', 'b', 1)
+        assert list(tbl[tbl['a'] == 'y', 'c']) == [1, 3, 5, 7, 9]
+        assert list(tbl.where("a == 'x'")['c']) == [0, 2, 4, 6, 8]
+
+    def test_sort_join_group_by(self):
+        r = np.random.RandomState(0)
+        tbl = Tabel({'a':r.choice(['x', 'yz', 'w'], 50), 'b':r.rand(50)})
+        tbl_r = Tabel({'a':['x', 'w', 'v'], 'c':[1, 2, 3]})
+        tbl_c, tbl_rc = tbl[:, :], tbl_r[:, :]
+        tbl_c.categorize('a')
+        tbl_rc.categorize('a')
+        tbl.sort(['b', 'a'])
+        tbl_c.sort(['b', 'a'])
+        assert isinstance(tbl_c['a'], tabel.Categorical)
+        assert np.array_equal(tbl_c['b'], tbl['b'])
+        for jointype in ['inner', 'left', 'right', 'outer']:
+            expected = tbl.join(tbl_r, 'a', jointype=jointype)
+            result = tbl_c.join(tbl_rc, 'a', jointype=jointype)
+            assert result.columns == expected.columns
+            assert all(naneq(np.asarray(result[c]), expected[c]) for c in expected.columns)
+        expected = tbl.group_by('a', [(np.sum, 'b')])
+        result = tbl_c.group_by('a', [(np.sum, 'b')])
+        assert isinstance(result['a'], tabel.Categorical)
+        assert list(result['a']) == list(expected['a'])
+        assert np.allclose(result['b_sum'], expected['b_sum'])
+
+    def test_save_read(self, tmpdir):
+        tbl = Tabel({'a':['x', 'y', 'x'], 'b':[1, 2, 3]})
+        tbl.categorize('a')
+        for fn, kwargs in [("test.npz", {}), ("test_t.npz", {'threads':2}), ("test_npy", {})]:
+            fn = os.path.join(str(tmpdir), fn)
+            tbl.save(fn, fmt='npy' if fn.endswith('npy') else 'auto', **kwargs)
+            tbl_r = read_tabel(fn, fmt='npy' if fn.endswith('npy') else 'auto')
+            assert tbl_r.columns == ['a', 'b']
+            assert isinstance(tbl_r['a'], tabel.Categorical)
+            assert list(tbl_r['a']) == ['x', 'y', 'x']
+
+class TestStringColumn(object):
+    def test_string_column(self):
+        col = tabel.StringColumn.from_array(['nl', 'b\xe9', '', 'nl', 'de'])
+        assert list(col.offsets) == [0, 2, 5, 5, 7, 9]
+        assert col[1] == 'b\xe9'
+        assert list(col[1:4]) == ['b\xe9', '', 'nl']
+        assert list(col[[4, 0]]) == ['de', 'nl']
+        assert list(col == 'nl') == [True, False, False, True, False]
+        assert list(col == col[::-1]) == [False, False, True, False, False]
+        assert list(np.argsort(col, kind='stable')) == [2, 1, 4, 0, 3]
+        col[2] = 'a longer string'
+        assert list(col) == ['nl', 'b\xe9', 'a longer string', 'nl', 'de']
+        assert np.asarray(col).dtype.kind == 'U'
+
+    def test_ordering(self):
+        values = np.array(['nl', 'b\xe9', '', 'nl', 'de', 'bz', '\u20ac'])
+        col = tabel.StringColumn.from_array(values)
+        for other in ['b', 'nl', 'c\xe9', '', values[::-1]]:
+            assert list(col < other) == list(values < other)
+            assert list(col <= other) == list(values <= other)
+            assert list(col > other) == list(values > other)
+            assert list(col >= other) == list(values >= other)
+        assert list(col > tabel.StringColumn.from_array(values[::-1])) == list(values > values[::-1])
+        tbl = Tabel({'s':values, 'a':np.arange(len(values))})
+        expected = tbl.where("s > 'b' & s <= 'nl'")
+        tbl.compact_strings()
+        assert list(tbl.where("s > 'b' & s <= 'nl'")['a']) == list(expected['a'])
+        assert list(tbl['s'] < 'c') == list(values < 'c')
+
+    def test_long_outlier(self):
+        import tracemalloc
+        values = ['s{}'.format(i % 7) for i in range(1000)]
+        values[3] = 'x' * 10**6
+        col = tabel.StringColumn.from_array(values)
+        tracemalloc.start()
+        try:
+            order = np.argsort(col, kind='stable')
+            uniques = np.unique(col)
+            less = col < 's3'
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        assert peak < 10**7
+        assert list(order) == sorted(range(len(values)), key=values.__getitem__)
+        assert list(uniques) == sorted(set(values))
+        assert list(less) == [v < 's3' for v in values]
+
+    def test_setitem(self):
+        col = tabel.StringColumn.from_array(['nl', 'b\xe9', '', 'nl', 'de'])
+        data = col.data
+        col[1] = 'abc'
+        col[[0, 4]] = ['xy', 'zz']
+        assert col.data is data
+        assert list(col) == ['xy', 'abc', '', 'nl', 'zz']
+        part = col[0:2]
+        part[0] = 'pq'
+        assert col[0] == 'pq'
+        with pytest.raises(ValueError):
+            part[0] = 'longer'
+        col[0] = 'longer'
+        assert list(col) == ['longer', 'abc', '', 'nl', 'zz']
+        tbl = Tabel({'a':[1, 2], 's':['x', 'y']})
+        tbl.compact_strings()
+        tbl_s = tbl[0:1, :]
+        tbl_s[0, 'a'] = 5
+        tbl_s[0, 's'] = 'z'
+        assert tbl[0] == (5, 'z')
+
+    def test_compact_strings(self, tmpdir):
+        r = np.random.RandomState(0)
+        tbl = Tabel({'a':r.choice(['x', 'yz', 'w', ''], 50), 'b':r.rand(50)})
+        tbl_r = Tabel({'a':['x', 'w', 'v'], 'c':[1, 2, 3]})
+        tbl_s, tbl_rs = tbl[:, :], tbl_r[:, :]
+        tbl_s.compact_strings()
+        tbl_rs.compact_strings('a')
+        assert isinstance(tbl_s['a'], tabel.StringColumn)
+        tbl.sort(['b', 'a'])
+        tbl_s.sort(['b', 'a'])
+        assert np.array_equal(tbl_s['b'], tbl['b'])
+        for jointype in ['inner', 'left', 'right', 'outer']:
+            expected = tbl.join(tbl_r, 'a', jointype=jointype)
+            result = tbl_s.join(tbl_rs, 'a', jointype=jointype)
+            assert result.columns == expected.columns
+            assert all(naneq(np.asarray(result[c]), expected[c]) for c in expected.columns)
+        result = tbl_s.group_by('a', [(np.sum, 'b')])
+        assert list(result['a']) == list(tbl.group_by('a', [(np.sum, 'b')])['a'])
+        tbl_s.row_append(('a much longer string', 0.))
+        assert tbl_s[50] == ('a much longer string', 0.)
+        for fn in ["test.npz", "test_npy"]:
+            fn = os.path.join(str(tmpdir), fn)
+            tbl_s.save(fn, fmt='npy' if fn.endswith('npy') else 'auto')
+            tbl_n = read_tabel(fn, fmt='npy' if fn.endswith('npy') else 'auto')
+            assert isinstance(tbl_n['a'], tabel.StringColumn)
+            assert list(tbl_n['a']) == list(tbl_s['a'])
+
+class TestBenchmarks(object):
+    def test_run_compare(self):
+        sys.path.insert(0, os.path.join(local_path, "benchmarks"))
+        import run
+        result = run.run_cases([20], repeat=1, select=['sort', 'join_', 'read_npz'])
+        cases = [r['case'] for r in result['results']]
+        assert cases == ['sort', 'join_inner', 'join_left', 'join_right', 'join_outer',
+                         'read_npz']
+        assert all(r['time'] > 0 for r in result['results'])
+        slower = deepcopy(result)
+        slower['results'][0]['time'] *= 2
+        flags = [row[-1] for row in run.compare(result, slower, threshold=1.5)]
+        assert flags == ['REGRESSION'] + [''] * 5
+
+class TestSQL(object):
+    def test_round_trip(self):
+        import sqlite3
+        conn = sqlite3.connect(":memory:")
+        tbl = Tabel({'a': np.arange(25), 'f': np.arange(25) / 4, 's': ['x', 'yy'] * 12 + ['zzz'],
+                     'b': np.arange(25) % 2 == 0})
+        tbl['f'][3] = np.nan
+        tbl.to_sql(conn, "t", batch_size=7, create=True)
+        assert conn.execute("SELECT COUNT(*), SUM(a) FROM t").fetchall() == [(25, 300)]
+        assert conn.execute("SELECT f FROM t WHERE a = 3").fetchall() == [(None,)]
+        tbl_r = Tabel.from_cursor(conn.execute("SELECT * FROM t"), arraysize=4)
+        assert tbl_r.columns == tbl.columns
+        assert tbl_r.dtype == np.dtype([('a', int), ('f', float), ('s', '<U3'), ('b', int)])
+        assert naneq(tbl_r['f'], tbl['f'])
+        assert list(tbl_r['s']) == list(tbl['s'])
+        tbl_r = Tabel.from_cursor(conn.execute("SELECT a, b FROM t"), dtypes={'b': bool})
+        assert tbl_r.dtype == np.dtype([('a', int), ('b', bool)])
+        tbl_r = Tabel.from_cursor(conn.execute("SELECT a, s FROM t WHERE a > 100"))
+        assert tbl_r.columns == ['a', 's']
+        assert len(tbl_r) == 0
+
+    def test_nulls(self):
+        import sqlite3
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE t (a, b, c)")
+        conn.executemany("INSERT INTO t VALUES (?, ?, ?)",
+                         [(1, 'a', 1), (None, None, None), (None, 'ccccc', 3), (2.5, 'd', None)])
+        for arraysize in [1, 2, 10]:
+            tbl = Tabel.from_cursor(conn.execute("SELECT * FROM t"), arraysize=arraysize)
+            assert tbl.dtype == np.dtype([('a', float), ('b', '<U5'), ('c', float)])
+            assert naneq(tbl['a'], np.array([1, np.nan, np.nan, 2.5]))
+            assert list(tbl['b']) == ['a', '', 'ccccc', 'd']
+
+    def test_nulls_first(self):
+        import sqlite3
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE t (a, b)")
+        conn.executemany("INSERT INTO t VALUES (?, ?)",
+                         [(None, None), (None, None), (1, 'x'), (None, None), (2, 'yy')])
+        for arraysize in [1, 2, 10]:
+            tbl = Tabel.from_cursor(conn.execute("SELECT * FROM t"), arraysize=arraysize)
+            assert tbl.dtype == np.dtype([('a', float), ('b', '<U2')])
+            assert naneq(tbl['a'], np.array([np.nan, np.nan, 1, np.nan, 2]))
+            assert list(tbl['b']) == ['', '', 'x', '', 'yy']
+
+    def test_quoted_names(self):
+        import sqlite3
+        conn = sqlite3.connect(":memory:")
+        tbl = Tabel({'a"b': [1, 2], 'c d': ['x', 'y']})
+        tbl.to_sql(conn, 'my "table"', create=True)
+        tbl_r = Tabel.from_cursor(conn.execute('SELECT * FROM "my ""table"""'))
+        assert tbl_r.columns == ['a"b', 'c d']
+        assert list(tbl_r['a"b']) == [1, 2]
+        tbl.to_sql(conn, '"my ""table"""')
+        assert conn.execute('SELECT COUNT(*) FROM "my ""table"""').fetchall() == [(4,)]
+
+class TestArrow(object):
+    def test_save_n_read(self, tmpdir):
+        pytest.importorskip("pyarrow")
+        tbl = Tabel({'a': np.arange(6), 'b': np.arange(6) / 4, 'c': ['x', 'yy', '', 'é', 'x', 'z'],
+                     'd': np.arange(6) % 2 == 0})
+        tbl.categorize(['c'])
+        tbl["e"] = tabel.StringColumn.from_array(['p', 'q', 'rr', '', 's', 'tt'])
+        for fmt in ['parquet', 'arrow', 'feather']:
+            fn = str(tmpdir.join("test." + fmt))
+            tbl.save(fn)
+            tbl_r = read_tabel(fn, mmap=True)
+            assert tbl_r.columns == tbl.columns
+            assert isinstance(tbl_r["c"], tabel.Categorical)
+            assert isinstance(tbl_r["e"], tabel.StringColumn)
+            assert all(np.array_equal(np.asarray(c_r), np.asarray(c))
+                       for c_r, c in zip(tbl_r.data, tbl.data))
+            assert read_tabel(fn, columns=['e', 'a']).columns == ['e', 'a']
+            assert tabel.tabel.read_columns(fn) == tbl.columns
+
+    def test_row_groups(self, tmpdir):
+        pq = pytest.importorskip("pyarrow.parquet")
+        tbl = Tabel({'a': np.arange(6), 'b': ['x', 'y'] * 3})
+        fn = str(tmpdir.join("test.parquet"))
+        pq.write_table(tbl.to_arrow(), fn, row_group_size=2)
+        assert list(read_tabel(fn, row_groups=[1])['a']) == [2, 3]
+        assert list(read_tabel(fn, filters=[('a', '>', 3)])['a']) == [4, 5]
+        with pytest.raises(ValueError):
+            read_tabel(fn, row_groups=[1], filters=[('a', '>', 3)])
+
+    def test_writable(self, tmpdir):
+        pytest.importorskip("pyarrow")
+        tbl = Tabel({'a': np.arange(3), 'b': ['x', 'y', 'x']})
+        tbl.categorize(['b'])
+        for fmt in ['parquet', 'arrow', 'feather']:
+            fn = str(tmpdir.join("test." + fmt))
+            tbl.save(fn)
+            tbl_r = read_tabel(fn)
+            tbl_r[0, 'a'] = 5
+            tbl_r[1, 'b'] = 'x'
+            assert list(tbl_r['a']) == [5, 1, 2]
+            assert list(tbl_r['b']) == ['x', 'x', 'x']
+        tbl_r = read_tabel(str(tmpdir.join("test.arrow")), mmap=True)
+        with pytest.raises(ValueError):
+            tbl_r[0, 'a'] = 5
+
+    def test_zero_copy(self):
+        pa = pytest.importorskip("pyarrow")
+        tbl = Tabel({'a': np.arange(5), 'b': np.arange(5) / 2})
+        tbl["s"] = tabel.StringColumn.from_array(['a', 'bc', 'd', '', 'e'])
+        tbl_r = Tabel.from_arrow(tbl.to_arrow())
+        assert np.shares_memory(tbl_r['a'], tbl['a'])
+        assert np.shares_memory(tbl_r['b'], tbl['b'])
+        assert np.shares_memory(tbl_r['s'].data, tbl['s'].data)
+        assert list(tbl_r['s']) == ['a', 'bc', 'd', '', 'e']
+        table = pa.table({'a': pa.chunked_array([[1, None], [3]]), 's': pa.array(['x', None, 'z']),
+                          'c': pa.array(['z', 'a', 'z']).dictionary_encode(),
+                          'b': pa.array([True, None, False])})
+        tbl_r = Tabel.from_arrow(table)
+        assert naneq(tbl_r['a'], np.array([1., np.nan, 3.]))
+        assert tbl_r['b'].dtype == np.float64
+        assert naneq(tbl_r['b'], np.array([1., np.nan, 0.]))
+        assert list(tbl_r['s']) == ['x', '', 'z']
+        assert list(tbl_r['c'].categories) == ['a', 'z']
+        assert list(tbl_r['c']) == ['z', 'a', 'z']
+
+class TestProfiling(object):
+    def test_records(self):
+        from tabel.profiling import profile
+        tbl = Tabel({"a": [3, 1, 2, 1], "b": [1., 2., 3., 4.]})
+        tbl_r = Tabel({"a": [1, 2], "c": ['x', 'y']})
+        with profile(memory=True, cprofile=True) as prof:
+            tbl.join(tbl_r, "a", jointype="left")
+            tbl.group_by("a", [("sum", "b")])
+            tbl.sort("a")
+            Tabel.concat([tbl, tbl])
+        assert [r.name for r in prof.records] == ["join", "group_by", "sort", "concat"]
+        join, group_by, sort, concat = prof.records
+        assert (join.rows_in, join.rows_out) == (6, 4)
+        assert [name for name, _ in join.phases] == ["arg_join", "union"]
+        assert (group_by.rows_out, sort.rows_out, concat.rows_in) == (3, 4, 8)
+        assert [name for name, _ in sort.phases] == ["lexsort", "take"]
+        assert all(r.bytes_net is not None for r in prof.records)
+        assert prof.stats().total_calls > 0
+        assert prof.summary()["sort"][0] == 1
+        assert len(prof.to_tabel()) == 4
+
+    def test_hook(self, tmpdir):
+        from tabel import profiling
+        filename = str(tmpdir.join("profiled.csv"))
+        Tabel({"a": [1, 2, 3], "b": ['x', 'y', 'z']}).save(filename)
+        records = []
+        profiling.add_hook(records.append)
+        try:
+            tbl = read_tabel(filename)
+        finally:
+            profiling.remove_hook(records.append)
+        tbl.sort("a")
+        assert [r.name for r in records] == ["read_tabel"]
+        assert records[0].rows_out == len(tbl) == 3
+        assert [name for name, _ in records[0].phases] == ["sniff", "tokenize", "parse"]
+        assert records[0].bytes_net is None
 
 class TestDTypeProperties(object):
     def test_dtype_properties(self):
@@ -309,6 +1356,27 @@ class TestPandasBackAndForth(object):
         for k in data.keys():
             assert np.all(df['a'] == data['a'])
 
+    def test_shared(self):
+        tbl = Tabel({'a': np.arange(4), 'b': np.arange(4) / 2, 'c': ['x', 'y', 'x', 'z']})
+        tbl.categorize(['c'])
+        df = tbl.to_pandas(copy=False)
+        assert list(df.columns) == ['a', 'b', 'c']
+        assert np.shares_memory(df['a'].values, tbl['a'])
+        assert np.shares_memory(df['b'].values, tbl['b'])
+        assert np.shares_memory(df['c'].values.codes, tbl['c'].codes)
+        assert not np.shares_memory(tbl.to_pandas()['a'].values, tbl['a'])
+        tbl_r = Tabel(df, copy=False)
+        assert np.shares_memory(tbl_r['b'], tbl['b'])
+        assert isinstance(tbl_r['c'], tabel.Categorical)
+        assert list(tbl_r['c']) == ['x', 'y', 'x', 'z']
+
+    def test_categorical(self):
+        df = pd.DataFrame({'x': pd.Categorical(['b', 'a', 'c', 'b'], categories=['c', 'b', 'a'])})
+        tbl = Tabel(df)
+        assert list(tbl['x'].categories) == ['a', 'b', 'c']
+        assert list(tbl['x']) == ['b', 'a', 'c', 'b']
+        assert Tabel(pd.DataFrame({'x': pd.Categorical(['b', None])}))['x'].dtype == object
+
 
 class TestDelItem(object):
     def test_del_row_int(self):